@@ -3,6 +3,19 @@ ASGI config for blogProject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+To serve the Rhino Compute and OpenAI endpoints with their async views, run
+under an ASGI server with FORM_IO_ASYNC_VIEWS=1, e.g.:
+
+    FORM_IO_ASYNC_VIEWS=1 uvicorn blogProject.asgi:application --workers 2
+
+Each worker then keeps many slow Compute/LLM calls in flight at once instead
+of holding one thread per request.
+
+WebSocket connections go to the editor's live channel (form_io/live.py),
+which needs a server with WebSocket support:
+
+    pip install "uvicorn[standard]"
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
@@ -13,4 +26,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogProject.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Load every definition's /io description now so the first project page
+# doesn't wait on Compute
+from form_io.definitions import registry  # noqa: E402
+
+registry.warm_io_in_background()
+
+from form_io.live import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'form_io.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,8 +120,18 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Rhino Compute Configuration
-RHINO_COMPUTE_URL = "http://localhost:6001/"
-RHINO_COMPUTE_API_KEY = ""
+RHINO_COMPUTE_URL = os.getenv("RHINO_COMPUTE_URL", "http://localhost:6001/")
+# Comma-separated list of Compute nodes to balance solves across
+RHINO_COMPUTE_URLS = [url.strip() for url in os.getenv("RHINO_COMPUTE_URLS", RHINO_COMPUTE_URL).split(",") if url.strip()]
+RHINO_COMPUTE_API_KEY = os.getenv("RHINO_COMPUTE_API_KEY", "")
+RHINO_COMPUTE_CONNECT_TIMEOUT = 3  # seconds
+RHINO_COMPUTE_TIMEOUT = 120  # seconds to wait for a solve
+RHINO_COMPUTE_POOL_SIZE = 10  # keep-alive connections per node
+RHINO_COMPUTE_HEALTH_CHECK_INTERVAL = 15  # seconds, 0 disables background checks
+
+# Serve the Compute and OpenAI endpoints with the async views in form_io/async_views.py.
+# Only useful under an ASGI server, see blogProject/asgi.py.
+FORM_IO_ASYNC_VIEWS = os.getenv("FORM_IO_ASYNC_VIEWS") == "1"
 
 # Path to the Grasshopper files directory
 GRASSHOPPER_FILES_DIR = os.path.join(BASE_DIR, "grasshopper_files")
@@ -129,4 +140,92 @@ GRASSHOPPER_FILES_DIR = os.path.join(BASE_DIR, "grasshopper_files")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-MAPBOX_PUBLIC_TOKEN = os.getenv('MAPBOX_PUBLIC_TOKEN')
\ No newline at end of file
+MAPBOX_PUBLIC_TOKEN = os.getenv('MAPBOX_PUBLIC_TOKEN')
+
+# Solve result cache (see form_io/solve_cache.py)
+SOLVE_CACHE_MAX_ENTRIES = 256
+SOLVE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# The on-disk tier keeps results across restarts; enable it with SOLVE_CACHE_DISK=1
+SOLVE_CACHE_DISK_DIR = MEDIA_ROOT / "solve_cache" if os.getenv("SOLVE_CACHE_DISK") == "1" else None
+SOLVE_CACHE_DISK_MAX_BYTES = 1024 * 1024 * 1024
+
+# Solve inputs are snapped to these steps before solving and caching (see
+# form_io/parameters.py). Lengths are in mm; integer parameters are always whole.
+SOLVE_INPUT_STEPS = {
+    "podium_length": 100,
+    "podium_width": 100,
+    "floor_height": 10,
+    "courtyard_offset": 100,
+    "staggered_offset": 50,
+    "polyline_offset": 100,
+}
+SOLVE_ENVELOPE_DECIMALS = 2  # envelope_vertices are in metres
+# Saved site envelopes are simplified to within this many metres (see Project.save)
+SITE_ENVELOPE_SIMPLIFY_TOLERANCE = 0.05
+
+# Batch solves (/api/rhino/solve/batch/)
+SOLVE_BATCH_MAX_ITEMS = 1000
+SOLVE_BATCH_MAX_CONCURRENCY = 16  # solves in flight per batch request
+SOLVE_BATCH_DEFAULT_CONCURRENCY = 8
+
+# Delta solve responses (delta_base, see form_io/deltas.py): output hashes kept per client
+SOLVE_DELTA_MAX_SESSIONS = 1024
+SOLVE_DELTA_SOLVES_PER_SESSION = 8  # recent solves a client can use as its base
+
+# Solve job queue (/api/rhino/jobs/, see form_io/jobs.py)
+SOLVE_JOB_WORKERS_IN_PROCESS = os.getenv("SOLVE_JOB_WORKERS_IN_PROCESS", "1") == "1"  # else run manage.py run_solve_jobs
+SOLVE_JOB_CONCURRENCY_PER_NODE = 2  # job solves in flight per healthy Compute node
+SOLVE_JOB_PRIORITIES = {"interactive": 0, "batch": 10}  # lower runs first
+SOLVE_JOB_POLL_INTERVAL = 1.0  # seconds between database checks for jobs from other processes
+SOLVE_JOB_MAX_WAIT = 30  # longest long-poll, in seconds
+SOLVE_JOB_STALE_AFTER = 2 * RHINO_COMPUTE_TIMEOUT  # running jobs older than this are requeued
+SOLVE_JOB_MAX_ATTEMPTS = 3  # stale jobs started this many times are failed instead
+SOLVE_JOB_RETENTION = 24 * 60 * 60  # seconds finished jobs are kept
+
+# Project dashboard pagination
+PROJECT_LIST_PAGE_SIZE = 24
+PROJECT_LIST_MAX_PAGE_SIZE = 100
+
+# Project thumbnails (see form_io/thumbnails.py): rendered this many seconds after
+# the last save, from a solve of this definition. None turns them off.
+PROJECT_THUMBNAIL_DELAY = 5
+PROJECT_THUMBNAIL_DEFINITION = "test_main_2.gh"  # the definition script.js solves
+PROJECT_THUMBNAIL_SIZE = (320, 240)
+PROJECT_THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60  # file names change with their content
+
+# Seconds to buffer project saves before writing them (see form_io/project_store.py).
+# 0 writes every save immediately.
+PROJECT_WRITE_BEHIND_INTERVAL = float(os.getenv("PROJECT_WRITE_BEHIND_INTERVAL", "0"))
+
+# Live editing channel (see form_io/live.py): seconds between autosaves of an open project
+LIVE_SAVE_INTERVAL = 1.0
+
+# Design chat (see form_io/chat.py). The model must support structured outputs.
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o")
+OPENAI_CHAT_CACHE_TTL = 3600  # seconds a cached reply is reused, 0 disables the cache
+OPENAI_CHAT_CACHE_MAX_ENTRIES = 512
+
+# Load testing (see form_io/benchmark.py). Set BENCHMARK_RECORD_DIR to record the
+# editor's requests as sessions that manage.py benchmark_endpoints can replay.
+BENCHMARK_RECORD_DIR = os.getenv("BENCHMARK_RECORD_DIR")
+if BENCHMARK_RECORD_DIR:
+    MIDDLEWARE.append("form_io.benchmark.SessionRecorderMiddleware")
+BENCHMARK_BASELINES_FILE = BASE_DIR / "benchmarks" / "baselines.json"
+
+# Metrics (see form_io/metrics.py), served at /metrics. With METRICS_PROFILING on, a
+# request sent with an X-Profile header gets its stage timings in Server-Timing.
+METRICS_PROFILING = os.getenv("METRICS_PROFILING", "1" if DEBUG else "0") == "1"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(levelname)s %(name)s: %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "form_io": {"handlers": ["console"], "level": os.getenv("FORM_IO_LOG_LEVEL", "INFO"), "propagate": False},
+    },
+}
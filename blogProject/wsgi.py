@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogProject.settings')
 
 application = get_wsgi_application()
+
+# Load every definition's /io description now so the first project page
+# doesn't wait on Compute
+from form_io.definitions import registry  # noqa: E402
+
+registry.warm_io_in_background()
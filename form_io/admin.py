@@ -2,7 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 
-from .models import Project
+from .models import DesignSample, Project
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ('name', 'type', 'relative_location', 'created_at')
@@ -19,4 +19,11 @@ class ProjectAdmin(admin.ModelAdmin):
             'fields': ('created_at',),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(DesignSample)
+class DesignSampleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'building_type', 'definition_digest', 'created_at')
+    list_filter = ('building_type',)
+    readonly_fields = ('definition_digest', 'context_digest', 'solve_key', 'inputs', 'metrics', 'created_at')
+    exclude = ('result',)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FormIoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'form_io'
+
+    def ready(self):
+        from . import spatial  # noqa: F401, connects the R*Tree signal handlers
@@ -0,0 +1,127 @@
+"""
+Async versions of the Compute and OpenAI endpoints.
+
+These are used instead of the views in views.py when FORM_IO_ASYNC_VIEWS is
+enabled and the project runs under ASGI (see blogProject/asgi.py). The
+Compute and OpenAI calls are awaited instead of blocking a worker thread,
+so one process can keep many slow upstream calls in flight.
+"""
+import json
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from openai import AsyncOpenAI
+
+from .chat import build_chat_request, chat_cache, chat_cache_key, parse_chat_message
+from .compute_client import ComputeError
+from .definitions import registry
+from .deltas import delta_result
+from .metrics import span
+from .parameters import canonical_inputs, with_project_envelope
+from .solver import asolve, solve_slots
+from .views import (
+    grasshopper_params_etag,
+    grasshopper_params_last_modified,
+    read_delta_request,
+    read_solve_slot,
+    solve_error_response,
+    stored_envelope_vertices,
+    with_canonical_inputs,
+)
+
+logger = logging.getLogger(__name__)
+
+async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY_3"))
+
+
+@csrf_exempt
+async def solve_grasshopper(request):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Only POST method allowed."})
+
+    try:
+        gh_file_name = request.POST.get("grasshopper_file_name")
+        with span("inputs_parse"):
+            inputs = json.loads(request.POST.get("input_data", "{}"))
+            project_id = request.POST.get("project_id")
+            if project_id:
+                inputs = with_project_envelope(inputs, await sync_to_async(stored_envelope_vertices)(project_id))
+            inputs = canonical_inputs(inputs)
+        slot = read_solve_slot(request, gh_file_name)
+        delta = read_delta_request(request, gh_file_name)
+
+        definition = await sync_to_async(registry.get)(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+        if slot is not None:
+            result = await solve_slots.arun(*slot, lambda: asolve(definition, inputs))
+        else:
+            result = await asolve(definition, inputs)
+
+        if delta is not None:
+            with span("delta"):
+                result = delta_result(result, *delta)
+        with span("serialize"):
+            return HttpResponse(with_canonical_inputs(result, inputs), content_type="application/json")
+
+    except Exception as e:
+        return solve_error_response(e, "solve_grasshopper")
+
+
+@csrf_exempt
+async def chat_with_openai(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=400)
+
+    try:
+        data = json.loads(request.body)
+        prompt = data.get("prompt", "")
+        if not prompt:
+            return JsonResponse({"error": "No prompt provided"}, status=400)
+
+        key = chat_cache_key(prompt)
+        parameters = chat_cache.get(key)
+        if parameters is None:
+            request_kwargs = build_chat_request(prompt)
+            with span("llm_call"):
+                response = await async_client.chat.completions.create(**request_kwargs)
+            parameters = parse_chat_message(response.choices[0].message)
+            if "error" in parameters:
+                return JsonResponse(parameters, status=500)
+            chat_cache.set(key, parameters)
+
+        return JsonResponse({"parameters": parameters})
+
+    except Exception as e:
+        logger.exception("Error while calling OpenAI API")
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+@condition(etag_func=grasshopper_params_etag, last_modified_func=grasshopper_params_last_modified)
+async def get_grasshopper_params(request):
+    try:
+        gh_file_name = request.GET.get("file")
+        if not gh_file_name:
+            return JsonResponse({"error": "No file name provided"}, status=400)
+
+        definition = await sync_to_async(registry.get)(gh_file_name)
+        if definition is None:
+            return JsonResponse({"error": "File not found"}, status=404)
+
+        response = HttpResponse(await registry.aio(definition), content_type="application/json")
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    except ComputeError as e:
+        logger.error("Rhino Compute returned error: %s - %s", e.status, e)
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        logger.exception("An error occurred during get_grasshopper_params")
+        return JsonResponse({"error": str(e)}, status=500)
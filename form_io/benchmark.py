@@ -0,0 +1,246 @@
+"""
+Load testing for the editor's endpoints: recorded sessions, replay and baselines.
+
+A session is what one open editor sent: its ``get_grasshopper_params``,
+``solve_grasshopper``, ``solve_grasshopper_mesh`` and ``save_project_inputs``
+requests with their timing. Sessions are stored as JSON lines, one request
+per line::
+
+    {"session": "a1b2", "at": 0.84, "endpoint": "solve_grasshopper",
+     "definition": "test_main_2.gh", "inputs": {...}, "project": true}
+
+Set BENCHMARK_RECORD_DIR to have SessionRecorderMiddleware write the
+sessions of real use to that directory. ``replay`` plays sessions against a
+running server with a number of concurrent users, and ``summarize`` turns the
+samples into the per-endpoint numbers that ``manage.py benchmark_endpoints``
+prints and stores as baselines.
+"""
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RECORDED_ENDPOINTS = ("get_grasshopper_params", "solve_grasshopper", "solve_grasshopper_mesh", "save_project_inputs")
+
+# Compared against a baseline: a regression is a worse value beyond the tolerance
+BASELINE_METRICS = {"p50_ms": "higher", "p95_ms": "higher", "throughput": "lower"}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class SessionRecorderMiddleware:
+    """
+    Appends every request to the recorded endpoints to a JSON lines file in
+    BENCHMARK_RECORD_DIR. Requests are grouped into sessions by client
+    address and user agent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        directory = Path(settings.BENCHMARK_RECORD_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"sessions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+        self._started = {}  # session -> time of its first request
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None and match.url_name in RECORDED_ENDPOINTS:
+            try:
+                self.record(request, match.url_name)
+            except Exception as e:
+                logger.warning("Could not record %s request: %s", match.url_name, e)
+        return response
+
+    def record(self, request, endpoint):
+        client = f"{request.META.get('REMOTE_ADDR')} {request.META.get('HTTP_USER_AGENT', '')}"
+        session = hashlib.sha1(client.encode()).hexdigest()[:8]
+        event = {"session": session, "endpoint": endpoint}
+        if endpoint == "get_grasshopper_params":
+            event["definition"] = request.GET.get("file")
+        elif endpoint == "save_project_inputs":
+            event["body"] = json.loads(request.body)
+        else:
+            event["definition"] = request.POST.get("grasshopper_file_name")
+            event["inputs"] = json.loads(request.POST.get("input_data", "{}"))
+            event["project"] = bool(request.POST.get("project_id"))
+
+        with self._lock:
+            now = time.monotonic()
+            event["at"] = round(now - self._started.setdefault(session, now), 3)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(event) + "\n")
+
+
+def load_sessions(paths):
+    """Reads session files into lists of requests, each list sorted by time and starting at 0."""
+    sessions = {}
+    for path in paths:
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get("endpoint") not in RECORDED_ENDPOINTS:
+                    raise ValueError(f"{path}:{number}: unknown endpoint {event.get('endpoint')!r}")
+                sessions.setdefault((str(path), event.get("session")), []).append(event)
+
+    loaded = []
+    for events in sessions.values():
+        events.sort(key=lambda event: event.get("at", 0))
+        start = events[0].get("at", 0)
+        loaded.append([{**event, "at": event.get("at", 0) - start} for event in events])
+    return loaded
+
+
+def build_request(event, project_id=None, user=0, distinct=False):
+    """``(method, path, body, headers)`` for one recorded request."""
+    endpoint = event["endpoint"]
+    if endpoint == "get_grasshopper_params":
+        return "GET", "/api/rhino/params/?" + urlencode({"file": event["definition"]}), b"", {}
+    if endpoint == "save_project_inputs":
+        body = json.dumps(event["body"]).encode()
+        return "POST", f"/api/projects/{project_id}/save/", body, {"Content-Type": "application/json"}
+
+    inputs = dict(event["inputs"])
+    if distinct and isinstance(inputs.get("podium_width"), (int, float)):
+        # A metre per user keeps users from sharing cached solves
+        inputs["podium_width"] += user * 1000
+    fields = {"grasshopper_file_name": event["definition"], "input_data": json.dumps(inputs)}
+    if event.get("project") and project_id is not None:
+        fields["project_id"] = project_id
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    if endpoint == "solve_grasshopper_mesh":
+        headers["Accept-Encoding"] = "gzip"
+    path = "/api/rhino/solve/" if endpoint == "solve_grasshopper" else "/api/rhino/solve/mesh/"
+    return "POST", path, urlencode(fields).encode(), headers
+
+
+def replay(base_url, sessions, project_ids, repeat=1, speed=1.0, distinct=False, timeout=300):
+    """
+    Replays ``sessions`` against ``base_url`` with one thread per entry of
+    ``project_ids``, each with its own keep-alive connection. User ``n``
+    starts with session ``n`` and plays ``repeat`` sessions in turn. Requests
+    are sent at their recorded times scaled by ``speed`` (0 sends them back
+    to back), but never before the previous response arrived, as the
+    editor's slider does.
+
+    Returns the samples as ``(endpoint, seconds, ok, bytes_sent,
+    bytes_received)`` and the wall time of the run.
+    """
+    target = urlsplit(base_url)
+    samples = []
+    lock = threading.Lock()
+
+    def user(number, project_id):
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+        own = []
+        try:
+            for turn in range(repeat):
+                session = sessions[(number + turn) % len(sessions)]
+                started = time.perf_counter()
+                for event in session:
+                    delay = started + event["at"] * speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    method, path, body, headers = build_request(event, project_id, number, distinct)
+                    sent = time.perf_counter()
+                    try:
+                        connection.request(method, path, body=body or None, headers=headers)
+                        response = connection.getresponse()
+                        content = response.read()
+                        ok = response.status < 400 and not (
+                            response.headers.get("Content-Type", "").startswith("application/json")
+                            and b'"success": false' in content[:200]
+                        )
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        content, ok = b"", False
+                    own.append((event["endpoint"], time.perf_counter() - sent, ok, len(body), len(content)))
+        finally:
+            connection.close()
+            with lock:
+                samples.extend(own)
+
+    threads = [threading.Thread(target=user, args=(n, project_id)) for n, project_id in enumerate(project_ids)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint and overall latency percentiles, throughput and bytes."""
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    groups = dict(sorted(groups.items()))
+    groups["total"] = samples
+
+    report = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(sample[1] for sample in group)
+        report[endpoint] = {
+            "requests": len(group),
+            "errors": sum(1 for sample in group if not sample[2]),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "throughput": round(len(group) / elapsed, 2) if elapsed else 0.0,
+            "bytes_sent": sum(sample[3] for sample in group),
+            "bytes_received": sum(sample[4] for sample in group),
+        }
+    return report
+
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, name, report, config):
+    baselines = load_baselines(path)
+    baselines[name] = {"recorded": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "endpoints": report}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(report, baseline, tolerance):
+    """
+    Lines describing where ``report`` is worse than ``baseline`` by more
+    than ``tolerance`` (0.2 is 20%), or has errors the baseline didn't.
+    """
+    regressions = []
+    for endpoint, before in baseline["endpoints"].items():
+        after = report.get(endpoint)
+        if after is None:
+            continue
+        for metric, worse in BASELINE_METRICS.items():
+            old, new = before[metric], after[metric]
+            if worse == "higher" and new > old * (1 + tolerance) or worse == "lower" and new < old * (1 - tolerance):
+                change = (new - old) / old * 100 if old else float("inf")
+                regressions.append(f"{endpoint} {metric}: {old} -> {new} ({change:+.0f}%)")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{endpoint} errors: {before['errors']} -> {after['errors']}")
+    return regressions
@@ -0,0 +1,360 @@
+"""
+Prompt, response format and response cache for the design chat.
+
+The instructions are the same for every request, so they are built once at
+import time and only the designer's prompt is appended per call. Replies are
+constrained to RESPONSE_SCHEMA with structured outputs, which needs a model
+that supports it (OPENAI_CHAT_MODEL, gpt-4o by default).
+
+``chat_cache`` keeps parsed replies keyed by model and normalized prompt for
+OPENAI_CHAT_CACHE_TTL seconds, so a prompt that was already answered is not
+sent again.
+
+``ChatEvents`` turns a streamed completion into NDJSON for the chat panel.
+The schema puts ``parameters`` before ``reasoning``, so the browser can start
+solving with the parameters while the reasoning is still being written.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .design_space import INPUT_RANGES, INTEGER_PARAMS
+from .metrics import metrics, span
+from .parameters import ParameterError, clean_parameters
+
+logger = logging.getLogger(__name__)
+
+INPUTS_DESCRIPTION = {
+    "podium_length": "Defines the length of the podium, which is typically the base or foundation on which the main structure (e.g., towers or buildings) is built. This parameter determines how far the podium extends along one axis. Should always be more than 20000mm.",
+    "podium_width": "Specifies the width of the podium, determining its dimension along the perpendicular axis to the length. Together with podium_length, this creates the footprint of the podium. Should always be more than 20000mm.",
+    "podium_no_of_floors": "Sets the number of floors or levels in the podium. This parameter controls the vertical extent of the podium structure. Output is always an integer.",
+    "floor_height": "Determines the height of each floor in the building. This is a crucial parameter for calculating the total height of the structure and maintaining proportions.",
+    "building_type": "Indicates the type of building being designed. This must be an integer from 0 to 5, where each number represents a specific type: 0 for single tower, 1 for two towers, 2 for courtyard, 3 for staggered, 4 for L-shaped, and 5 for H-shaped. This parameter may influence other design aspects such as floor layout and building regulations.",
+    "tower_num_floors": "Specifies the number of floors in the tower portion of the model, controlling its vertical scale. This is separate from the podium and applies to the taller sections of the design.",
+    "courtyard_offset": "Controls the distance or spacing for the courtyard area, typically affecting how much open space is left between the building and the inner courtyard. This is only applicable if the building type is 2 (courtyard).",
+    "staggered_offset": "Defines the offset distance for staggered elements of the design. This parameter is often used for creating a stepped or terraced effect in the facade or building form. This is applicable only if the building type is 3 (staggered).",
+    "polyline_offset": "Specifies the separation or spacing between two towers in the design. This ensures appropriate distances are maintained for structural, aesthetic, or functional reasons, such as light, air circulation, and privacy. This is applicable only when the building type is 1 (two towers).",
+}
+
+SYSTEM_MESSAGE = "You are an expert architect specialized in housing project configurations."
+
+PROMPT_TEMPLATE = (
+    "You are an architect specializing in housing projects. Based on the given inputs, "
+    "select parameter values for a project. Here are the details:\n\n"
+    "Inputs and Descriptions:\n" +
+    "\n".join(f"- {key}: {desc}" for key, desc in INPUTS_DESCRIPTION.items()) +
+    "\n\nInput Ranges:\n" +
+    "\n".join(f"- {key}: {value}" for key, value in INPUT_RANGES.items()) +
+    "\n\nNow, based on the following prompt, provide a value for every parameter, using 0 for "
+    "the ones that do not apply, and explain your choices in the reasoning:\n{prompt}"
+)
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "parameters": {
+            "type": "object",
+            "properties": {
+                name: {"type": "integer" if name in INTEGER_PARAMS else "number"}
+                for name in INPUTS_DESCRIPTION
+            },
+            "required": list(INPUTS_DESCRIPTION),
+            "additionalProperties": False,
+        },
+        "reasoning": {"type": "string"},
+    },
+    "required": ["parameters", "reasoning"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "design_parameters", "strict": True, "schema": RESPONSE_SCHEMA},
+}
+
+
+def build_chat_request(prompt):
+    """
+    Builds the keyword arguments for the chat completion that turns a
+    designer's prompt into parameter values.
+    """
+    with span("prompt_build"):
+        return {
+            "model": settings.OPENAI_CHAT_MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": PROMPT_TEMPLATE.format(prompt=prompt)},
+            ],
+            "response_format": RESPONSE_FORMAT,
+            "max_tokens": 800,
+        }
+
+
+def parse_openai_response(raw_response):
+    """
+    Parses the OpenAI JSON response to extract parameters and reasoning.
+    The parameters are validated with parameters.clean_parameters.
+    """
+    try:
+        parsed_response = json.loads(raw_response)
+        return {
+            "parameters": clean_parameters(parsed_response.get("parameters", {})),
+            "reasoning": parsed_response.get("reasoning", ""),
+        }
+    except ParameterError as e:
+        logger.warning("Invalid parameters in OpenAI response: %s", e)
+        return {"error": f"Invalid parameters in OpenAI response: {e}"}
+    except (json.JSONDecodeError, TypeError, AttributeError) as e:
+        logger.warning("Error parsing OpenAI JSON response: %s", e)
+        return {"error": "Invalid JSON format in OpenAI response."}
+
+
+def parse_chat_message(message):
+    """Parses a completion message, reporting a refusal as an error."""
+    refusal = getattr(message, "refusal", None)
+    if refusal:
+        return {"error": refusal}
+    return parse_openai_response(message.content)
+
+
+def normalize_prompt(prompt):
+    """Case and whitespace differences don't change the answer."""
+    return " ".join(prompt.split()).casefold()
+
+
+def chat_cache_key(prompt, model=None):
+    model = model or settings.OPENAI_CHAT_MODEL
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class ChatCache:
+    """In-process LRU of parsed chat replies whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, max_entries=512, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, reply)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, reply):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, reply)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+class ReplyScanner:
+    """
+    Feed it the text of a reply as it streams in. ``feed`` returns the
+    ``parameters`` object once its closing brace has arrived and the new
+    characters of the ``reasoning`` string, decoded, as they arrive.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._string_start = None  # start of the current string at depth 1
+        self._last_key = None
+        self._value_start = None   # start of the parameters object
+        self._reasoning_start = None
+        self._reasoning_end = None
+        self._reasoning_sent = 0   # raw characters of reasoning already decoded
+
+    def feed(self, delta):
+        self.text += delta
+        parameters = None
+        text = self.text
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._string_start is not None:
+                        if self._expect_key:
+                            self._last_key = text[self._string_start + 1:i]
+                        elif self._reasoning_start is not None and self._reasoning_end is None:
+                            self._reasoning_end = i
+                        self._string_start = None
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string_start = i
+                    if not self._expect_key and self._last_key == "reasoning":
+                        self._reasoning_start = i + 1
+            elif char in "{[":
+                self._depth += 1
+                if char == "{" and self._depth == 1:
+                    self._expect_key = True
+                elif self._depth == 2 and self._last_key == "parameters":
+                    self._value_start = i
+            elif char in "}]":
+                if self._depth == 2 and self._value_start is not None:
+                    parameters = json.loads(text[self._value_start:i + 1])
+                    self._value_start = None
+                self._depth -= 1
+            elif self._depth == 1 and char == ":":
+                self._expect_key = False
+            elif self._depth == 1 and char == ",":
+                self._expect_key = True
+        self._pos = len(text)
+
+        return parameters, self._reasoning_delta()
+
+    def _reasoning_delta(self):
+        if self._reasoning_start is None:
+            return ""
+        end = len(self.text) if self._reasoning_end is None else self._reasoning_end
+        raw = self.text[self._reasoning_start + self._reasoning_sent:end]
+        # Stop before an escape sequence (or surrogate pair) that has not fully
+        # arrived; once the string is closed everything in it has
+        i = 0
+        while i < len(raw) and self._reasoning_end is None:
+            if raw[i] == "\\":
+                length = 2
+                if raw[i + 1:i + 2] == "u":
+                    length = 6
+                    if raw[i + 2:i + 4].lower() in ("d8", "d9", "da", "db"):
+                        length = 12  # a high surrogate needs its low half too
+                if i + length > len(raw):
+                    raw = raw[:i]
+                    break
+                i += length
+            else:
+                i += 1
+        if not raw:
+            return ""
+        self._reasoning_sent += len(raw)
+        return json.loads(f'"{raw}"')
+
+
+def chat_event(**fields):
+    return (json.dumps(fields) + "\n").encode()
+
+
+class ChatEvents:
+    """
+    Turns a streamed chat completion into NDJSON lines:
+    ``{"parameters": {...}}`` as soon as the parameters are complete,
+    ``{"reasoning": "..."}`` per piece of reasoning text, then
+    ``{"done": true}``, or ``{"error": "..."}`` if the reply failed. A reply
+    that parses is stored in ``chat_cache`` under ``cache_key``.
+    """
+
+    def __init__(self, stream, cache_key=None):
+        self.stream = stream
+        self.cache_key = cache_key
+        self._lines = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._lines)
+
+    def close(self):
+        self._lines.close()
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            close()
+
+    def _generate(self):
+        scanner = ReplyScanner()
+        refusal = ""
+        try:
+            for chunk in self.stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                refusal += getattr(delta, "refusal", None) or ""
+                if not delta.content:
+                    continue
+                parameters, reasoning = scanner.feed(delta.content)
+                if parameters is not None:
+                    yield chat_event(parameters=clean_parameters(parameters))
+                if reasoning:
+                    yield chat_event(reasoning=reasoning)
+        except ParameterError as e:
+            yield chat_event(error=f"Invalid parameters in OpenAI response: {e}")
+            return
+        except Exception as e:
+            logger.warning("Error while streaming from OpenAI: %s", e)
+            yield chat_event(error=str(e))
+            return
+
+        if refusal:
+            yield chat_event(error=refusal)
+            return
+        reply = parse_openai_response(scanner.text)
+        if "error" in reply:
+            yield chat_event(error=reply["error"])
+            return
+        if self.cache_key:
+            chat_cache.set(self.cache_key, reply)
+        yield chat_event(done=True)
+
+
+def cached_chat_events(reply):
+    """The NDJSON lines of ChatEvents for a reply that is already known."""
+    yield chat_event(parameters=reply["parameters"])
+    yield chat_event(reasoning=reply["reasoning"])
+    yield chat_event(done=True)
+
+
+chat_cache = ChatCache(settings.OPENAI_CHAT_CACHE_MAX_ENTRIES, settings.OPENAI_CHAT_CACHE_TTL)
+
+
+@metrics.collector
+def chat_cache_metrics():
+    stats = chat_cache.stats()
+    return [
+        ("form_io_chat_cache_lookups_total", "counter", "Chat cache lookups, by result.",
+         [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]),
+        ("form_io_chat_cache_entries", "gauge", "Replies in the chat cache.", [({}, stats["entries"])]),
+    ]
@@ -0,0 +1,256 @@
+"""
+Shared HTTP client for Rhino Compute.
+
+Keeps a pooled keep-alive session per Compute node and sends each request to
+the healthy node with the fewest requests in flight. Nodes that refuse
+connections or fail their /healthcheck are ejected and re-admitted once a
+later health check succeeds. Configure with RHINO_COMPUTE_URLS and the
+RHINO_COMPUTE_* timeouts in settings.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import compute_requests_total, metrics, span
+
+logger = logging.getLogger(__name__)
+
+
+class ComputeError(Exception):
+    """Raised when no Compute node could answer a request."""
+
+    def __init__(self, message, status=503):
+        super().__init__(message)
+        self.status = status
+
+
+class ComputeNode:
+    def __init__(self, url, pool_size, headers):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.headers = headers
+        self.pool_size = pool_size
+        # One httpx client per event loop, since an AsyncClient's connections
+        # belong to the loop that opened them. Under WSGI every async view
+        # runs in a new loop; its client goes away with the loop.
+        self.async_clients = weakref.WeakKeyDictionary()
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+
+    def get_async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self.async_clients.get(loop)
+        if client is None:
+            client = self.async_clients[loop] = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(max_keepalive_connections=self.pool_size),
+            )
+        return client
+
+    def __repr__(self):
+        return f"<ComputeNode {self.url} outstanding={self.outstanding} healthy={self.healthy}>"
+
+
+class ComputeClient:
+    def __init__(self, urls, api_key="", connect_timeout=3, read_timeout=120, pool_size=10,
+                 health_check_interval=15, max_failures=2):
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["RhinoComputeKey"] = api_key
+        self.nodes = [ComputeNode(url, pool_size, headers) for url in urls]
+        if not self.nodes:
+            raise ValueError("At least one Rhino Compute URL is required")
+        self.timeout = (connect_timeout, read_timeout)
+        self.health_check_interval = health_check_interval
+        self.max_failures = max_failures
+
+        self._lock = threading.Lock()
+        self._tiebreak = itertools.count()
+        self._health_thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.RHINO_COMPUTE_URLS,
+            api_key=settings.RHINO_COMPUTE_API_KEY,
+            connect_timeout=settings.RHINO_COMPUTE_CONNECT_TIMEOUT,
+            read_timeout=settings.RHINO_COMPUTE_TIMEOUT,
+            pool_size=settings.RHINO_COMPUTE_POOL_SIZE,
+            health_check_interval=settings.RHINO_COMPUTE_HEALTH_CHECK_INTERVAL,
+        )
+
+    def post(self, path, json=None, timeout=None, **kwargs):
+        """
+        POSTs to ``path`` on the least busy healthy node. Connection failures
+        are retried on the remaining nodes; a timeout is not retried since the
+        node may still be working on the solve. With ``stream=True`` the node
+        counts as busy until the response is closed, so callers must close it.
+        """
+        self._start_health_checks()
+        tried = set()
+        while True:
+            node = self._acquire(exclude=tried)
+            if node is None:
+                raise ComputeError("No Rhino Compute node is reachable")
+            tried.add(node)
+            response = None
+            try:
+                with span("compute_round_trip"):
+                    response = node.session.post(f"{node.url}{path}", json=json, timeout=timeout or self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                compute_requests_total.inc(path, "connection_error")
+                self._record_failure(node, e)
+                continue
+            except requests.Timeout:
+                compute_requests_total.inc(path, "timeout")
+                raise ComputeError(f"Rhino Compute at {node.url} timed out", status=504)
+            finally:
+                if response is not None and kwargs.get("stream"):
+                    self._release_on_close(node, response)
+                else:
+                    self._release(node)
+            compute_requests_total.inc(path, str(response.status_code))
+            self._record_success(node)
+            return response
+
+    async def apost(self, path, json=None, timeout=None):
+        """
+        Async version of ``post`` for the ASGI views. Uses an httpx client per
+        node and event loop and shares load balancing and health state with ``post``.
+        """
+        self._start_health_checks()
+        connect_timeout, read_timeout = timeout or self.timeout
+        tried = set()
+        while True:
+            node = self._acquire(exclude=tried)
+            if node is None:
+                raise ComputeError("No Rhino Compute node is reachable")
+            tried.add(node)
+            try:
+                with span("compute_round_trip"):
+                    response = await node.get_async_client().post(
+                        f"{node.url}{path}", json=json,
+                        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                    )
+            except httpx.ConnectError as e:
+                compute_requests_total.inc(path, "connection_error")
+                self._record_failure(node, e)
+                continue
+            except httpx.TimeoutException:
+                compute_requests_total.inc(path, "timeout")
+                raise ComputeError(f"Rhino Compute at {node.url} timed out", status=504)
+            finally:
+                self._release(node)
+            compute_requests_total.inc(path, str(response.status_code))
+            self._record_success(node)
+            return response
+
+    def check_health(self):
+        """Probes every node's /healthcheck and updates which ones are in rotation."""
+        for node in self.nodes:
+            try:
+                response = node.session.get(f"{node.url}/healthcheck", timeout=self.timeout[0])
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            with self._lock:
+                if ok:
+                    if not node.healthy:
+                        logger.info("Rhino Compute node %s is back in rotation", node.url)
+                    node.healthy = True
+                    node.failures = 0
+                elif node.healthy:
+                    logger.warning("Rhino Compute node %s failed its health check, ejecting", node.url)
+                    node.healthy = False
+
+    def status(self):
+        with self._lock:
+            return [
+                {"url": node.url, "healthy": node.healthy, "outstanding": node.outstanding}
+                for node in self.nodes
+            ]
+
+    def _acquire(self, exclude=()):
+        with self._lock:
+            candidates = [node for node in self.nodes if node not in exclude]
+            healthy = [node for node in candidates if node.healthy]
+            # If every node looks dead, still try one rather than failing outright
+            pool = healthy or candidates
+            if not pool:
+                return None
+            tiebreak = next(self._tiebreak)
+            node = min(pool, key=lambda n: (n.outstanding, (self.nodes.index(n) - tiebreak) % len(self.nodes)))
+            node.outstanding += 1
+            return node
+
+    def _release(self, node):
+        with self._lock:
+            node.outstanding -= 1
+
+    def _release_on_close(self, node, response):
+        """Keeps a streamed response's node counted as busy until the body is closed."""
+        close = response.close
+
+        def close_and_release():
+            nonlocal close
+            if close is None:
+                return
+            close, closing = None, close
+            try:
+                closing()
+            finally:
+                self._release(node)
+        response.close = close_and_release
+
+    def _record_success(self, node):
+        with self._lock:
+            node.failures = 0
+            node.healthy = True
+
+    def _record_failure(self, node, error):
+        with self._lock:
+            node.failures += 1
+            if node.healthy and node.failures >= self.max_failures:
+                logger.warning("Ejecting Rhino Compute node %s: %s", node.url, error)
+                node.healthy = False
+
+    def _start_health_checks(self):
+        if self._health_thread is not None or not self.health_check_interval:
+            return
+        with self._lock:
+            if self._health_thread is not None:
+                return
+            self._health_thread = threading.Thread(target=self._health_loop, name="compute-health", daemon=True)
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            self.check_health()
+
+
+compute = ComputeClient.from_settings()
+
+
+@metrics.collector
+def compute_node_metrics():
+    nodes = compute.status()
+    return [
+        ("form_io_compute_node_healthy", "gauge", "Whether a Compute node is in rotation.",
+         [({"node": node["url"]}, int(node["healthy"])) for node in nodes]),
+        ("form_io_compute_node_outstanding", "gauge", "Requests in flight per Compute node.",
+         [({"node": node["url"]}, node["outstanding"]) for node in nodes]),
+    ]
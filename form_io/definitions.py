@@ -0,0 +1,197 @@
+"""
+Registry of Grasshopper definitions in GRASSHOPPER_FILES_DIR.
+
+Each definition is read and base64-encoded once, then uploaded to Rhino
+Compute the first time it is used. Compute answers with a pointer (its cache
+key for the definition) and later requests send only that pointer instead of
+the full file. If a Compute node does not know the pointer (it restarted, or
+the request was balanced onto a node that has not seen the file yet) the
+definition is uploaded again, and a changed file mtime invalidates the entry.
+
+The /io description of each definition (its inputs and outputs) is cached
+by file content hash, since it only changes when the .gh file does.
+"""
+import base64
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+
+from .compute_client import ComputeError, compute
+from .metrics import span
+from .solve_cache import definition_digest
+
+logger = logging.getLogger(__name__)
+
+# What Compute answers for a pointer it has no definition for, as opposed to a
+# solve that failed: a 404/410, or a 500 saying the definition couldn't be loaded
+POINTER_MISS_STATUSES = (404, 410)
+POINTER_MISS_ERROR = re.compile(r"unable to (find|load|retrieve|convert)|definition not found|unknown pointer", re.IGNORECASE)
+
+
+def pointer_unknown(response):
+    """Whether Compute rejected a request because it doesn't know the definition's pointer."""
+    if response.status_code in POINTER_MISS_STATUSES:
+        return True
+    return response.status_code == 500 and POINTER_MISS_ERROR.search(response.text[:1000]) is not None
+
+
+class Definition:
+    def __init__(self, name, path, stat, data):
+        self.name = name
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.digest = definition_digest(data)
+        with span("base64_encode"):
+            self.encoded = base64.b64encode(data).decode()
+        self.pointer = None
+
+    def is_stale(self, stat):
+        return stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size
+
+
+class DefinitionRegistry:
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self._definitions = {}
+        self._io = {}  # name -> (digest, raw /io JSON)
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        Returns the Definition for a file name, or None if there is no such
+        file. Re-reads the file when its mtime or size has changed.
+        """
+        with span("definition_read"):
+            return self._load(name)
+
+    def _load(self, name):
+        path = self._resolve(name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            definition = self._definitions.get(name)
+            if definition is not None and not definition.is_stale(stat):
+                return definition
+
+        with open(path, "rb") as f:
+            definition = Definition(name, path, stat, f.read())
+        with self._lock:
+            self._definitions[name] = definition
+        return definition
+
+    def post(self, definition, path, payload=None, **kwargs):
+        """
+        POSTs ``payload`` plus the definition to a Compute endpoint, by
+        pointer when Compute already has it and inline otherwise.
+        """
+        body = dict(payload or {})
+        pointer = definition.pointer
+        if pointer:
+            body.update(algo=None, pointer=pointer)
+            response = compute.post(path, json=body, **kwargs)
+            if not pointer_unknown(response):
+                return response  # including errors of the solve itself
+            # Compute may have been restarted or evicted the definition;
+            # forget the pointer and retry with a full upload.
+            logger.info("Pointer for %s rejected (%s), re-uploading", definition.name, response.status_code)
+            response.close()
+            if definition.pointer == pointer:
+                definition.pointer = None
+
+        body.update(algo=definition.encoded, pointer=None)
+        response = compute.post(path, json=body, **kwargs)
+        if response.status_code == 200:
+            self._remember_pointer(definition, response)
+        return response
+
+    async def apost(self, definition, path, payload=None):
+        """Async version of ``post``."""
+        body = dict(payload or {})
+        pointer = definition.pointer
+        if pointer:
+            body.update(algo=None, pointer=pointer)
+            response = await compute.apost(path, json=body)
+            if not pointer_unknown(response):
+                return response
+            logger.info("Pointer for %s rejected (%s), re-uploading", definition.name, response.status_code)
+            if definition.pointer == pointer:
+                definition.pointer = None
+
+        body.update(algo=definition.encoded, pointer=None)
+        response = await compute.apost(path, json=body)
+        if response.status_code == 200:
+            self._remember_pointer(definition, response)
+        return response
+
+    def io(self, definition):
+        """
+        Returns Compute's /io response for a definition as raw JSON bytes.
+        Raises ComputeError if Compute fails or cannot be reached.
+        """
+        cached = self._cached_io(definition)
+        if cached is not None:
+            return cached
+        response = self.post(definition, "/io")
+        if response.status_code != 200:
+            raise ComputeError(response.text, status=response.status_code)
+        self._io[definition.name] = (definition.digest, response.content)
+        return response.content
+
+    async def aio(self, definition):
+        """Async version of ``io``."""
+        cached = self._cached_io(definition)
+        if cached is not None:
+            return cached
+        response = await self.apost(definition, "/io")
+        if response.status_code != 200:
+            raise ComputeError(response.text, status=response.status_code)
+        self._io[definition.name] = (definition.digest, response.content)
+        return response.content
+
+    def warm_io(self):
+        """Fetches /io for every definition in the directory."""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith((".gh", ".ghx")):
+                continue
+            try:
+                self.io(self.get(name))
+            except ComputeError as e:
+                logger.warning("Could not load /io for %s: %s", name, e)
+
+    def warm_io_in_background(self):
+        threading.Thread(target=self.warm_io, name="definition-io-warmup", daemon=True).start()
+
+    def _cached_io(self, definition):
+        cached = self._io.get(definition.name)
+        if cached is not None and cached[0] == definition.digest:
+            return cached[1]
+        return None
+
+    def _remember_pointer(self, definition, response):
+        try:
+            data = response.json()
+        except ValueError:
+            return
+        # /grasshopper replies with "pointer", /io with "CacheKey"
+        definition.pointer = data.get("pointer") or data.get("CacheKey") or None
+
+    def _resolve(self, name):
+        if not name:
+            return None
+        path = os.path.abspath(os.path.join(self.directory, name))
+        # Don't let "../" in a request escape the definitions directory
+        if os.path.dirname(path) != self.directory:
+            return None
+        return path
+
+
+registry = DefinitionRegistry(settings.GRASSHOPPER_FILES_DIR)
@@ -0,0 +1,115 @@
+"""
+Delta solve responses: only the outputs that changed since the last solve.
+
+Most slider changes move only some of a definition's outputs. A client that
+keeps the geometry of the solve it is showing can send ``delta_base`` (the
+``seq`` of that solve, 0 for none) with its solve requests. ``output_hashes``
+remembers a content hash of every output item sent to each client, for its
+last few solves, and items whose hash matches the base solve are sent as
+"unchanged" markers instead of their geometry. A base the server no longer
+knows, for instance after a restart, gets everything.
+
+In Compute's JSON (solve_grasshopper) an unchanged item is replaced by
+``{"unchanged": true}``. In packed meshes (solve_grasshopper_mesh and the
+live channel) it is a mesh with the UNCHANGED flag and no buffers.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .meshes import join_entries, packed_entries, unchanged_entry
+from .metrics import metrics
+
+delta_items_total = metrics.counter(
+    "form_io_solve_delta_items_total", "Output items of delta solve responses, by whether they were sent.", ["state"],
+)
+
+
+class OutputHashes:
+    """Per-client output item hashes of recent solves, least recently used clients dropped first."""
+
+    def __init__(self, max_sessions, solves_per_session):
+        self.max_sessions = max_sessions
+        self.solves_per_session = solves_per_session
+        self._sessions = OrderedDict()  # session -> OrderedDict(seq -> {item: hash})
+        self._lock = threading.Lock()
+
+    def exchange(self, session, seq, base, hashes):
+        """Stores ``hashes`` as solve ``seq`` of ``session`` and returns those of solve ``base``."""
+        with self._lock:
+            solves = self._sessions.get(session)
+            if solves is None:
+                solves = self._sessions[session] = OrderedDict()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session)
+            previous = solves.get(base, {}) if base else {}
+            solves[seq] = hashes
+            solves.move_to_end(seq)
+            while len(solves) > self.solves_per_session:
+                solves.popitem(last=False)
+            return previous
+
+    def forget(self, session):
+        with self._lock:
+            self._sessions.pop(session, None)
+
+
+output_hashes = OutputHashes(settings.SOLVE_DELTA_MAX_SESSIONS, settings.SOLVE_DELTA_SOLVES_PER_SESSION)
+
+
+def _hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def delta_result(result, session, seq, base):
+    """Compute's JSON for a solve with the items unchanged since solve ``base`` replaced by markers."""
+    parsed = json.loads(result)
+    hashes = {}
+    for output in parsed.get("values", []):
+        for path, branch in output.get("InnerTree", {}).items():
+            for index, item in enumerate(branch):
+                key = f"{output.get('ParamName')}{path}[{index}]"
+                hashes[key] = _hash(f"{item.get('type')}:{item.get('data')}".encode())
+
+    previous = output_hashes.exchange(session, seq, base, hashes)
+    unchanged = {key for key, digest in hashes.items() if previous.get(key) == digest}
+    delta_items_total.inc("unchanged", amount=len(unchanged))
+    delta_items_total.inc("sent", amount=len(hashes) - len(unchanged))
+    if not unchanged:
+        return result
+
+    for output in parsed.get("values", []):
+        for path, branch in output.get("InnerTree", {}).items():
+            for index in range(len(branch)):
+                if f"{output.get('ParamName')}{path}[{index}]" in unchanged:
+                    branch[index] = {"unchanged": True}
+    return json.dumps(parsed, separators=(",", ":")).encode()
+
+
+def delta_meshes(packed, session, seq, base):
+    """
+    Packed meshes with the ones unchanged since solve ``base`` replaced by
+    markers. Returns the meshes and whether any were replaced.
+    """
+    entries = packed_entries(packed)
+    keys = []
+    counts = {}
+    for name, _ in entries:
+        counts[name] = counts.get(name, 0) + 1
+        keys.append(f"{name}[{counts[name] - 1}]")
+    hashes = {key: _hash(entry) for key, (_, entry) in zip(keys, entries)}
+
+    previous = output_hashes.exchange(session, seq, base, hashes)
+    unchanged = {key for key, digest in hashes.items() if previous.get(key) == digest}
+    delta_items_total.inc("unchanged", amount=len(unchanged))
+    delta_items_total.inc("sent", amount=len(hashes) - len(unchanged))
+    if not unchanged:
+        return packed, False
+    return join_entries([
+        unchanged_entry(name) if key in unchanged else entry
+        for key, (name, entry) in zip(keys, entries)
+    ]), True
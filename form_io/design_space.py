@@ -0,0 +1,211 @@
+"""
+The bounded design space of the massing definition, and lookups into a
+precomputed sweep of it.
+
+``sweep_design_space`` (a management command) solves a grid or
+Latin-hypercube sample of INPUT_RANGES and stores each result as a
+DesignSample. ``sample_index`` keeps an in-memory k-d tree of those samples
+per building type so the nearest one to a slider position can be served as
+an instant preview while the exact solve is still running.
+"""
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+
+from django.db.models import Max
+
+from .models import DesignSample
+
+INPUT_RANGES = {
+    "podium_length": [10000, 200000],
+    "podium_width": [10000, 100000],
+    "podium_no_of_floors": [1, 20],
+    "floor_height": [2000, 5000],
+    "building_type": [0, 5],
+    "tower_num_floors": [1, 50],
+    "courtyard_offset": [0, 10000],
+    "staggered_offset": [0, 3000],
+    "polyline_offset": [0, 20000],
+}
+
+INTEGER_PARAMS = {"podium_no_of_floors", "building_type", "tower_num_floors"}
+
+# Parameters that only matter for one building type; they are 0 otherwise
+TYPE_SPECIFIC_PARAMS = {1: "polyline_offset", 2: "courtyard_offset", 3: "staggered_offset"}
+
+COMMON_PARAMS = ["podium_length", "podium_width", "podium_no_of_floors", "floor_height", "tower_num_floors"]
+
+BUILDING_TYPES = range(6)
+
+
+def active_params(building_type):
+    """The parameters that shape a design of the given building type."""
+    extra = TYPE_SPECIFIC_PARAMS.get(building_type)
+    return COMMON_PARAMS + [extra] if extra else COMMON_PARAMS
+
+
+def _complete(building_type, values):
+    """Builds a full inputs dict from the active parameter values."""
+    inputs = {name: 0 for name in TYPE_SPECIFIC_PARAMS.values()}
+    inputs.update(values)
+    inputs["building_type"] = building_type
+    for name in INTEGER_PARAMS:
+        inputs[name] = int(round(inputs[name]))
+    return inputs
+
+
+def grid_samples(steps):
+    """Yields inputs dicts on a regular grid with ``steps`` values per parameter."""
+    for building_type in BUILDING_TYPES:
+        params = active_params(building_type)
+        axes = []
+        for name in params:
+            low, high = INPUT_RANGES[name]
+            axis = [low + (high - low) * i / (steps - 1) for i in range(steps)] if steps > 1 else [low]
+            if name in INTEGER_PARAMS:
+                axis = sorted({int(round(value)) for value in axis})
+            axes.append(axis)
+        for point in itertools.product(*axes):
+            yield _complete(building_type, dict(zip(params, point)))
+
+
+def latin_hypercube_samples(count, seed=0):
+    """Yields ``count`` Latin-hypercube samples per building type."""
+    rng = random.Random(seed)
+    for building_type in BUILDING_TYPES:
+        params = active_params(building_type)
+        columns = []
+        for name in params:
+            low, high = INPUT_RANGES[name]
+            strata = list(range(count))
+            rng.shuffle(strata)
+            columns.append([low + (high - low) * (stratum + rng.random()) / count for stratum in strata])
+        for row in zip(*columns):
+            yield _complete(building_type, dict(zip(params, row)))
+
+
+def split_inputs(inputs):
+    """
+    Splits solve inputs into the design-space parameters and everything else
+    (site geometry and the like), which a sweep holds fixed.
+    """
+    params = {name: value for name, value in inputs.items() if name in INPUT_RANGES}
+    context = {name: value for name, value in inputs.items() if name not in INPUT_RANGES}
+    return params, context
+
+
+def context_digest(context):
+    encoded = json.dumps(context, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def building_type_of(params):
+    try:
+        building_type = int(round(float(params.get("building_type", 0))))
+    except (TypeError, ValueError):
+        building_type = 0
+    return min(max(building_type, BUILDING_TYPES[0]), BUILDING_TYPES[-1])
+
+
+def normalize(params, building_type):
+    """Maps the active parameters onto [0, 1] so every axis weighs the same."""
+    point = []
+    for name in active_params(building_type):
+        low, high = INPUT_RANGES[name]
+        try:
+            value = float(params.get(name, low))
+        except (TypeError, ValueError):
+            value = low
+        point.append(min(max((value - low) / (high - low), 0.0), 1.0))
+    return tuple(point)
+
+
+class KDTree:
+    """Static k-d tree for nearest-neighbour lookups over equal-length tuples."""
+
+    def __init__(self, points, ids):
+        self.size = len(points)
+        self._root = self._build(list(zip(points, ids)), 0)
+
+    def _build(self, items, depth):
+        if not items:
+            return None
+        axis = depth % len(items[0][0])
+        items.sort(key=lambda item: item[0][axis])
+        mid = len(items) // 2
+        point, item_id = items[mid]
+        return (point, item_id, axis, self._build(items[:mid], depth + 1), self._build(items[mid + 1:], depth + 1))
+
+    def nearest(self, target):
+        """Returns ``(distance, id)`` of the closest point, or None if the tree is empty."""
+        best = [math.inf, None]
+
+        def search(node):
+            if node is None:
+                return
+            point, item_id, axis, left, right = node
+            distance = sum((a - b) ** 2 for a, b in zip(point, target))
+            if distance < best[0]:
+                best[0], best[1] = distance, item_id
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            search(near)
+            if diff * diff < best[0]:
+                search(far)
+
+        search(self._root)
+        if best[1] is None:
+            return None
+        return math.sqrt(best[0]), best[1]
+
+
+class SampleIndex:
+    """
+    In-memory k-d trees over the stored DesignSamples, one per definition,
+    context and building type. Rebuilt when new samples show up, checked at
+    most every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, refresh_interval=10):
+        self.refresh_interval = refresh_interval
+        self._entries = {}  # (definition_digest, context_digest) -> [checked_at, last_id, trees]
+        self._lock = threading.Lock()
+
+    def nearest(self, definition_digest, context, params):
+        """Returns ``(distance, sample_id)`` for the closest sample, or None."""
+        building_type = building_type_of(params)
+        tree = self._trees(definition_digest, context).get(building_type)
+        if tree is None:
+            return None
+        return tree.nearest(normalize(params, building_type))
+
+    def _trees(self, definition_digest, context):
+        key = (definition_digest, context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.refresh_interval:
+                return entry[2]
+
+        samples = DesignSample.objects.filter(definition_digest=definition_digest, context_digest=context)
+        last_id = samples.aggregate(last_id=Max("id"))["last_id"]
+        if entry is not None and entry[1] == last_id:
+            trees = entry[2]
+        else:
+            points = {}
+            for sample_id, building_type, inputs in samples.values_list("id", "building_type", "inputs"):
+                points.setdefault(building_type, ([], []))
+                points[building_type][0].append(normalize(inputs, building_type))
+                points[building_type][1].append(sample_id)
+            trees = {building_type: KDTree(*columns) for building_type, columns in points.items()}
+
+        with self._lock:
+            self._entries[key] = [now, last_id, trees]
+        return trees
+
+
+sample_index = SampleIndex()
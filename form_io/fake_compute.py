@@ -0,0 +1,195 @@
+"""
+A stand-in for Rhino Compute, for benchmarks and offline development.
+
+``FakeCompute`` answers ``/grasshopper``, ``/io`` and ``/healthcheck`` the way
+the real server does as far as this app can tell: definitions are accepted
+inline (``algo``) and afterwards by the pointer handed back, unknown pointers
+are rejected so the re-upload path is exercised, and every solve returns two
+real rhino3dm meshes. ``RH_OUT:meshout`` is a podium-and-tower massing sized
+from the inputs, so different inputs give different results, and
+``RH_OUT:meshb64`` is a fixed terrain mesh padded out to ``payload_kb``.
+``latency`` (plus up to ``jitter``) seconds are slept per solve to stand in
+for Grasshopper's own work. Run one with ``manage.py fake_compute``.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rhino3dm
+
+from .design_space import INPUT_RANGES, INTEGER_PARAMS
+
+# Inputs the /io answer lists besides the design parameters
+TEXT_INPUTS = ("envelope_vertices",)
+OUTPUT_NAMES = ("meshb64", "meshout")
+
+
+def box_mesh(x0, y0, z0, x1, y1, z1):
+    mesh = rhino3dm.Mesh()
+    for x, y, z in ((x0, y0, z0), (x1, y0, z0), (x1, y1, z0), (x0, y1, z0),
+                    (x0, y0, z1), (x1, y0, z1), (x1, y1, z1), (x0, y1, z1)):
+        mesh.Vertices.Add(x, y, z)
+    for a, b, c, d in ((0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)):
+        mesh.Faces.AddFace(a, b, c, d)
+    return mesh
+
+
+def massing_mesh(inputs):
+    """A podium with a tower on it, roughly following the design parameters."""
+    def number(name, default):
+        try:
+            return float(inputs.get(name, default))
+        except (TypeError, ValueError):
+            return default
+
+    length = number("podium_length", 40000)
+    width = number("podium_width", 30000)
+    floor = number("floor_height", 3000)
+    podium_top = max(number("podium_no_of_floors", 3), 1) * floor
+    tower_top = podium_top + max(number("tower_num_floors", 10), 1) * floor
+
+    mesh = box_mesh(0, 0, 0, length, width, podium_top)
+    tower = box_mesh(length * 0.3, width * 0.3, podium_top, length * 0.7, width * 0.7, tower_top)
+    mesh.Append(tower)
+    return mesh
+
+
+def terrain_mesh(payload_kb):
+    """A bumpy grid whose encoded archive is at least ``payload_kb`` kilobytes."""
+    rng = random.Random(0)
+    cells = 4
+    while True:
+        mesh = rhino3dm.Mesh()
+        step = 200000 / cells
+        for j in range(cells + 1):
+            for i in range(cells + 1):
+                mesh.Vertices.Add(i * step - 100000, j * step - 100000, rng.uniform(-500, 500))
+        for j in range(cells):
+            for i in range(cells):
+                a = j * (cells + 1) + i
+                mesh.Faces.AddFace(a, a + 1, a + cells + 2, a + cells + 1)
+        encoded = json.dumps(mesh.Encode())
+        if len(encoded) >= payload_kb * 1024 or cells >= 1024:
+            return encoded
+        cells = max(cells + 1, int(cells * math.sqrt(payload_kb * 1024 / len(encoded)) + 0.5))
+
+
+def io_description():
+    """Compute's /io answer for a definition with the app's parameters."""
+    inputs = []
+    for name, (low, high) in INPUT_RANGES.items():
+        default = low if name in INTEGER_PARAMS else (low + high) / 2
+        inputs.append({
+            "Name": name, "ParamType": "Number", "Minimum": low, "Maximum": high,
+            "Default": {"InnerTree": {"{0}": [{"type": "System.Double", "data": str(default)}]}},
+        })
+    for name in TEXT_INPUTS:
+        inputs.append({"Name": name, "ParamType": "Text", "Default": {"InnerTree": {}}})
+    return {
+        "InputNames": [item["Name"] for item in inputs],
+        "OutputNames": [f"RH_OUT:{name}" for name in OUTPUT_NAMES],
+        "Inputs": inputs,
+        "Outputs": [{"Name": f"RH_OUT:{name}", "ParamType": "Geometry"} for name in OUTPUT_NAMES],
+    }
+
+
+class FakeCompute:
+    """
+    Serves the fake Compute API from a background thread. ``calls`` counts
+    the requests per path, so benchmarks can tell how many solves got past
+    the app's caches.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.0, io_latency=0.01, payload_kb=64):
+        self.latency = latency
+        self.jitter = jitter
+        self.io_latency = io_latency
+        self.terrain = terrain_mesh(payload_kb)
+        self.definitions = set()
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/healthcheck":
+                    self.send(200, b"healthy", "text/plain")
+                else:
+                    self.send(404, b"Not found", "text/plain")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, content = fake.handle(self.path.rstrip("/"), body)
+                self.send(status, content, "application/json" if status == 200 else "text/plain")
+
+            def send(self, status, content, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, path, body):
+        with self._lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+        if path not in ("/grasshopper", "/io"):
+            return 404, b"Not found"
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, b"Invalid JSON"
+
+        if data.get("algo"):
+            pointer = "md5_" + hashlib.md5(data["algo"].encode()).hexdigest().upper()
+            with self._lock:
+                self.definitions.add(pointer)
+        elif data.get("pointer") in self.definitions:
+            pointer = data["pointer"]
+        else:
+            return 500, b"Unable to find definition"
+
+        if path == "/io":
+            time.sleep(self.io_latency)
+            return 200, json.dumps({"CacheKey": pointer, **io_description()}).encode()
+
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        inputs = {}
+        for value in data.get("values") or []:
+            for branch in value.get("InnerTree", {}).values():
+                if branch:
+                    inputs[value.get("ParamName")] = branch[0].get("data")
+        values = [
+            {"ParamName": "RH_OUT:meshb64",
+             "InnerTree": {"{0}": [{"type": "Rhino.Geometry.Mesh", "data": self.terrain}]}},
+            {"ParamName": "RH_OUT:meshout",
+             "InnerTree": {"{0}": [{"type": "Rhino.Geometry.Mesh", "data": json.dumps(massing_mesh(inputs).Encode())}]}},
+        ]
+        return 200, json.dumps({"pointer": pointer, "values": values, "errors": [], "warnings": []}).encode()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,178 @@
+"""
+Plain geometry helpers for project sites.
+
+``site_bounds`` is GeoJSON in lng/lat, as drawn with Mapbox Draw.
+``site_envelope`` holds points in Mapbox's normalized Web Mercator units
+(0..1 across the world), as produced by ``mapboxgl.MercatorCoordinate``.
+
+``envelope_vertices`` turns a site envelope into the ``x,y,z;...`` string
+the Grasshopper definition takes: metres east and north of the first point,
+measured the way the browser used to with turf.js, after Douglas-Peucker
+simplification.
+"""
+import math
+
+EARTH_RADIUS_M = 6371008.8  # mean radius, the same one turf.js uses
+
+
+def mercator_to_lnglat(x, y):
+    """Converts normalized Web Mercator coordinates to (lng, lat) degrees."""
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y))))
+    return lng, lat
+
+
+def haversine_distance(lng1, lat1, lng2, lat2):
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _geojson_positions(value):
+    """Yields every (lng, lat) position in a GeoJSON object or coordinates array."""
+    if isinstance(value, dict):
+        if "coordinates" in value:
+            yield from _geojson_positions(value["coordinates"])
+        elif value.get("type") == "GeometryCollection":
+            for geometry in value.get("geometries", []):
+                yield from _geojson_positions(geometry)
+        elif "features" in value:
+            for feature in value["features"]:
+                yield from _geojson_positions(feature)
+        elif "geometry" in value:
+            yield from _geojson_positions(value["geometry"])
+    elif isinstance(value, list) and value:
+        if isinstance(value[0], (int, float)):
+            if len(value) >= 2:
+                yield value[0], value[1]
+        else:
+            for item in value:
+                yield from _geojson_positions(item)
+
+
+def _envelope_positions(envelope):
+    if not isinstance(envelope, dict):
+        return
+    for point in envelope.get("points", []):
+        try:
+            yield mercator_to_lnglat(float(point["x"]), float(point["y"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def bbox_of(positions):
+    """(west, south, east, north) of some (lng, lat) positions, or None if there are none."""
+    west = south = math.inf
+    east = north = -math.inf
+    for lng, lat in positions:
+        west, east = min(west, lng), max(east, lng)
+        south, north = min(south, lat), max(north, lat)
+    if west == math.inf:
+        return None
+    return west, south, east, north
+
+
+def site_bbox(site_bounds, site_envelope):
+    """Bounding box of a project's site bounds and envelope together."""
+    def positions():
+        yield from _geojson_positions(site_bounds)
+        yield from _envelope_positions(site_envelope)
+    return bbox_of(positions())
+
+
+def radius_bbox(lng, lat, radius_m):
+    """A box that contains every point within ``radius_m`` of (lng, lat)."""
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = math.cos(math.radians(lat))
+    d_lng = 180.0 if cos_lat < 1e-9 else min(180.0, d_lat / cos_lat)
+    return lng - d_lng, max(-90.0, lat - d_lat), lng + d_lng, min(90.0, lat + d_lat)
+
+
+def distance_to_bbox(lng, lat, bbox):
+    """Distance in meters from a point to the nearest point of a bbox (0 inside)."""
+    west, south, east, north = bbox
+    return haversine_distance(lng, lat, min(max(lng, west), east), min(max(lat, south), north))
+
+
+def _envelope_points(envelope):
+    if not isinstance(envelope, dict):
+        return []
+    points = []
+    for point in envelope.get("points", []):
+        try:
+            points.append((float(point["x"]), float(point["y"]), float(point.get("z") or 0)))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return points
+
+
+def local_coordinates(points):
+    """
+    Projects Web Mercator (x, y, z) points to metres east/north of the first
+    one, using great-circle distances along the parallel and meridian.
+    """
+    if not points:
+        return []
+    origin_x, origin_y, origin_z = points[0]
+    origin_lng, origin_lat = mercator_to_lnglat(origin_x, origin_y)
+    local = []
+    for x, y, z in points:
+        lng, lat = mercator_to_lnglat(x, y)
+        east = haversine_distance(origin_lng, origin_lat, lng, origin_lat)
+        north = haversine_distance(origin_lng, origin_lat, origin_lng, lat)
+        local.append((
+            east if lng >= origin_lng else -east,
+            north if lat >= origin_lat else -north,
+            z - origin_z,
+        ))
+    return local
+
+
+def _segment_distance(point, start, end):
+    """Distance in the xy plane from a point to the segment start-end."""
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length_squared))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+def simplify(points, tolerance):
+    """
+    Douglas-Peucker simplification in the xy plane. Keeps the first and last
+    points; a closed ring stays closed.
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, farthest_distance = None, tolerance
+        for i in range(first + 1, last):
+            distance = _segment_distance(points[i], points[first], points[last])
+            if distance > farthest_distance:
+                farthest, farthest_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def envelope_vertices(site_envelope, tolerance=0.0, decimals=3):
+    """
+    The ``x,y,z;...`` vertex string for a site envelope, or "" if it has
+    fewer than two points.
+    """
+    points = _envelope_points(site_envelope)
+    if len(points) < 2:
+        return ""
+    local = simplify(local_coordinates(points), tolerance)
+    # + 0.0 turns -0.0 into 0.0
+    return ";".join(",".join(f"{round(value, decimals) + 0.0:.{decimals}f}" for value in point) for point in local)
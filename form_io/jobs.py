@@ -0,0 +1,265 @@
+"""
+Solve job queue.
+
+Solves that may outlast a proxy's timeout can be submitted as jobs instead:
+``submit`` stores a SolveJob and returns at once, and the client polls or
+long-polls /api/rhino/jobs/<id>/ until it is finished. Jobs live in the
+database, so the queue survives restarts and is shared by every process
+using it.
+
+``JobQueue`` runs them on worker threads. Workers take the queued job with
+the lowest priority value, oldest first (see SOLVE_JOB_PRIORITIES), so
+interactive jobs overtake batch ones. Taking a job is a conditional UPDATE,
+which lets any number of processes work the same queue. At most
+SOLVE_JOB_CONCURRENCY_PER_NODE jobs per healthy Compute node are solved at
+once, counted across all processes in the same UPDATE, leaving the nodes
+free for the direct solve endpoints. Jobs go through
+solver.solve, so they share its cache and in-flight deduplication.
+
+Workers start in the web process on first use unless
+SOLVE_JOB_WORKERS_IN_PROCESS is off, in which case ``manage.py
+run_solve_jobs`` runs them. Jobs left running by a process that died are
+requeued after SOLVE_JOB_STALE_AFTER, or failed once they have been started
+SOLVE_JOB_MAX_ATTEMPTS times, and finished jobs are deleted after
+SOLVE_JOB_RETENTION.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from django.db.models import Count, F, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+
+from .compute_client import ComputeError, compute
+from .definitions import registry
+from .metrics import metrics
+from .models import SolveJob
+from .solve_cache import solve_cache, solve_key
+from .solver import build_values, solve
+
+logger = logging.getLogger(__name__)
+
+job_wait_seconds = metrics.histogram(
+    "form_io_solve_job_wait_seconds", "Time solve jobs spend queued, by priority.", ["priority"],
+)
+jobs_total = metrics.counter(
+    "form_io_solve_jobs_total", "Solve jobs finished, by outcome.", ["outcome"],
+)
+
+
+def parse_priority(value):
+    """A priority name from SOLVE_JOB_PRIORITIES or a number; ValueError otherwise."""
+    if value in (None, ""):
+        return settings.SOLVE_JOB_PRIORITIES["interactive"]
+    if value in settings.SOLVE_JOB_PRIORITIES:
+        return settings.SOLVE_JOB_PRIORITIES[value]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        names = ", ".join(settings.SOLVE_JOB_PRIORITIES)
+        raise ValueError(f"priority must be one of {names} or a number")
+
+
+def submit(definition, inputs, priority):
+    """
+    Queues a solve of ``definition`` with canonical ``inputs``. A solve that
+    is already in the solve cache is stored as a finished job right away.
+    """
+    cached = solve_cache.get(solve_key(definition.digest, build_values(inputs)))
+    if cached is not None:
+        now = timezone.now()
+        jobs_total.inc("cached")
+        return SolveJob.objects.create(
+            definition=definition.name, inputs=inputs, priority=priority,
+            status=SolveJob.DONE, result=cached, started_at=now, finished_at=now,
+        )
+    job = SolveJob.objects.create(definition=definition.name, inputs=inputs, priority=priority)
+    job_queue.notify()
+    return job
+
+
+def queue_position(job):
+    """How many queued jobs will run before ``job``."""
+    return SolveJob.objects.filter(status=SolveJob.QUEUED).filter(
+        Q(priority__lt=job.priority) | Q(priority=job.priority, created_at__lt=job.created_at)
+    ).count()
+
+
+class JobQueue:
+    def __init__(self, per_node, poll_interval):
+        self.per_node = per_node
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)      # new jobs, or a slot freed up
+        self._finished = threading.Condition(self._lock)  # a job finished, for long-polls
+        self._running = 0
+        self._last_maintenance = 0.0
+
+    def capacity(self):
+        healthy = sum(1 for node in compute.status() if node["healthy"])
+        return self.per_node * max(healthy, 1)
+
+    def start(self):
+        """Starts a worker per possible job slot, once per process."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"solve-job-{n}", daemon=True)
+                for n in range(self.per_node * len(compute.nodes))
+            ]
+        self.requeue_stale()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._work.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+
+    def notify(self):
+        with self._lock:
+            self._work.notify()
+
+    def wait(self, job_id, timeout):
+        """
+        Returns the job once it has finished or ``timeout`` seconds have
+        passed. Raises SolveJob.DoesNotExist.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = SolveJob.objects.defer("result").get(pk=job_id)
+            remaining = deadline - time.monotonic()
+            if job.status in SolveJob.FINISHED or remaining <= 0:
+                return job
+            # Woken when a worker in this process finishes a job; jobs run by
+            # other processes are noticed on the next check
+            with self._lock:
+                self._finished.wait(min(remaining, self.poll_interval))
+
+    def claim(self):
+        """
+        Marks the next queued job as running and returns it, or None if there
+        is none or capacity() jobs are already running in any process.
+        """
+        running = (
+            SolveJob.objects.filter(status=SolveJob.RUNNING)
+            .values("status").annotate(count=Count("pk")).values("count")
+        )
+        below_capacity = LessThan(Coalesce(Subquery(running), 0), self.capacity())
+        while True:
+            job_id = (
+                SolveJob.objects.filter(status=SolveJob.QUEUED)
+                .order_by("priority", "created_at")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if job_id is None:
+                return None
+            claimed = SolveJob.objects.filter(below_capacity, pk=job_id, status=SolveJob.QUEUED).update(
+                status=SolveJob.RUNNING, started_at=timezone.now(), attempts=F("attempts") + 1,
+            )
+            if claimed:
+                return SolveJob.objects.get(pk=job_id)
+            if SolveJob.objects.filter(pk=job_id, status=SolveJob.QUEUED).exists():
+                return None  # every slot is taken
+            # Another worker took it first
+
+    def run(self, job):
+        job_wait_seconds.observe((job.started_at - job.created_at).total_seconds(), str(job.priority))
+        fields = {}
+        try:
+            definition = registry.get(job.definition)
+            if definition is None:
+                raise ComputeError(f"File {job.definition} not found.", status=404)
+            fields.update(status=SolveJob.DONE, result=solve(definition, job.inputs))
+        except ComputeError as e:
+            fields.update(status=SolveJob.FAILED, error=str(e), error_status=e.status)
+        except Exception as e:
+            logger.exception("Solve job %s failed", job.pk)
+            fields.update(status=SolveJob.FAILED, error=str(e), error_status=500)
+        fields["finished_at"] = timezone.now()
+        # A job cancelled or requeued in the meantime is left alone
+        SolveJob.objects.filter(pk=job.pk, status=SolveJob.RUNNING).update(**fields)
+        jobs_total.inc(fields["status"])
+        with self._lock:
+            self._finished.notify_all()
+
+    def requeue_stale(self):
+        """Requeues jobs left running by a process that died, failing those started too often."""
+        now = timezone.now()
+        stale = SolveJob.objects.filter(
+            status=SolveJob.RUNNING, started_at__lt=now - timedelta(seconds=settings.SOLVE_JOB_STALE_AFTER),
+        )
+        failed = stale.filter(attempts__gte=settings.SOLVE_JOB_MAX_ATTEMPTS).update(
+            status=SolveJob.FAILED, finished_at=now, error_status=504,
+            error=f"Job did not finish in {settings.SOLVE_JOB_MAX_ATTEMPTS} attempts.",
+        )
+        if failed:
+            jobs_total.inc(SolveJob.FAILED, amount=failed)
+            logger.warning("Failed %d solve jobs left running too often", failed)
+        requeued = stale.update(status=SolveJob.QUEUED, started_at=None)
+        if requeued:
+            logger.warning("Requeued %d solve jobs left running", requeued)
+
+    def prune(self):
+        cutoff = timezone.now() - timedelta(seconds=settings.SOLVE_JOB_RETENTION)
+        SolveJob.objects.filter(status__in=SolveJob.FINISHED, finished_at__lt=cutoff).delete()
+
+    def _maintain(self):
+        with self._lock:
+            if time.monotonic() - self._last_maintenance < 60:
+                return
+            self._last_maintenance = time.monotonic()
+        self.requeue_stale()
+        self.prune()
+
+    def _worker(self):
+        while not self._stop.is_set():
+            with self._lock:
+                while self._running >= self.capacity() and not self._stop.is_set():
+                    self._work.wait(self.poll_interval)
+                self._running += 1
+            job = None
+            try:
+                close_old_connections()
+                self._maintain()
+                job = self.claim()
+                if job is not None:
+                    self.run(job)
+            except OperationalError as e:
+                logger.warning("Solve job queue database error: %s", e)
+            except Exception:
+                logger.exception("Solve job worker error")
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._work.notify()
+                    if job is None and not self._stop.is_set():
+                        self._work.wait(self.poll_interval)
+        close_old_connections()
+
+
+job_queue = JobQueue(settings.SOLVE_JOB_CONCURRENCY_PER_NODE, settings.SOLVE_JOB_POLL_INTERVAL)
+
+
+@metrics.collector
+def job_queue_metrics():
+    counts = {}
+    for status, priority in SolveJob.objects.filter(status__in=(SolveJob.QUEUED, SolveJob.RUNNING)).values_list("status", "priority"):
+        counts[status, priority] = counts.get((status, priority), 0) + 1
+    return [
+        ("form_io_solve_jobs", "gauge", "Solve jobs queued or running, by priority.",
+         [({"status": status, "priority": priority}, count) for (status, priority), count in sorted(counts.items())]),
+    ]
@@ -0,0 +1,279 @@
+"""
+Live editing channel: one WebSocket per open project.
+
+Instead of a solve POST and a save POST per slider tick, the editor keeps a
+WebSocket open to ``/ws/projects/<id>/live/?definition=<file>&quantize=1``
+and streams its inputs as JSON text frames::
+
+    {"type": "inputs", "seq": 1, "inputs": {...}}     all inputs, sent first
+    {"type": "inputs", "seq": 2, "patch": [...]}      a JSON Patch against them
+    {"type": "ping"}
+
+An inputs message may carry ``"base"``, the seq of the result the client
+is showing, to have meshes unchanged since then sent as markers (see
+deltas.py).
+
+Each channel runs one pipeline. Inputs that arrive while a solve runs are
+merged, and only the latest are solved next, so a fast slider never queues
+stale solves. Every solve is answered with a text frame followed by a
+binary frame of packed meshes (see meshes.py)::
+
+    {"type": "result", "seq": 2, "base": 1, "canonical_inputs": {...}}
+    <packed meshes>
+
+The same pipeline autosaves the inputs, at most every LIVE_SAVE_INTERVAL
+seconds and once more when the socket closes, and acknowledges each save
+with ``{"type": "saved", "seq": 2, "updated": [...]}``. Failures, of
+solves and of saves (which are retried), are sent as
+``{"type": "error", "seq": ..., "error": ..., "errors": {...}}``.
+
+This is plain ASGI, routed by blogProject/asgi.py. It needs an ASGI server
+with WebSocket support, such as ``uvicorn[standard]``; the editor falls
+back to the HTTP endpoints when the socket can't be opened.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import re
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http.request import split_domain_port, validate_host
+
+from .compute_client import ComputeError
+from .definitions import registry
+from .deltas import delta_meshes, output_hashes
+from .metrics import metrics
+from .models import Project
+from .parameters import ParameterError, canonical_inputs, clean_inputs, with_project_envelope
+from .project_store import PatchError, apply_json_patch, store_project_fields
+from .views import solve_mesh_body, stored_envelope_vertices
+
+logger = logging.getLogger(__name__)
+
+LIVE_PATH = re.compile(r"^/ws/projects/(?P<project_id>\d+)/live/$")
+MESSAGE_TYPES = ("inputs", "ping")
+
+live_messages_total = metrics.counter(
+    "form_io_live_messages_total", "Live channel messages, by direction and type.", ["direction", "type"],
+)
+
+# Open channels in this process
+_channels = set()
+
+
+@metrics.collector
+def live_channel_metrics():
+    return [("form_io_live_channels", "gauge", "Open live editing channels.", [({}, len(_channels))])]
+
+
+def database_sync_to_async(function):
+    """Like sync_to_async, closing stale connections as a request would."""
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run)
+
+
+def origin_allowed(scope):
+    """
+    Browsers send cookies with cross-site WebSocket handshakes, so only
+    pages from this site's own hosts may connect. Clients that send no
+    Origin, which browsers always do, are let through.
+    """
+    headers = dict(scope.get("headers") or [])
+    origin = headers.get(b"origin")
+    if origin is None:
+        return True
+    host, _ = split_domain_port(urlsplit(origin.decode("latin-1")).netloc)
+    if not host:
+        return False
+    own_host, _ = split_domain_port(headers.get(b"host", b"").decode("latin-1"))
+    if host == own_host:
+        return True
+    allowed = settings.ALLOWED_HOSTS or (["localhost", "127.0.0.1", "[::1]"] if settings.DEBUG else [])
+    return validate_host(host, allowed)
+
+
+def project_exists(project_id):
+    return Project.objects.filter(pk=project_id).exists()
+
+
+def solve_inputs(project_id, inputs):
+    """The inputs a project's solve runs with, as read_solve_inputs makes them."""
+    return canonical_inputs(with_project_envelope(inputs, stored_envelope_vertices(project_id)))
+
+
+def solve_meshes(definition, inputs, quantize):
+    return gzip.decompress(solve_mesh_body(definition, inputs, quantize))
+
+
+class LiveChannel:
+    def __init__(self, project_id, definition, quantize, send):
+        self.project_id = project_id
+        self.definition = definition
+        self.quantize = quantize
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self.inputs = None
+        self.seq = 0
+        self.base = 0               # seq of the result the client shows, for deltas
+        self.session = ("live", uuid.uuid4().hex)
+        self.changed = asyncio.Event()
+        self.dirty = False          # inputs not saved yet
+        self.last_saved = 0.0
+
+    async def send(self, message, data=None):
+        """Sends a message, and the binary frame that belongs to it right after."""
+        async with self._send_lock:
+            await self._send({"type": "websocket.send", "text": json.dumps(message)})
+            if data is not None:
+                await self._send({"type": "websocket.send", "bytes": data})
+        live_messages_total.inc("out", message["type"])
+
+    async def send_error(self, seq, error, errors=None):
+        await self.send({"type": "error", "seq": seq, "error": error, "errors": errors or {}})
+
+    async def receive(self, text):
+        try:
+            message = json.loads(text)
+            kind = message["type"]
+        except (TypeError, ValueError, KeyError):
+            await self.send_error(None, "Expected a JSON object with a type.")
+            return
+        live_messages_total.inc("in", kind if kind in MESSAGE_TYPES else "unknown")
+
+        if kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind == "inputs":
+            await self.update(message)
+        else:
+            await self.send_error(message.get("seq"), f"Unknown message type {kind!r}.")
+
+    async def update(self, message):
+        seq = message.get("seq")
+        if not isinstance(seq, int) or seq <= self.seq:
+            return  # out of order, a newer update already arrived
+        try:
+            if "inputs" in message:
+                inputs = message["inputs"]
+            elif self.inputs is None:
+                raise ParameterError({"inputs": "send all inputs before a patch"})
+            else:
+                inputs = apply_json_patch(self.inputs, message.get("patch") or [])
+            clean_inputs(inputs)
+        except ParameterError as e:
+            await self.send_error(seq, str(e), e.errors)
+            return
+        except PatchError as e:
+            await self.send_error(seq, str(e))
+            return
+        self.inputs, self.seq = inputs, seq
+        if isinstance(message.get("base"), int):
+            self.base = message["base"]
+        self.dirty = True
+        self.changed.set()
+
+    async def run_pipeline(self):
+        """Solves the latest inputs whenever they change, saving them along the way."""
+        while True:
+            timeout = None
+            if self.dirty:
+                timeout = max(self.last_saved + settings.LIVE_SAVE_INTERVAL - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self.changed.is_set():
+                self.changed.clear()
+                await self.solve(self.seq, self.inputs, self.base)
+            if self.dirty and time.monotonic() - self.last_saved >= settings.LIVE_SAVE_INTERVAL:
+                await self.save()
+
+    async def solve(self, seq, inputs, base):
+        try:
+            inputs = await database_sync_to_async(solve_inputs)(self.project_id, inputs)
+            data = await sync_to_async(solve_meshes, thread_sensitive=False)(self.definition, inputs, self.quantize)
+            data, _ = delta_meshes(data, self.session, seq, base)
+        except ParameterError as e:
+            await self.send_error(seq, str(e), e.errors)
+        except ComputeError as e:
+            logger.warning("Compute server error: %s", e)
+            await self.send_error(seq, str(e))
+        except Exception as e:
+            logger.exception("Live solve for project %s failed", self.project_id)
+            await self.send_error(seq, str(e))
+        else:
+            await self.send({"type": "result", "seq": seq, "base": base, "canonical_inputs": inputs}, data)
+
+    async def save(self, acknowledge=True):
+        seq, inputs = self.seq, self.inputs
+        self.dirty = False
+        self.last_saved = time.monotonic()
+        try:
+            updated = await database_sync_to_async(store_project_fields)(self.project_id, {"inputs": inputs})
+        except asyncio.CancelledError:
+            self.dirty = True  # the socket closed mid-save, which may not have run; the final save repeats it
+            raise
+        except Exception as e:
+            logger.warning("Live save for project %s failed: %s", self.project_id, e)
+            self.dirty = True
+            if acknowledge:
+                await self.send_error(seq, f"Could not save the inputs: {e}")
+            return
+        if acknowledge:
+            await self.send({"type": "saved", "seq": seq, "updated": updated})
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI application for the live channel's WebSocket connections."""
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    match = LIVE_PATH.match(scope["path"])
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    definition = registry.get(query.get("definition", [""])[0])
+    if match is None or definition is None:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+    if not origin_allowed(scope):
+        await send({"type": "websocket.close", "code": 4403})
+        return
+    project_id = int(match["project_id"])
+    if not await database_sync_to_async(project_exists)(project_id):
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    await send({"type": "websocket.accept"})
+    channel = LiveChannel(project_id, definition, query.get("quantize") == ["1"], send)
+    _channels.add(channel)
+    pipeline = asyncio.create_task(channel.run_pipeline())
+    try:
+        await channel.send({"type": "ready", "project_id": project_id, "definition": definition.name})
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message["type"] == "websocket.receive" and message.get("text") is not None:
+                await channel.receive(message["text"])
+    finally:
+        pipeline.cancel()
+        try:
+            await pipeline
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception("Live channel for project %s failed", project_id)
+        _channels.discard(channel)
+        output_hashes.forget(channel.session)
+        if channel.dirty:
+            await channel.save(acknowledge=False)
@@ -0,0 +1,155 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from form_io.benchmark import compare, load_baselines, load_sessions, replay, save_baseline, summarize
+from form_io.fake_compute import FakeCompute
+from form_io.models import Project
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise CommandError(f"Server did not come up at {url}")
+            time.sleep(0.2)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays recorded editor sessions against the solve, params and save endpoints with concurrent "
+        "users and reports latency percentiles, throughput and bytes per endpoint. By default starts the "
+        "app with runserver against a fake Compute, so it runs offline. Creates its own projects and "
+        "deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sessions", nargs="*", help="Session files (default: benchmarks/sessions/*.jsonl)")
+        parser.add_argument("--users", type=int, default=8, help="Concurrent users")
+        parser.add_argument("--repeat", type=int, default=1, help="Sessions each user plays")
+        parser.add_argument("--speed", type=float, default=1.0,
+                            help="Multiplier for the recorded think time, 0 sends requests back to back")
+        parser.add_argument("--distinct", action="store_true", help="Keep users from sharing cached solves")
+        parser.add_argument("--base-url", help="Benchmark a server that is already running instead")
+        parser.add_argument("--compute-url", help="Start the server against this Compute instead of the fake")
+        parser.add_argument("--latency", type=float, default=0.05, help="Fake Compute seconds per solve")
+        parser.add_argument("--jitter", type=float, default=0.02, help="Fake Compute extra seconds per solve, at most")
+        parser.add_argument("--payload-kb", type=int, default=64, help="Fake Compute mesh size per solve")
+        parser.add_argument("--baseline", help="Compare against this stored baseline and fail on regressions")
+        parser.add_argument("--save-baseline", help="Store the results as a baseline under this name")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline")
+        parser.add_argument("--baselines-file", default=settings.BENCHMARK_BASELINES_FILE)
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        paths = options["sessions"] or sorted((Path(settings.BASE_DIR) / "benchmarks" / "sessions").glob("*.jsonl"))
+        if not paths:
+            raise CommandError("No session files given or found in benchmarks/sessions/")
+        sessions = load_sessions(paths)
+        baseline = None
+        if options["baseline"]:
+            baseline = load_baselines(options["baselines_file"]).get(options["baseline"])
+            if baseline is None:
+                raise CommandError(f"No baseline named {options['baseline']!r} in {options['baselines_file']}")
+
+        config = {
+            "sessions": [Path(path).name for path in paths],
+            "users": options["users"], "repeat": options["repeat"],
+            "speed": options["speed"], "distinct": options["distinct"],
+        }
+        fake = server = None
+        prefix = f"__benchmark_{uuid.uuid4().hex[:8]}"
+        try:
+            base_url = options["base_url"]
+            if base_url is None:
+                compute_url = options["compute_url"]
+                if compute_url is None:
+                    fake = FakeCompute(latency=options["latency"], jitter=options["jitter"],
+                                       payload_kb=options["payload_kb"]).start()
+                    compute_url = fake.url
+                    config["fake_compute"] = {key: options[key] for key in ("latency", "jitter", "payload_kb")}
+                port = free_port()
+                base_url = f"http://127.0.0.1:{port}"
+                env = {**os.environ, "RHINO_COMPUTE_URLS": compute_url, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+                server = subprocess.Popen(
+                    [sys.executable, str(Path(settings.BASE_DIR) / "manage.py"), "runserver", f"127.0.0.1:{port}", "--noreload"],
+                    env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                wait_for(f"{base_url}/api/rhino/cache/", timeout=30)
+
+            project_ids = [
+                Project.objects.create(name=f"{prefix}_{n}", inputs={}).id for n in range(options["users"])
+            ]
+            samples, elapsed = replay(
+                base_url, sessions, project_ids, repeat=options["repeat"],
+                speed=options["speed"], distinct=options["distinct"],
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if fake is not None:
+                fake.stop()
+            Project.objects.filter(name__startswith=prefix).delete()
+
+        report = summarize(samples, elapsed)
+        if options["json"]:
+            self.stdout.write(json.dumps({"config": config, "endpoints": report}, indent=2))
+        else:
+            self.print_report(base_url, config, report, elapsed, fake)
+
+        if options["save_baseline"]:
+            save_baseline(options["baselines_file"], options["save_baseline"], report, config)
+            self.stdout.write(f"Saved baseline {options['save_baseline']!r} to {options['baselines_file']}")
+        if baseline is not None:
+            if baseline["config"] != config:
+                self.stdout.write(self.style.WARNING(f"Baseline was recorded with {baseline['config']}"))
+            regressions = compare(report, baseline, options["tolerance"])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(f"regression: {line}"))
+                raise CommandError(f"{len(regressions)} regression(s) against baseline {options['baseline']!r}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against baseline {options['baseline']!r}"))
+
+    def print_report(self, base_url, config, report, elapsed, fake):
+        self.stdout.write(f"server:   {base_url}")
+        if fake is not None:
+            self.stdout.write(
+                f"compute:  fake, {config['fake_compute']['latency'] * 1000:.0f} ms per solve "
+                f"(+{config['fake_compute']['jitter'] * 1000:.0f} ms), {config['fake_compute']['payload_kb']} KB meshes"
+            )
+        self.stdout.write(
+            f"load:     {len(config['sessions'])} file(s), {config['users']} users x {config['repeat']} session(s), "
+            f"speed {config['speed']}, {elapsed:.2f}s"
+        )
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<24}{'requests':>9}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                          f"{'req/s':>8}{'sent KB':>9}{'recv KB':>10}")
+        for endpoint, row in report.items():
+            self.stdout.write(
+                f"{endpoint:<24}{row['requests']:>9}{row['errors']:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{row['p99_ms']:>9.1f}{row['throughput']:>8.1f}{row['bytes_sent'] / 1024:>9.1f}"
+                f"{row['bytes_received'] / 1024:>10.1f}"
+            )
+        if fake is not None:
+            self.stdout.write("")
+            self.stdout.write("compute calls: " + ", ".join(f"{path} {count}" for path, count in sorted(fake.calls.items())))
@@ -0,0 +1,80 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+
+from form_io.benchmark import percentile
+from form_io.models import Project
+from form_io.project_store import save_project_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures project autosave throughput under concurrent writers against the configured "
+        "database. Creates its own projects and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16, help="Concurrent writers")
+        parser.add_argument("--writes", type=int, default=100, help="Saves per writer")
+        parser.add_argument("--projects", type=int, default=4, help="Projects the writers share")
+
+    def handle(self, *args, **options):
+        prefix = f"__benchmark_{uuid.uuid4().hex[:8]}"
+        project_ids = [
+            Project.objects.create(name=f"{prefix}_{i}", inputs={}, site_bounds={"features": [[0, 0]] * 200}).id
+            for i in range(options["projects"])
+        ]
+        # Nothing else should hold the database while the writers run
+        connection.close()
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def writer(number):
+            own_latencies, own_errors = [], []
+            try:
+                for i in range(options["writes"]):
+                    project_id = project_ids[(number + i) % len(project_ids)]
+                    started = time.perf_counter()
+                    try:
+                        save_project_fields(project_id, {}, [{"op": "add", "path": f"/writer_{number}", "value": i}])
+                        own_latencies.append(time.perf_counter() - started)
+                    except OperationalError as e:
+                        own_errors.append(str(e))
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(own_latencies)
+                    errors.extend(own_errors)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        vendor = connection.vendor
+        if vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                vendor += f" (journal_mode={cursor.fetchone()[0]})"
+        Project.objects.filter(name__startswith=prefix).delete()
+
+        latencies.sort()
+        attempted = options["threads"] * options["writes"]
+        self.stdout.write(f"database:   {vendor}")
+        self.stdout.write(f"writers:    {options['threads']} threads x {options['writes']} saves over {len(project_ids)} projects")
+        self.stdout.write(f"succeeded:  {len(latencies)}/{attempted} ({len(errors)} failed)")
+        self.stdout.write(f"throughput: {len(latencies) / elapsed:.0f} saves/s in {elapsed:.2f}s")
+        self.stdout.write(
+            "latency:    p50 {:.1f} ms  p95 {:.1f} ms  p99 {:.1f} ms".format(
+                *(percentile(latencies, p) * 1000 for p in (0.5, 0.95, 0.99))
+            )
+        )
+        if errors:
+            self.stdout.write(f"first error: {errors[0]}")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from form_io.fake_compute import FakeCompute
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a stand-in for Rhino Compute that answers /grasshopper and /io with generated meshes. "
+        "Point the app at it with RHINO_COMPUTE_URLS=http://127.0.0.1:<port>."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=6001)
+        parser.add_argument("--latency", type=float, default=0.05, help="Seconds each solve takes")
+        parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per solve")
+        parser.add_argument("--io-latency", type=float, default=0.01, help="Seconds each /io request takes")
+        parser.add_argument("--payload-kb", type=int, default=64, help="Size of the terrain mesh in every solve")
+
+    def handle(self, *args, **options):
+        fake = FakeCompute(
+            options["host"], options["port"], latency=options["latency"], jitter=options["jitter"],
+            io_latency=options["io_latency"], payload_kb=options["payload_kb"],
+        )
+        self.stdout.write(f"Fake Compute listening on {fake.url} (Ctrl+C to stop)")
+        fake.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            fake.stop()
+            self.stdout.write(f"Requests served: {fake.calls}")
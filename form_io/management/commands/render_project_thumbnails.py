@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from form_io.models import Project
+from form_io.thumbnails import update_thumbnail
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders project thumbnails now, for projects saved before thumbnails existed or after "
+        "changing the renderer. Solves each project's inputs, so Rhino Compute must be reachable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_ids", nargs="*", type=int, help="Projects to render (default: all)")
+        parser.add_argument("--missing", action="store_true", help="Only projects without a thumbnail")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by("id")
+        if options["project_ids"]:
+            projects = projects.filter(id__in=options["project_ids"])
+        if options["missing"]:
+            projects = projects.filter(thumbnail="")
+
+        rendered, failed = 0, 0
+        for project_id in projects.values_list("id", flat=True):
+            try:
+                name = update_thumbnail(project_id)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Project {project_id}: {e}")
+                continue
+            if name:
+                rendered += 1
+                self.stdout.write(f"Project {project_id}: {name}")
+            else:
+                self.stdout.write(f"Project {project_id}: no meshes to draw")
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} thumbnails ({failed} failed)"))
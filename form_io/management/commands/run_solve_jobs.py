@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from form_io.jobs import job_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs solve job workers in this process until interrupted. Use it with "
+        "SOLVE_JOB_WORKERS_IN_PROCESS=0 to keep solve jobs out of the web processes."
+    )
+
+    def handle(self, *args, **options):
+        job_queue.start()
+        self.stdout.write(
+            f"Running solve jobs, {job_queue.per_node} per healthy Compute node (Ctrl+C to stop)"
+        )
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stdout.write("Waiting for running jobs to finish")
+            job_queue.stop()
@@ -0,0 +1,102 @@
+import gzip
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from form_io.compute_client import ComputeError
+from form_io.definitions import registry
+from form_io.design_space import context_digest, grid_samples, latin_hypercube_samples, split_inputs
+from form_io.meshes import decode_meshes, mesh_metrics, pack_meshes
+from form_io.models import DesignSample
+from form_io.parameters import canonical_inputs
+from form_io.solve_cache import solve_key
+from form_io.solver import build_values, solve
+
+
+class Command(BaseCommand):
+    help = (
+        "Solves a grid or Latin-hypercube sample of the design space through Rhino Compute "
+        "and stores the results, so sliders can show the nearest one as an instant preview."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("definition", help="Grasshopper file name in GRASSHOPPER_FILES_DIR")
+        parser.add_argument("--method", choices=["lhs", "grid"], default="lhs")
+        parser.add_argument("--samples", type=int, default=200,
+                            help="Latin-hypercube samples per building type (lhs)")
+        parser.add_argument("--steps", type=int, default=3,
+                            help="Values per parameter (grid); the grid grows as steps^6")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=settings.RHINO_COMPUTE_POOL_SIZE,
+                            help="Solves kept in flight at once")
+        parser.add_argument("--context", default="{}",
+                            help="JSON of the other definition inputs to hold fixed, e.g. envelope_vertices")
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        definition = registry.get(options["definition"])
+        if definition is None:
+            raise CommandError(f"File {options['definition']} not found.")
+        try:
+            # Rounded the way the solve endpoints round it, so previews match
+            context = canonical_inputs(json.loads(options["context"]))
+        except ValueError as e:
+            raise CommandError(f"--context is not valid: {e}")
+        context_hash = context_digest(context)
+
+        if options["method"] == "grid":
+            samples = grid_samples(options["steps"])
+        else:
+            samples = latin_hypercube_samples(options["samples"], seed=options["seed"])
+
+        # Skip samples already stored by an earlier run
+        existing = set(DesignSample.objects.filter(definition_digest=definition.digest)
+                       .values_list("solve_key", flat=True))
+        todo = {}
+        for params in samples:
+            inputs = canonical_inputs({**context, **params})
+            key = solve_key(definition.digest, build_values(inputs))
+            if key not in existing:
+                todo[key] = split_inputs(inputs)[0]
+        self.stdout.write(f"{len(todo)} samples to solve ({len(existing)} already stored)")
+
+        started = time.monotonic()
+        pending, stored, failed = [], 0, 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {pool.submit(solve, definition, {**context, **params}): key for key, params in todo.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                params = todo[key]
+                try:
+                    meshes = decode_meshes(future.result())
+                except ComputeError as e:
+                    failed += 1
+                    self.stderr.write(f"Solve failed for {params}: {e}")
+                    continue
+
+                pending.append(DesignSample(
+                    definition_digest=definition.digest,
+                    context_digest=context_hash,
+                    solve_key=key,
+                    building_type=params["building_type"],
+                    inputs=params,
+                    result=gzip.compress(pack_meshes(meshes, quantize=True), mtime=0),
+                    metrics=mesh_metrics(meshes),
+                ))
+                if len(pending) >= options["batch_size"]:
+                    stored += self._flush(pending)
+                    self.stdout.write(f"{stored}/{len(todo)} stored, {time.monotonic() - started:.0f}s")
+        stored += self._flush(pending)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} samples in {time.monotonic() - started:.1f}s ({failed} failed)"
+        ))
+
+    def _flush(self, pending):
+        DesignSample.objects.bulk_create(pending, ignore_conflicts=True)
+        count = len(pending)
+        pending.clear()
+        return count
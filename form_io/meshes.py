@@ -0,0 +1,212 @@
+"""
+Binary mesh transport for solve results.
+
+Compute returns output meshes as base64 rhino3dm archives inside JSON, which
+the browser would otherwise have to decode with rhino3dm.js and convert
+through ``toThreejsJSON``. ``pack_solve_result`` decodes them once on the
+server and packs the vertex and index buffers into one little-endian binary
+that the browser wraps in typed arrays and hands straight to
+``THREE.BufferGeometry``.
+
+Layout (every section starts on a 4-byte boundary)::
+
+    header   "FIOM"  uint8 version  uint8 0  uint16 mesh_count
+    per mesh uint16 name_len  uint8 flags  uint8 0
+             uint32 vertex_count  uint32 index_count
+             name (utf-8)
+             float32[3] min  float32[3] extent        if QUANTIZED
+             positions  float32[3 * vertex_count]
+                        or uint16[3 * vertex_count]   if QUANTIZED
+             colors     uint8[4 * vertex_count] RGBA  if COLORS
+             indices    uint32[index_count]
+                        or uint16[index_count]        if SHORT_INDICES
+
+Quantized positions are ``min + q / 65535 * extent`` per axis. A mesh with
+the UNCHANGED flag has no counts, bounds or buffers: it is the same as the
+mesh of that name the client was sent before (see deltas.py).
+"""
+import json
+import struct
+import sys
+from array import array
+
+import rhino3dm
+
+MAGIC = b"FIOM"
+VERSION = 1
+
+QUANTIZED = 1
+COLORS = 2
+SHORT_INDICES = 4
+UNCHANGED = 8
+
+_HEADER = struct.Struct("<4sBBH")
+_MESH_HEADER = struct.Struct("<HBBII")
+_BOUNDS = struct.Struct("<6f")
+
+
+def decode_item(item):
+    """Decodes one Compute output item, mirroring decodeItem in script.js."""
+    data = json.loads(item["data"])
+    try:
+        if item.get("type") == "System.String":
+            return rhino3dm.DracoCompression.DecompressBase64String(data)
+        if isinstance(data, dict):
+            return rhino3dm.CommonObject.Decode(data)
+    except Exception:
+        pass  # not geometry, e.g. a plain string or number output
+    return None
+
+
+def mesh_buffers(mesh):
+    """
+    Returns ``(positions, indices, colors)`` for a rhino3dm Mesh: float32
+    xyz triples, triangle indices (quads are split in two) and RGBA bytes,
+    or None for colors if the mesh has no vertex colors.
+    """
+    positions = array("f")
+    for point in mesh.Vertices.ToPoint3fArray():
+        positions.extend((point.X, point.Y, point.Z))
+
+    indices = array("I")
+    faces = mesh.Faces
+    for i in range(faces.Count):
+        a, b, c, d = faces[i]
+        indices.extend((a, b, c))
+        if c != d:
+            indices.extend((a, c, d))
+
+    colors = None
+    vertex_colors = mesh.VertexColors
+    if len(vertex_colors) == len(positions) // 3:
+        colors = bytearray()
+        for i in range(len(vertex_colors)):
+            colors.extend(vertex_colors[i])
+    return positions, indices, colors
+
+
+def quantize_positions(positions):
+    """Returns ``(bounds, uint16 positions)`` with bounds as min xyz + extent xyz."""
+    mins = [min(positions[axis::3], default=0.0) for axis in range(3)]
+    extents = [max(positions[axis::3], default=0.0) - mins[axis] for axis in range(3)]
+    scales = [65535 / extent if extent else 0.0 for extent in extents]
+    quantized = array("H", bytes(2 * len(positions)))
+    for i, value in enumerate(positions):
+        axis = i % 3
+        quantized[i] = round((value - mins[axis]) * scales[axis])
+    return mins + extents, quantized
+
+
+def pack_meshes(meshes, quantize=False):
+    """Packs ``(name, mesh)`` pairs into the binary layout described above."""
+    parts = [_HEADER.pack(MAGIC, VERSION, 0, len(meshes))]
+    for name, mesh in meshes:
+        positions, indices, colors = mesh_buffers(mesh)
+        vertex_count = len(positions) // 3
+        flags = 0
+        if quantize:
+            flags |= QUANTIZED
+            bounds, positions = quantize_positions(positions)
+        if colors is not None:
+            flags |= COLORS
+        if vertex_count <= 0x10000:
+            flags |= SHORT_INDICES
+            indices = array("H", indices)
+
+        name = name.encode()
+        parts.append(_MESH_HEADER.pack(len(name), flags, 0, vertex_count, len(indices)))
+        parts.append(_pad(name))
+        if quantize:
+            parts.append(_BOUNDS.pack(*bounds))
+        parts.append(_pad(_little_endian(positions)))
+        if colors is not None:
+            parts.append(bytes(colors))
+        parts.append(_pad(_little_endian(indices)))
+    return b"".join(parts)
+
+
+def packed_entries(data):
+    """Splits packed meshes into ``(name, entry)`` pairs, ``entry`` being the mesh's bytes."""
+    magic, _, _, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not packed meshes")
+    entries = []
+    offset = _HEADER.size
+    for _ in range(count):
+        name_length, flags, _, vertex_count, index_count = _MESH_HEADER.unpack_from(data, offset)
+        start = offset
+        offset += _MESH_HEADER.size
+        name = data[offset:offset + name_length].decode()
+        offset += _padded(name_length)
+        if flags & QUANTIZED:
+            offset += _BOUNDS.size + _padded(6 * vertex_count)
+        else:
+            offset += 12 * vertex_count
+        if flags & COLORS:
+            offset += 4 * vertex_count
+        offset += _padded(2 * index_count) if flags & SHORT_INDICES else 4 * index_count
+        entries.append((name, data[start:offset]))
+    return entries
+
+
+def unchanged_entry(name):
+    """A mesh entry saying the client already has ``name``."""
+    name = name.encode()
+    return _MESH_HEADER.pack(len(name), UNCHANGED, 0, 0, 0) + _pad(name)
+
+
+def join_entries(entries):
+    """Packs mesh entries from packed_entries or unchanged_entry back together."""
+    return _HEADER.pack(MAGIC, VERSION, 0, len(entries)) + b"".join(entries)
+
+
+def decode_meshes(result):
+    """Returns ``(param_name, mesh)`` for every mesh in the raw Compute JSON of a solve."""
+    meshes = []
+    for output in json.loads(result).get("values", []):
+        for branch in output.get("InnerTree", {}).values():
+            for item in branch:
+                geometry = decode_item(item)
+                if isinstance(geometry, rhino3dm.Mesh):
+                    meshes.append((output["ParamName"], geometry))
+    return meshes
+
+
+def mesh_metrics(meshes):
+    """Summary numbers for a list of ``(name, mesh)`` pairs: sizes and overall bounds."""
+    metrics = {"meshes": len(meshes), "vertices": 0, "faces": 0}
+    bounds = None
+    for _, mesh in meshes:
+        metrics["vertices"] += len(mesh.Vertices)
+        metrics["faces"] += mesh.Faces.Count
+        box = mesh.GetBoundingBox()
+        corners = [box.Min.X, box.Min.Y, box.Min.Z, box.Max.X, box.Max.Y, box.Max.Z]
+        if bounds is None:
+            bounds = corners
+        else:
+            bounds = [min(a, b) for a, b in zip(bounds[:3], corners[:3])] + \
+                     [max(a, b) for a, b in zip(bounds[3:], corners[3:])]
+    if bounds is not None:
+        metrics["bounds"] = bounds
+        metrics["height"] = bounds[5] - bounds[2]
+    return metrics
+
+
+def pack_solve_result(result, quantize=False):
+    """Converts the raw Compute JSON of a solve into the binary mesh layout."""
+    return pack_meshes(decode_meshes(result), quantize=quantize)
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padded(length):
+    return length + -length % 4
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 4)
@@ -0,0 +1,228 @@
+"""
+Timing spans and Prometheus metrics.
+
+``span("stage")`` times a block of code and records it in the
+``form_io_stage_seconds`` histogram. The solve pipeline has spans for reading
+and encoding the definition, building the Compute payload, the Compute round
+trip, parsing the response and serializing the reply; the chat has spans for
+building the prompt and the LLM call. ``MetricsMiddleware`` counts and times
+every request, and ``/metrics`` serves everything in the Prometheus text
+format, including the solve cache, chat cache and Compute node state.
+
+A client can ask for the spans of its own request by sending an
+``X-Profile`` header (when METRICS_PROFILING is on). They come back in a
+``Server-Timing`` header, which browsers show in the network panel. For
+streamed responses only the spans before the first byte are included.
+
+Metrics are kept per process; under a multi-process server each worker
+reports its own.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Seconds; solves can take minutes, cache hits well under a millisecond
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]!r}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []  # functions returning (name, type, help, [(labels dict, value)])
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """Registers a function that reports metrics kept elsewhere, read at scrape time."""
+        self.collectors.append(function)
+        return function
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Registry()
+
+stage_seconds = metrics.histogram(
+    "form_io_stage_seconds", "Time spent in each stage of handling a request.", ["stage"],
+)
+request_seconds = metrics.histogram(
+    "form_io_request_seconds", "Time to produce a response, by view.", ["view"],
+)
+requests_total = metrics.counter(
+    "form_io_requests_total", "Requests handled, by view, method and status code.", ["view", "method", "status"],
+)
+compute_requests_total = metrics.counter(
+    "form_io_compute_requests_total", "Requests sent to Rhino Compute, by path and outcome.", ["path", "outcome"],
+)
+
+# Spans of the current request, when the client asked for them
+_profile = contextvars.ContextVar("form_io_profile", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Times the block as ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage)
+        profile = _profile.get()
+        if profile is not None:
+            profile.append((stage, elapsed))
+
+
+def server_timing(profile, total):
+    """The ``Server-Timing`` header for a request's spans, repeated stages summed."""
+    stages = {}
+    for stage, elapsed in profile:
+        count, summed = stages.get(stage, (0, 0.0))
+        stages[stage] = (count + 1, summed + elapsed)
+    entries = [
+        f'{stage};dur={summed * 1000:.2f}' + (f';desc="{count}x"' if count > 1 else "")
+        for stage, (count, summed) in stages.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """Counts and times every request, and adds Server-Timing for profiled ones."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = self.stop(token)
+        return self.finish(request, response, started, profile)
+
+    async def __acall__(self, request):
+        started, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = self.stop(token)
+        return self.finish(request, response, started, profile)
+
+    def start(self, request):
+        profiled = settings.METRICS_PROFILING and "X-Profile" in request.headers
+        return time.perf_counter(), _profile.set([] if profiled else None)
+
+    def stop(self, token):
+        profile = _profile.get()
+        _profile.reset(token)
+        return profile
+
+    def finish(self, request, response, started, profile):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else "unmatched"
+        request_seconds.observe(elapsed, view)
+        requests_total.inc(view, request.method, str(response.status_code))
+        if profile is not None:
+            response["Server-Timing"] = server_timing(profile, elapsed)
+        return response
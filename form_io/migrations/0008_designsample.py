@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_io', '0007_rename_building_path_project_site_envelope'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DesignSample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('definition_digest', models.CharField(max_length=64)),
+                ('context_digest', models.CharField(max_length=64)),
+                ('solve_key', models.CharField(max_length=64, unique=True)),
+                ('building_type', models.PositiveSmallIntegerField()),
+                ('inputs', models.JSONField()),
+                ('result', models.BinaryField()),
+                ('metrics', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['definition_digest', 'context_digest', 'building_type'], name='form_io_des_definit_d1d2b5_idx')],
+            },
+        ),
+    ]
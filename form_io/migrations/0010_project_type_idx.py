@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_io', '0009_project_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['type'], name='project_type_idx'),
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:06
+
+import math
+
+from django.db import migrations, models
+
+RTREE_TABLE = "form_io_project_rtree"
+
+
+# Frozen copies of the form_io.geometry helpers as of this migration, so it
+# keeps computing the same boxes whatever the live code becomes.
+
+def mercator_to_lnglat(x, y):
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y))))
+    return lng, lat
+
+
+def geojson_positions(value):
+    if isinstance(value, dict):
+        if "coordinates" in value:
+            yield from geojson_positions(value["coordinates"])
+        elif value.get("type") == "GeometryCollection":
+            for geometry in value.get("geometries", []):
+                yield from geojson_positions(geometry)
+        elif "features" in value:
+            for feature in value["features"]:
+                yield from geojson_positions(feature)
+        elif "geometry" in value:
+            yield from geojson_positions(value["geometry"])
+    elif isinstance(value, list) and value:
+        if isinstance(value[0], (int, float)):
+            if len(value) >= 2:
+                yield value[0], value[1]
+        else:
+            for item in value:
+                yield from geojson_positions(item)
+
+
+def envelope_positions(envelope):
+    if not isinstance(envelope, dict):
+        return
+    for point in envelope.get("points", []):
+        try:
+            yield mercator_to_lnglat(float(point["x"]), float(point["y"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def site_bbox(site_bounds, site_envelope):
+    west = south = math.inf
+    east = north = -math.inf
+    for positions in (geojson_positions(site_bounds), envelope_positions(site_envelope)):
+        for lng, lat in positions:
+            west, east = min(west, lng), max(east, lng)
+            south, north = min(south, lat), max(north, lat)
+    if west == math.inf:
+        return None
+    return west, south, east, north
+
+
+def fill_bboxes(apps, schema_editor):
+    Project = apps.get_model("form_io", "Project")
+    for project in Project.objects.only("site_bounds", "site_envelope"):
+        bbox = site_bbox(project.site_bounds, project.site_envelope)
+        if bbox is not None:
+            project.bbox_west, project.bbox_south, project.bbox_east, project.bbox_north = bbox
+            project.save(update_fields=["bbox_west", "bbox_south", "bbox_east", "bbox_north"])
+
+
+def create_rtree(apps, schema_editor):
+    # SQLite only; other databases query the indexed bbox columns (see spatial.py)
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, west, east, south, north)")
+    schema_editor.execute(
+        f"INSERT INTO {RTREE_TABLE} (id, west, east, south, north) "
+        "SELECT id, bbox_west, bbox_east, bbox_south, bbox_north FROM form_io_project WHERE bbox_west IS NOT NULL"
+    )
+
+
+def drop_rtree(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {RTREE_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_io', '0010_project_type_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='bbox_east',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_north',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_south',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='bbox_west',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['bbox_west', 'bbox_east'], name='project_bbox_lng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['bbox_south', 'bbox_north'], name='project_bbox_lat_idx'),
+        ),
+        migrations.RunPython(fill_bboxes, migrations.RunPython.noop),
+        migrations.RunPython(create_rtree, drop_rtree),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:15
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copies of form_io.geometry.envelope_vertices and the settings it was
+# called with (SITE_ENVELOPE_SIMPLIFY_TOLERANCE, SOLVE_ENVELOPE_DECIMALS) as
+# of this migration, so it keeps writing the same vertices whatever the live
+# code and settings become.
+EARTH_RADIUS_M = 6371008.8
+SIMPLIFY_TOLERANCE = 0.05
+DECIMALS = 2
+
+
+def mercator_to_lnglat(x, y):
+    lng = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y))))
+    return lng, lat
+
+
+def haversine_distance(lng1, lat1, lng2, lat2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def envelope_points(envelope):
+    if not isinstance(envelope, dict):
+        return []
+    points = []
+    for point in envelope.get("points", []):
+        try:
+            points.append((float(point["x"]), float(point["y"]), float(point.get("z") or 0)))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+    return points
+
+
+def local_coordinates(points):
+    origin_x, origin_y, origin_z = points[0]
+    origin_lng, origin_lat = mercator_to_lnglat(origin_x, origin_y)
+    local = []
+    for x, y, z in points:
+        lng, lat = mercator_to_lnglat(x, y)
+        east = haversine_distance(origin_lng, origin_lat, lng, origin_lat)
+        north = haversine_distance(origin_lng, origin_lat, origin_lng, lat)
+        local.append((
+            east if lng >= origin_lng else -east,
+            north if lat >= origin_lat else -north,
+            z - origin_z,
+        ))
+    return local
+
+
+def segment_distance(point, start, end):
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length_squared))
+    return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+
+def simplify(points, tolerance):
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, farthest_distance = None, tolerance
+        for i in range(first + 1, last):
+            distance = segment_distance(points[i], points[first], points[last])
+            if distance > farthest_distance:
+                farthest, farthest_distance = i, distance
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def envelope_vertices(site_envelope):
+    points = envelope_points(site_envelope)
+    if len(points) < 2:
+        return ""
+    local = simplify(local_coordinates(points), SIMPLIFY_TOLERANCE)
+    return ";".join(",".join(f"{round(value, DECIMALS) + 0.0:.{DECIMALS}f}" for value in point) for point in local)
+
+
+def fill_envelope_vertices(apps, schema_editor):
+    Project = apps.get_model("form_io", "Project")
+    for project in Project.objects.only("site_envelope"):
+        project.envelope_vertices = envelope_vertices(project.site_envelope)
+        if project.envelope_vertices:
+            project.save(update_fields=["envelope_vertices"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('form_io', '0011_project_bbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='envelope_vertices',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_envelope_vertices, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .geometry import envelope_vertices, site_bbox
+
+# Site bounding box columns, derived from site_bounds and site_envelope
+BBOX_FIELDS = ("bbox_west", "bbox_south", "bbox_east", "bbox_north")
+
+def project_envelope_vertices(site_envelope):
+    return envelope_vertices(site_envelope, settings.SITE_ENVELOPE_SIMPLIFY_TOLERANCE, settings.SOLVE_ENVELOPE_DECIMALS)
+
+
 class Project(models.Model):
     PROJECT_TYPES = [
         ('residential', 'Residential Project'),
@@ -18,5 +30,97 @@ class Project(models.Model):
     thumbnail = models.ImageField(upload_to='project_thumbnails/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Lng/lat bounding box of the site, for spatial queries (see spatial.py)
+    bbox_west = models.FloatField(null=True, blank=True, editable=False)
+    bbox_south = models.FloatField(null=True, blank=True, editable=False)
+    bbox_east = models.FloatField(null=True, blank=True, editable=False)
+    bbox_north = models.FloatField(null=True, blank=True, editable=False)
+
+    # site_envelope as the definition's envelope_vertices input, so solves can
+    # reference it by project instead of sending it every time
+    envelope_vertices = models.TextField(blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            # Project list ordering and its keyset cursor
+            models.Index(fields=["-created_at", "-id"], name="project_created_at_idx"),
+            models.Index(fields=["type"], name="project_type_idx"),
+            models.Index(fields=["bbox_west", "bbox_east"], name="project_bbox_lng_idx"),
+            models.Index(fields=["bbox_south", "bbox_north"], name="project_bbox_lat_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def bbox(self):
+        if self.bbox_west is None:
+            return None
+        return self.bbox_west, self.bbox_south, self.bbox_east, self.bbox_north
+
+    def save(self, *args, **kwargs):
+        # Keep the bounding box in step with the geometry it is derived from
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"site_bounds", "site_envelope"} & set(update_fields):
+            bbox = site_bbox(self.site_bounds, self.site_envelope) or (None,) * 4
+            self.bbox_west, self.bbox_south, self.bbox_east, self.bbox_north = bbox
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(BBOX_FIELDS)
+        if update_fields is None or "site_envelope" in update_fields:
+            self.envelope_vertices = project_envelope_vertices(self.site_envelope)
+            if update_fields is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | {"envelope_vertices"}
+        super().save(*args, **kwargs)
+
+class DesignSample(models.Model):
+    """One precomputed solve from the design-space sweep (see design_space.py)."""
+    definition_digest = models.CharField(max_length=64)
+    context_digest = models.CharField(max_length=64)  # hash of the inputs held fixed during the sweep
+    solve_key = models.CharField(max_length=64, unique=True)
+    building_type = models.PositiveSmallIntegerField()
+    inputs = models.JSONField()
+    result = models.BinaryField()  # gzip-compressed packed meshes, see meshes.py
+    metrics = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["definition_digest", "context_digest", "building_type"]),
+        ]
+
+    def __str__(self):
+        return f"{self.definition_digest[:8]} type {self.building_type} #{self.pk}"
+
+
+class SolveJob(models.Model):
+    """A solve submitted to the job queue and run by a worker (see jobs.py)."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUSES = [(status, status) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)]
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    definition = models.CharField(max_length=255)
+    inputs = models.JSONField()  # canonical inputs, see parameters.canonical_inputs
+    priority = models.SmallIntegerField(default=0)  # lower runs first
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    result = models.BinaryField(null=True, blank=True)  # raw Compute JSON
+    error = models.TextField(blank=True, default="")
+    error_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers take the queued job with the lowest priority value, oldest first
+            models.Index(fields=["status", "priority", "created_at"], name="solvejob_queue_idx"),
+            models.Index(fields=["finished_at"], name="solvejob_finished_at_idx"),
+        ]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.definition} {self.status} #{self.pk}"
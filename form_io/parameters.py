@@ -0,0 +1,192 @@
+"""
+Typed schema for the design parameters, built from design_space.INPUT_RANGES.
+
+Both the chat replies and the solve endpoints go through it before anything
+is sent to Compute: values are coerced to numbers, clamped to their range and
+rounded where the slider is integral, known misspellings of parameter names
+are mapped to the real ones, and building types may be given by name.
+Anything that can't be made valid raises ParameterError.
+
+The ranges are the design space the chat prompt describes, which can be
+narrower than a definition's own inputs, so a solve may run with a value other
+than the one posted. The solve endpoints return the values they used as
+``canonical_inputs`` and the editor shows those in its fields.
+
+``canonical_inputs`` goes further for solves: parameters are snapped to the
+steps in SOLVE_INPUT_STEPS, ``envelope_vertices`` are rounded to
+SOLVE_ENVELOPE_DECIMALS and keys are sorted, so slider positions a few
+millimetres apart become the same solve and share its cache entry.
+"""
+import math
+import re
+from decimal import Decimal
+
+from django.conf import settings
+
+from .design_space import INPUT_RANGES, INTEGER_PARAMS
+
+# Names the model (and older example prompts) used for real parameters
+PARAMETER_ALIASES = {
+    "podium_lenght": "podium_length",
+    "two_tower_offset": "polyline_offset",
+}
+
+# Letters-only building type names, as described in the chat prompt
+BUILDING_TYPE_NAMES = {
+    "singletower": 0,
+    "tower": 0,
+    "twotowers": 1,
+    "twotower": 1,
+    "courtyard": 2,
+    "staggered": 3,
+    "lshaped": 4,
+    "hshaped": 5,
+}
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_THOUSANDS = re.compile(r"(?<=\d)[,_](?=\d{3}(?!\d))")
+
+
+class ParameterError(ValueError):
+    """Raised for parameter values that can't be coerced; ``errors`` maps names to messages."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{name}: {message}" for name, message in errors.items()))
+
+
+class Parameter:
+    def __init__(self, name, low, high, integer=False, names=None, step=None):
+        self.name = name
+        self.low = low
+        self.high = high
+        self.integer = integer
+        self.names = names or {}
+        self.step = step
+        # Digits to keep after snapping, so 0.1 steps don't come out as 0.30000000000000004
+        self.decimals = max(0, -Decimal(str(step)).as_tuple().exponent) if step else None
+
+    def quantize(self, value):
+        """Snaps a coerced value to the parameter's step."""
+        if not self.step:
+            return value
+        value = round(round(value / self.step) * self.step, self.decimals)
+        value = min(max(value, self.low), self.high)
+        if self.integer:
+            return int(value)
+        return int(value) if float(value).is_integer() else value
+
+    def coerce(self, value):
+        """
+        Returns ``value`` as a number, clamped to the parameter's range and
+        rounded if it is an integer, or raises ValueError.
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"expected a number, got {type(value).__name__}")
+        if isinstance(value, str):
+            text = _THOUSANDS.sub("", value.strip())
+            letters = re.sub(r"[^a-z]", "", text.lower())
+            if _NUMBER.fullmatch(text):
+                value = float(text)
+            elif letters in self.names:
+                value = self.names[letters]
+            else:
+                raise ValueError(f"{value!r} is not a number")
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"{value} is not a finite number")
+
+        value = float(min(max(value, self.low), self.high))
+        if self.integer:
+            return int(math.floor(value + 0.5))
+        return int(value) if value.is_integer() else value
+
+
+PARAMETERS = {
+    name: Parameter(
+        name, low, high,
+        integer=name in INTEGER_PARAMS,
+        names=BUILDING_TYPE_NAMES if name == "building_type" else None,
+        step=settings.SOLVE_INPUT_STEPS.get(name),
+    )
+    for name, (low, high) in INPUT_RANGES.items()
+}
+
+
+def canonical_name(name):
+    name = str(name).strip()
+    if name in PARAMETERS:
+        return name
+    lowered = name.lower()
+    return PARAMETER_ALIASES.get(lowered, lowered if lowered in PARAMETERS else name)
+
+
+def _clean(values, keep_unknown, quantize=False):
+    if not isinstance(values, dict):
+        raise ParameterError({"inputs": "expected an object"})
+    cleaned = {}
+    errors = {}
+    # Exact names first, so they win over an alias for the same parameter
+    for raw_name in sorted(values, key=lambda raw_name: raw_name not in PARAMETERS):
+        name = canonical_name(raw_name)
+        if name in cleaned:
+            continue
+        parameter = PARAMETERS.get(name)
+        if parameter is None:
+            if keep_unknown:
+                cleaned[raw_name] = values[raw_name]
+            continue
+        try:
+            cleaned[name] = parameter.coerce(values[raw_name])
+            if quantize:
+                cleaned[name] = parameter.quantize(cleaned[name])
+        except ValueError as e:
+            errors[name] = str(e)
+    if errors:
+        raise ParameterError(errors)
+    return cleaned
+
+
+def clean_inputs(inputs):
+    """
+    Validates the design parameters in a solve's inputs. Other inputs, such
+    as ``envelope_vertices``, are passed through unchanged.
+    """
+    return _clean(inputs, keep_unknown=True)
+
+
+def clean_parameters(parameters):
+    """Validates parameters suggested by the chat, dropping any it made up."""
+    return _clean(parameters, keep_unknown=False)
+
+
+def round_envelope(vertices, decimals):
+    """Rounds the coordinates of an ``x,y,z;x,y,z;...`` vertex string."""
+    points = []
+    for point in vertices.split(";"):
+        if not point.strip():
+            continue
+        try:
+            coordinates = [round(float(part), decimals) + 0.0 for part in point.split(",")]
+        except ValueError:
+            raise ParameterError({"envelope_vertices": f"{point.strip()!r} is not a list of numbers"})
+        points.append(",".join(f"{coordinate:.{decimals}f}" for coordinate in coordinates))
+    return ";".join(points)
+
+
+def with_project_envelope(inputs, envelope):
+    """Uses a project's stored envelope (Project.envelope_vertices), if it has one."""
+    if envelope and isinstance(inputs, dict):
+        inputs = {**inputs, "envelope_vertices": envelope}
+    return inputs
+
+
+def canonical_inputs(inputs):
+    """
+    The inputs a solve is actually run with: cleaned as in clean_inputs,
+    quantized, and with sorted keys.
+    """
+    cleaned = _clean(inputs, keep_unknown=True, quantize=True)
+    if isinstance(cleaned.get("envelope_vertices"), str):
+        cleaned["envelope_vertices"] = round_envelope(cleaned["envelope_vertices"], settings.SOLVE_ENVELOPE_DECIMALS)
+    return dict(sorted(cleaned.items()))
@@ -0,0 +1,230 @@
+"""
+Write path for project edits.
+
+``save_project_fields`` writes only the fields whose content actually
+changed, so an autosave that touched ``inputs`` doesn't rewrite the site
+geometry, and a save that changes nothing doesn't write at all. Inputs can
+also be sent as a JSON Patch (RFC 6902) against the stored inputs.
+
+With PROJECT_WRITE_BEHIND_INTERVAL set, ``write_buffer`` keeps the latest
+state per project in memory and flushes it on that interval, so a burst of
+autosaves becomes one write. The buffer is per process; use it with a single
+server process or sticky sessions.
+"""
+import atexit
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+
+from .models import Project
+from .thumbnails import thumbnail_scheduler
+
+logger = logging.getLogger(__name__)
+
+EDITABLE_FIELDS = ("site_envelope", "site_bounds", "inputs")
+
+
+class PatchError(ValueError):
+    """Raised for a JSON Patch that does not apply to the document."""
+
+
+def content_hash(value):
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode()).hexdigest()
+
+
+def _split_pointer(pointer):
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer {pointer!r}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _resolve_parent(document, parts):
+    target = document
+    for part in parts[:-1]:
+        try:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise PatchError(f"Path /{'/'.join(parts)} does not exist")
+    return target, parts[-1]
+
+
+def apply_json_patch(document, operations):
+    """
+    Applies RFC 6902 ``add``, ``remove``, ``replace`` and ``test``
+    operations to a copy of ``document`` and returns it.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("A JSON Patch must be a list of operations")
+    document = copy.deepcopy(document)
+    for operation in operations:
+        op = operation.get("op")
+        parts = _split_pointer(operation.get("path", ""))
+        if not parts:
+            if op in ("add", "replace"):
+                document = copy.deepcopy(operation["value"])
+                continue
+            raise PatchError(f"Unsupported operation {op!r} on the whole document")
+
+        parent, key = _resolve_parent(document, parts)
+        if isinstance(parent, list):
+            if op == "add" and key == "-":
+                parent.append(operation["value"])
+                continue
+            try:
+                key = int(key)
+            except ValueError:
+                raise PatchError(f"Invalid array index {key!r}")
+            if not 0 <= key <= len(parent) - (op != "add"):
+                raise PatchError(f"Array index {key} out of range")
+        elif not isinstance(parent, dict):
+            raise PatchError(f"Cannot index into {type(parent).__name__}")
+        elif op in ("remove", "replace", "test") and key not in parent:
+            raise PatchError(f"Path {operation['path']} does not exist")
+
+        if op == "add":
+            if isinstance(parent, list):
+                parent.insert(key, operation["value"])
+            else:
+                parent[key] = operation["value"]
+        elif op == "replace":
+            parent[key] = operation["value"]
+        elif op == "remove":
+            del parent[key]
+        elif op == "test":
+            if parent[key] != operation["value"]:
+                raise PatchError(f"Test failed at {operation['path']}")
+        else:
+            raise PatchError(f"Unsupported operation {op!r}")
+    return document
+
+
+def _locked_projects(project_id):
+    """
+    Takes the write lock on a project before it is read, so saving it later
+    in the same transaction doesn't have to upgrade a read lock. SQLite has
+    no row locks and fails such an upgrade at once when another writer is
+    waiting; a no-op UPDATE as the transaction's first statement takes its
+    write lock instead, waiting for it up to the busy timeout.
+    """
+    if connection.features.has_select_for_update:
+        return Project.objects.select_for_update()
+    Project.objects.filter(pk=project_id).update(name=F("name"))
+    return Project.objects
+
+
+def save_project_fields(project_id, fields, inputs_patch=None):
+    """
+    Writes ``fields`` (a subset of EDITABLE_FIELDS) to a project, applying
+    ``inputs_patch`` to its inputs first, and returns the names of the fields
+    that changed. Unchanged fields are not written, and nothing is written if
+    nothing changed. Raises Project.DoesNotExist or PatchError.
+    """
+    load = set(fields) | ({"inputs"} if inputs_patch else set())
+    if not load:
+        return []
+    if load & {"site_bounds", "site_envelope"}:
+        load |= {"site_bounds", "site_envelope"}  # both feed the site bounding box
+    with transaction.atomic():
+        project = _locked_projects(project_id).only(*load).get(pk=project_id)
+        values = dict(fields)
+        if inputs_patch:
+            values["inputs"] = apply_json_patch(values.get("inputs", project.inputs), inputs_patch)
+
+        changed = [name for name, value in values.items()
+                   if content_hash(value) != content_hash(getattr(project, name))]
+        for name in changed:
+            setattr(project, name, values[name])
+        if changed:
+            project.save(update_fields=changed)
+            if thumbnail_scheduler is not None and {"inputs", "site_envelope"} & set(changed):
+                transaction.on_commit(lambda: thumbnail_scheduler.schedule(project_id))
+    return changed
+
+
+class WriteBehindBuffer:
+    """
+    Collects project edits and writes the latest state of each project every
+    ``interval`` seconds. Later edits to a field replace earlier ones.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}  # project_id -> {field name: latest value}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, project_id, fields, inputs_patch=None):
+        """
+        Queues an edit. ``inputs_patch`` is applied right away to the inputs
+        as the pending edits leave them, so only the current inputs are kept;
+        PatchError is raised with nothing queued if it doesn't apply.
+        """
+        fields = dict(fields)
+        stored = None
+        if inputs_patch and "inputs" not in fields:
+            stored = Project.objects.values_list("inputs", flat=True).get(pk=project_id)
+        with self._lock:
+            pending = self._pending.get(project_id, {})
+            if inputs_patch:
+                inputs = fields.get("inputs", pending.get("inputs", stored))
+                fields["inputs"] = apply_json_patch(inputs, inputs_patch)
+            self._pending[project_id] = {**pending, **fields}
+        self._start()
+
+    def flush(self, project_id=None):
+        """Writes pending edits now, for one project or all of them."""
+        with self._lock:
+            if project_id is None:
+                pending, self._pending = self._pending, {}
+            else:
+                fields = self._pending.pop(project_id, None)
+                pending = {project_id: fields} if fields else {}
+
+        for pending_id, fields in pending.items():
+            try:
+                save_project_fields(pending_id, fields)
+            except Exception as e:
+                logger.error("Buffered save for project %s failed: %s", pending_id, e)
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="project-write-behind", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            self.flush()
+
+
+write_buffer = WriteBehindBuffer(settings.PROJECT_WRITE_BEHIND_INTERVAL) if settings.PROJECT_WRITE_BEHIND_INTERVAL else None
+
+
+def store_project_fields(project_id, fields, inputs_patch=None):
+    """
+    Saves through the write-behind buffer when it is enabled, otherwise right
+    away. Returns the names of the fields that changed, or None if the edit
+    was buffered. Raises Project.DoesNotExist or PatchError.
+    """
+    if write_buffer is not None:
+        if not Project.objects.filter(pk=project_id).exists():
+            raise Project.DoesNotExist
+        write_buffer.put(project_id, fields, inputs_patch)
+        return None
+    return save_project_fields(project_id, fields, inputs_patch)
@@ -0,0 +1,201 @@
+"""
+Content-addressed cache for Rhino Compute solve results.
+
+Results are keyed by a hash of the Grasshopper definition bytes plus the
+canonicalized ``values`` payload, so the same definition solved with the same
+inputs is only ever sent to Compute once. There is a bounded in-process LRU
+tier and an optional on-disk tier (see SOLVE_CACHE_* in settings).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def definition_digest(data):
+    """SHA-256 hex digest of a Grasshopper definition's raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def solve_key(definition_hash, values):
+    """
+    Builds the cache key for a solve from the definition hash and the
+    Compute ``values`` list. Parameters are sorted by name so the key does
+    not depend on the order the browser sent them in.
+    """
+    canonical = sorted(values, key=lambda value: value["ParamName"])
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{definition_hash}:{encoded}".encode()).hexdigest()
+
+
+class SolveCache:
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None, disk_max_bytes=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = str(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = None  # computed lazily on first disk write
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self.bytes_stored = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.bytes_served += len(body)
+                return body
+
+        body = self._read_disk(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.bytes_served += len(body)
+            self._remember(key, body)
+        return body
+
+    def set(self, key, body):
+        with self._lock:
+            self.bytes_stored += len(body)
+            self._remember(key, body)
+        self._write_disk(key, body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_bytes": self._disk_bytes or 0,
+                "bytes_served": self.bytes_served,
+                "bytes_stored": self.bytes_stored,
+            }
+
+    # In-process LRU tier (callers hold self._lock)
+
+    def _remember(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = body
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    # On-disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)  # mtime doubles as the last-used time for eviction
+            return body
+        except OSError:
+            return None
+
+    def _write_disk(self, key, body):
+        if not self.disk_dir or len(body) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write solve cache entry %s: %s", key, e)
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+            else:
+                self._disk_bytes += len(body)
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _evict_disk(self):
+        # Drop least recently used files until we are back under 90% of the budget
+        files = sorted(self._scan_disk(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in files)
+        target = self.disk_max_bytes * 0.9
+        for path, _, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+solve_cache = SolveCache(
+    max_entries=settings.SOLVE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SOLVE_CACHE_MAX_BYTES,
+    disk_dir=settings.SOLVE_CACHE_DISK_DIR,
+    disk_max_bytes=settings.SOLVE_CACHE_DISK_MAX_BYTES,
+)
+
+
+@metrics.collector
+def solve_cache_metrics():
+    stats = solve_cache.stats()
+    return [
+        ("form_io_solve_cache_lookups_total", "counter", "Solve cache lookups, by result.",
+         [({"result": "hit"}, stats["hits"]), ({"result": "disk_hit"}, stats["disk_hits"]),
+          ({"result": "miss"}, stats["misses"])]),
+        ("form_io_solve_cache_entries", "gauge", "Entries in the in-process solve cache.", [({}, stats["entries"])]),
+        ("form_io_solve_cache_bytes", "gauge", "Size of the solve cache, by tier.",
+         [({"tier": "memory"}, stats["bytes"]), ({"tier": "disk"}, stats["disk_bytes"])]),
+    ]
@@ -0,0 +1,407 @@
+"""
+Grasshopper solve pipeline shared by the solve endpoints.
+
+``solve`` turns an inputs dict into Compute's ``values`` payload, serves it
+from the solve cache when possible, and otherwise sends it to Compute. Two
+requests for the same solve that arrive while it is in flight share a single
+Compute call. ``SolveSlots`` lets a client supersede its own queued solves.
+``asolve`` and ``SolveSlots.arun`` are the equivalents for the async views,
+``solve_stream`` hands back the Compute response as it arrives, and
+``solve_many`` runs a batch of solves concurrently.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asgiref.sync import sync_to_async
+
+from .compute_client import ComputeError
+from .definitions import registry
+from .metrics import span
+from .solve_cache import solve_cache, solve_key
+
+
+class Superseded(Exception):
+    """Raised for a solve request that a newer request from the same slot replaced."""
+
+    def __init__(self, seq, latest_seq):
+        super().__init__(f"Solve {seq} superseded by {latest_seq}")
+        self.seq = seq
+        self.latest_seq = latest_seq
+
+
+def build_values(inputs):
+    """Converts an inputs dict into Compute's ``values`` list."""
+    values = []
+    for param_name, param_value in inputs.items():
+        inner_tree = {
+            "{0;0}": [
+                {
+                    "type": "System.Double" if isinstance(param_value, (float, int)) else "System.String",
+                    "data": param_value,
+                }
+            ]
+        }
+        values.append({"ParamName": param_name, "InnerTree": inner_tree})
+    return values
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def solve(definition, inputs):
+    """
+    Returns the raw Compute JSON (bytes) for solving ``definition`` with
+    ``inputs``. Raises ComputeError if Compute fails or cannot be reached.
+    """
+    with span("payload_build"):
+        values = build_values(inputs)
+        cache_key = solve_key(definition.digest, values)
+    with span("solve_cache_lookup"):
+        cached = solve_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with _in_flight_lock:
+        flight = _in_flight.get(cache_key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[cache_key] = _InFlight()
+
+    if not leader:
+        # Same definition and inputs are already being solved; wait for that result
+        with span("solve_wait"):
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        response = registry.post(definition, "/grasshopper", {"values": values})
+        if response.status_code != 200:
+            raise ComputeError(response.text, status=response.status_code)
+        flight.result = response.content
+        solve_cache.set(cache_key, flight.result)
+        return flight.result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        _land(cache_key, flight)
+
+
+def solve_many(definition, inputs_list, max_workers):
+    """
+    Solves every inputs dict in ``inputs_list`` with at most ``max_workers``
+    solves in flight and yields ``(indices, result, error)`` as each one
+    completes. Identical inputs are solved once and reported for all of
+    their positions in the list.
+    """
+    groups = {}
+    for index, inputs in enumerate(inputs_list):
+        key = solve_key(definition.digest, build_values(inputs))
+        groups.setdefault(key, (inputs, []))[1].append(index)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solve-batch")
+    try:
+        futures = {pool.submit(solve, definition, inputs): indices for inputs, indices in groups.values()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+    finally:
+        # If the caller stops early (e.g. the client went away) don't start the rest
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def solve_stream(definition, inputs, chunk_size=64 * 1024):
+    """
+    Like ``solve``, but returns an iterator over the raw Compute JSON as it
+    arrives instead of waiting for the whole body. The full body still ends up
+    in the solve cache once the stream has been read to the end.
+    """
+    with span("payload_build"):
+        values = build_values(inputs)
+        cache_key = solve_key(definition.digest, values)
+    with span("solve_cache_lookup"):
+        cached = solve_cache.get(cache_key)
+    if cached is not None:
+        return iter([cached])
+
+    with _in_flight_lock:
+        flight = _in_flight.get(cache_key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[cache_key] = _InFlight()
+
+    if not leader:
+        with span("solve_wait"):
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return iter([flight.result])
+
+    try:
+        response = registry.post(definition, "/grasshopper", {"values": values}, stream=True)
+        if response.status_code != 200:
+            try:
+                raise ComputeError(response.text, status=response.status_code)
+            finally:
+                response.close()
+    except Exception as e:
+        flight.error = e
+        _land(cache_key, flight)
+        raise
+    return SolveStream(response, cache_key, flight, chunk_size)
+
+
+class SolveStream:
+    """
+    Iterator over the chunks of a streamed Compute response. Whoever is
+    waiting on the same solve gets the full body once it has been read, or
+    an error if the stream is closed early.
+    """
+
+    def __init__(self, response, cache_key, flight, chunk_size):
+        self.response = response
+        self.cache_key = cache_key
+        self.flight = flight
+        self._chunks = response.iter_content(chunk_size)
+        self._body = bytearray()
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._finish(result=bytes(self._body))
+            raise
+        except Exception as e:
+            self._finish(error=e)
+            raise
+        self._body += chunk
+        return chunk
+
+    def close(self):
+        self._finish(error=ComputeError("Solve stream was closed before it finished", status=499))
+
+    def _finish(self, result=None, error=None):
+        if self._finished:
+            return
+        self._finished = True
+        self.response.close()
+        if result is not None:
+            solve_cache.set(self.cache_key, result)
+            self.flight.result = result
+        else:
+            self.flight.error = error
+        _land(self.cache_key, self.flight)
+
+
+def _land(cache_key, flight):
+    """Retires an in-flight solve and wakes everyone waiting on it."""
+    with _in_flight_lock:
+        del _in_flight[cache_key]
+    flight.done.set()
+
+
+_async_in_flight = {}  # cache_key -> asyncio.Task running the Compute call
+
+
+async def _cache_call(method, *args):
+    """Runs a solve cache call in a thread if it may touch the disk tier."""
+    if solve_cache.disk_dir is None:
+        return method(*args)
+    return await sync_to_async(method, thread_sensitive=False)(*args)
+
+
+async def _acompute(definition, cache_key, values):
+    response = await registry.apost(definition, "/grasshopper", {"values": values})
+    if response.status_code != 200:
+        raise ComputeError(response.text, status=response.status_code)
+    await _cache_call(solve_cache.set, cache_key, response.content)
+    return response.content
+
+
+def _aland(cache_key, task):
+    if _async_in_flight.get(cache_key) is task:
+        del _async_in_flight[cache_key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved so asyncio doesn't warn when every waiter left
+
+
+async def asolve(definition, inputs):
+    """
+    Async version of ``solve`` used by the ASGI views. The Compute call runs
+    as its own task, which every request for the same solve awaits, so a
+    client that disconnects doesn't cancel it for the others.
+    """
+    with span("payload_build"):
+        values = build_values(inputs)
+        cache_key = solve_key(definition.digest, values)
+    with span("solve_cache_lookup"):
+        cached = await _cache_call(solve_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
+    task = _async_in_flight.get(cache_key)
+    if task is not None:
+        with span("solve_wait"):
+            return await asyncio.shield(task)
+
+    task = _async_in_flight[cache_key] = asyncio.create_task(_acompute(definition, cache_key, values))
+    task.add_done_callback(lambda task: _aland(cache_key, task))
+    return await asyncio.shield(task)
+
+
+class _Slot:
+    def __init__(self, cond):
+        self.cond = cond  # threading.Condition, or asyncio.Condition for async slots
+        self.latest_seq = 0
+        self.busy = False
+        self.last_used = time.monotonic()
+
+
+class _HeldStream:
+    """Iterates over a solve's chunks, releasing its slot once they are read or closed."""
+
+    def __init__(self, chunks, release):
+        self.chunks = chunks
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self.chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            release()
+
+
+class SolveSlots:
+    """
+    One solve slot per client and project. Each request carries a sequence
+    number that increases monotonically per client. Only one solve per slot
+    runs at a time; while it runs, later requests queue, and a queued
+    request gives up as soon as a newer one arrives. The solve already
+    running is left to finish, since its result still fills the cache.
+
+    Sync (``run``) and async (``arun``) requests wait on different kinds of
+    condition, so they use separate slots for the same key.
+    """
+
+    def __init__(self, max_idle=600):
+        self.max_idle = max_idle
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, seq):
+        """Waits for the slot as ``run`` does and returns a function that releases it."""
+        slot = self._get(key, threading.Condition)
+        with slot.cond:
+            if seq < slot.latest_seq:
+                raise Superseded(seq, slot.latest_seq)
+            slot.latest_seq = seq
+            slot.cond.notify_all()  # let older queued requests give up
+            with span("slot_wait"):
+                while slot.busy:
+                    slot.cond.wait()
+                    if slot.latest_seq != seq:
+                        raise Superseded(seq, slot.latest_seq)
+            slot.busy = True
+
+        def release():
+            with slot.cond:
+                slot.busy = False
+                slot.last_used = time.monotonic()
+                slot.cond.notify_all()
+        return release
+
+    def run(self, key, seq, fn):
+        release = self.acquire(key, seq)
+        try:
+            return fn()
+        finally:
+            release()
+
+    def run_stream(self, key, seq, fn):
+        """
+        Like ``run`` for an ``fn`` that returns an iterator, such as
+        solve_stream. The slot is held until the iterator is exhausted or
+        closed, not just until it is returned.
+        """
+        release = self.acquire(key, seq)
+        try:
+            chunks = fn()
+        except BaseException:
+            release()
+            raise
+        return _HeldStream(chunks, release)
+
+    async def arun(self, key, seq, fn):
+        """Async version of ``run``; ``fn`` is a coroutine function."""
+        slot = self._get(key, asyncio.Condition)
+        async with slot.cond:
+            if seq < slot.latest_seq:
+                raise Superseded(seq, slot.latest_seq)
+            slot.latest_seq = seq
+            slot.cond.notify_all()
+            with span("slot_wait"):
+                while slot.busy:
+                    await slot.cond.wait()
+                    if slot.latest_seq != seq:
+                        raise Superseded(seq, slot.latest_seq)
+            slot.busy = True
+
+        try:
+            return await fn()
+        finally:
+            async with slot.cond:
+                slot.busy = False
+                slot.last_used = time.monotonic()
+                slot.cond.notify_all()
+
+    def _get(self, key, cond_type):
+        now = time.monotonic()
+        with self._lock:
+            slot = self._slots.get((key, cond_type))
+            if slot is None:
+                self._prune(now)
+                slot = self._slots[key, cond_type] = _Slot(cond_type())
+            slot.last_used = now
+            return slot
+
+    def _prune(self, now):
+        idle = [key for key, slot in self._slots.items()
+                if not slot.busy and now - slot.last_used > self.max_idle]
+        for key in idle:
+            del self._slots[key]
+
+
+solve_slots = SolveSlots()
@@ -0,0 +1,80 @@
+"""
+Spatial lookups over project sites.
+
+Every project keeps the lng/lat bounding box of its site in four indexed
+columns (see Project.save). On SQLite the boxes are also mirrored into an
+R*Tree virtual table, created by migration 0011 and kept in step by the
+signal handlers below, so a viewport query only touches the projects it
+returns. Other databases filter on the indexed columns directly.
+Boxes that cross the antimeridian are not handled.
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .geometry import distance_to_bbox, radius_bbox
+from .models import BBOX_FIELDS, Project
+
+RTREE_TABLE = "form_io_project_rtree"
+
+MAX_RESULTS = 500
+
+_rtree_available = None
+
+
+def rtree_available():
+    global _rtree_available
+    if _rtree_available is None:
+        _rtree_available = connection.vendor == "sqlite" and RTREE_TABLE in connection.introspection.table_names()
+    return _rtree_available
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, update_fields=None, **kwargs):
+    if not rtree_available():
+        return
+    if update_fields is not None and not set(BBOX_FIELDS) & set(update_fields):
+        return
+    with connection.cursor() as cursor:
+        if instance.bbox is None:
+            cursor.execute(f"DELETE FROM {RTREE_TABLE} WHERE id = %s", [instance.pk])
+        else:
+            west, south, east, north = instance.bbox
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {RTREE_TABLE} (id, west, east, south, north) VALUES (%s, %s, %s, %s, %s)",
+                [instance.pk, west, east, south, north],
+            )
+
+
+@receiver(post_delete, sender=Project)
+def unindex_project(sender, instance, **kwargs):
+    if rtree_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {RTREE_TABLE} WHERE id = %s", [instance.pk])
+
+
+def projects_in_bbox(west, south, east, north, limit=MAX_RESULTS):
+    """Projects whose site box intersects the given box."""
+    projects = Project.objects.only("id", "name", "type", *BBOX_FIELDS).filter(
+        bbox_west__lte=east, bbox_east__gte=west, bbox_south__lte=north, bbox_north__gte=south,
+    )
+    if rtree_available():
+        # The R*Tree finds the candidates; its float32 boxes are rounded
+        # outwards, so the exact comparison above still applies
+        projects = projects.filter(id__in=RawSQL(
+            f"SELECT id FROM {RTREE_TABLE} WHERE west <= %s AND east >= %s AND south <= %s AND north >= %s",
+            [east, west, north, south],
+        ))
+    return list(projects.order_by("id")[:limit])
+
+
+def projects_near(lng, lat, radius_m, limit=MAX_RESULTS):
+    """``(project, distance_m)`` for sites within ``radius_m`` of a point, nearest first."""
+    matches = []
+    for project in projects_in_bbox(*radius_bbox(lng, lat, radius_m), limit=None):
+        distance = distance_to_bbox(lng, lat, project.bbox)
+        if distance <= radius_m:
+            matches.append((project, distance))
+    matches.sort(key=lambda match: match[1])
+    return matches[:limit]
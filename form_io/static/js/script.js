@@ -9,6 +9,9 @@ loader.setLibraryPath('https://unpkg.com/rhino3dm@8.0.0-beta3/')
 const data = {
   // definition: 'form_io_main_002.gh',
   definition: 'test_main_2.gh',
+  // 'binary': packed typed-array meshes from /api/rhino/solve/mesh/
+  // 'stream': rhino3dm JSON per output from /api/rhino/solve/stream/
+  meshTransport: 'binary',
 
   inputs: {}  // initialize as empty
 }
@@ -24,8 +27,31 @@ let meshb64Mesh, meshoutMesh
 let draw
 let isEnvelopeSelectable = false;
 
+// Solve sequencing: every compute() gets a new seq so the server can drop
+// queued solves that a newer slider position has replaced
+const SOLVE_CLIENT_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+let solveSeq = 0
+let appliedSolveSeq = 0
+
+// Live channel (see form_io/live.py): on project pages, solves and autosaves
+// go over one WebSocket instead of a POST each, and over HTTP while it is closed
+const LIVE_MAX_RETRIES = 5
+const live = { socket: null, ready: false, sentInputs: null, result: null, retries: 0 }
+
+// Meshes of recent exact solves by seq. Solves ask only for the outputs that
+// changed since solvedSeq (delta_base, see form_io/deltas.py) and reuse these
+// for the rest
+const SOLVED_HISTORY = 8
+const solvedHistory = new Map()
+let solvedSeq = 0
+
+// Definitions the server has no sweep samples for on this page (see
+// showPreview); the site is fixed per page, so asking again won't help
+const noPreviews = new Set()
+
 
 init()
+openLiveChannel()
 
 function getInputs() {
   const inputs = {};
@@ -39,7 +65,9 @@ function getInputs() {
     }
   });
 
-  if (PROJECT_POLYLINE) {
+  // Saved projects have their envelope preprocessed on the server when it is
+  // saved, and solves reference it by project_id (see compute)
+  if (PROJECT_POLYLINE && !PROJECT_ID) {
     inputs['envelope_vertices'] = formatSiteEvnelopeWithTurfDistances(PROJECT_POLYLINE);
   }
 
@@ -53,13 +81,34 @@ async function compute() {
 
 
   data.inputs = getInputs()
+  const seq = ++solveSeq
 
   const formData = new FormData()
   formData.append("grasshopper_file_name", data.definition)
   formData.append("input_data", JSON.stringify(data.inputs))
+  formData.append("client_id", SOLVE_CLIENT_ID)
+  formData.append("seq", seq)
+  if (PROJECT_ID) {
+    formData.append("slot", PROJECT_ID)
+    formData.append("project_id", PROJECT_ID)
+  }
+
+  if (live.ready && data.meshTransport === 'binary') {
+    sendLiveInputs(data.inputs, seq)  // no preview: the socket answers each tick without a POST
+    return
+  }
+
+  showPreview(formData, seq)
 
   try {
-    const response = await fetch("/api/rhino/solve/", {
+    if (data.meshTransport === 'binary') {
+      await computeBinary(formData, seq)
+      return
+    }
+
+    // Streamed solve: each output param arrives as its own NDJSON line, so
+    // meshb64 can be on screen before meshout has finished downloading
+    const response = await fetch("/api/rhino/solve/stream/", {
       method: "POST",
       body: formData,
       headers: {
@@ -67,13 +116,284 @@ async function compute() {
       },
     })
     if (!response.ok) throw new Error(response.statusText)
-    const json = await response.json()
-    collectResults(json)
+    if (!response.headers.get('Content-Type')?.includes('ndjson')) {
+      const json = await response.json()
+      if (!json.superseded) console.warn('[Form IO] Unexpected solve response:', json)
+      return
+    }
+    // Skip frames that arrived after a newer result
+    if (seq < appliedSolveSeq) return
+    appliedSolveSeq = seq
+
+    startResults()
+    await readNdjson(response, event => {
+      if (seq < appliedSolveSeq) return false  // a newer solve took over
+      if (event.value) collectOutput(event.value)
+      else if (event.canonical_inputs) showCanonicalInputs(event.canonical_inputs)
+      else if (event.error) console.error('[Form IO] Compute error:', event.error)
+    })
   } catch (e) {
     console.error('Compute failed:', e)
   }
 }
 
+// Solve returning packed mesh buffers, no rhino3dm decoding needed
+async function computeBinary(formData, seq) {
+  const base = solvedSeq
+  formData.append("quantize", "1")
+  formData.append("delta_base", base)
+  const response = await fetch("/api/rhino/solve/mesh/", {
+    method: "POST",
+    body: formData,
+    headers: {
+      "X-CSRFToken": getCSRFToken(),
+    },
+  })
+  if (!response.ok) throw new Error(response.statusText)
+  if (!response.headers.get('Content-Type')?.includes('octet-stream')) {
+    const json = await response.json()
+    if (!json.superseded) console.warn('[Form IO] Unexpected solve response:', json)
+    return
+  }
+  const buffer = await response.arrayBuffer()
+  if (seq < appliedSolveSeq) return
+  appliedSolveSeq = seq
+  showMeshBuffers(buffer, seq, base)
+  showCanonicalInputs(JSON.parse(response.headers.get('X-Canonical-Inputs') || 'null'))
+}
+
+// Shows the values a solve ran with, which the server clamps to each
+// parameter's range and snaps to its step (see form_io/parameters.py). The
+// field being typed in is left alone; it gets them after its change event.
+function showCanonicalInputs(canonical) {
+  if (!canonical) return
+  Object.entries(canonical).forEach(([name, value]) => {
+    const field = document.getElementById(name)
+    if (!field || field.type !== 'number' || field === document.activeElement) return
+    if (Number(field.value) !== value) field.value = value
+  })
+}
+
+function openLiveChannel() {
+  if (!PROJECT_ID || !('WebSocket' in window)) return
+  const scheme = location.protocol === 'https:' ? 'wss' : 'ws'
+  const params = new URLSearchParams({ definition: data.definition, quantize: '1' })
+  const socket = new WebSocket(`${scheme}://${location.host}/ws/projects/${PROJECT_ID}/live/?${params}`)
+  socket.binaryType = 'arraybuffer'
+  live.socket = socket
+
+  socket.onmessage = event => {
+    if (typeof event.data !== 'string') {
+      // Packed meshes of the result announced just before
+      const result = live.result
+      live.result = null
+      if (result === null || result.seq < appliedSolveSeq) return
+      appliedSolveSeq = result.seq
+      showMeshBuffers(event.data, result.seq, result.base)
+      showCanonicalInputs(result.canonical_inputs)
+      return
+    }
+    const message = JSON.parse(event.data)
+    if (message.type === 'ready') {
+      live.ready = true
+      live.retries = 0
+      live.sentInputs = null  // the server starts without inputs
+    } else if (message.type === 'result') {
+      live.result = message
+    } else if (message.type === 'saved') {
+      lastSavedInputs = null  // an HTTP save after this sends the inputs in full
+    } else if (message.type === 'error') {
+      console.warn('[Form IO] Live channel error:', message.error, message.errors)
+    }
+  }
+
+  socket.onclose = () => {
+    const wasReady = live.ready
+    live.ready = false
+    live.socket = null
+    // Servers without WebSockets (runserver) refuse every attempt; stay on HTTP then
+    if (!wasReady && ++live.retries > LIVE_MAX_RETRIES) return
+    setTimeout(openLiveChannel, Math.min(1000 * 2 ** live.retries, 30000))
+  }
+}
+
+// Sends the inputs for solve seq as a JSON Patch against the ones sent last
+function sendLiveInputs(inputs, seq) {
+  const message = live.sentInputs
+    ? { type: 'inputs', seq, base: solvedSeq, patch: diffInputs(live.sentInputs, inputs) }
+    : { type: 'inputs', seq, base: solvedSeq, inputs }
+  live.socket.send(JSON.stringify(message))
+  live.sentInputs = inputs
+}
+
+// Shows the nearest precomputed sweep sample until the exact solve for seq lands
+async function showPreview(formData, seq) {
+  const definition = data.definition
+  if (noPreviews.has(definition)) return
+  try {
+    const response = await fetch("/api/rhino/solve/preview/", {
+      method: "POST",
+      body: formData,
+      headers: {
+        "X-CSRFToken": getCSRFToken(),
+      },
+    })
+    if (response.status === 404) {
+      noPreviews.add(definition)  // no sweep has been run for this definition/site
+      return
+    }
+    if (!response.ok) return
+    const buffer = await response.arrayBuffer()
+    if (seq !== solveSeq || seq <= appliedSolveSeq) return
+    showMeshBuffers(buffer)
+  } catch (e) {
+    console.warn('[Form IO] Preview failed:', e)
+  }
+}
+
+// Shows packed meshes; for the exact solve seq, unchanged ones come from solve base
+function showMeshBuffers(buffer, seq = null, base = 0) {
+  const solved = {}
+  parseMeshBuffers(buffer).forEach(({ name, geometry, unchanged }) => {
+    const type = name.includes('meshb64') ? 'meshb64' : 'meshout'
+    let mesh
+    if (unchanged) {
+      mesh = solvedHistory.get(base)?.[type]
+      if (!mesh) {
+        console.warn(`[Form IO] No ${type} from solve ${base} to keep`)
+        return
+      }
+    } else {
+      mesh = new THREE.Mesh(geometry, new THREE.MeshBasicMaterial({
+        vertexColors: geometry.hasAttribute('color'),
+        side: THREE.DoubleSide,
+        transparent: true,
+        opacity: 0.6
+      }))
+      addEdges(mesh)
+    }
+    replaceCurrentMesh(mesh, type)
+    solved[type] = mesh
+  })
+  if (seq !== null) rememberSolved(seq, solved)
+}
+
+function rememberSolved(seq, meshes) {
+  solvedHistory.set(seq, meshes)
+  solvedSeq = seq
+  while (solvedHistory.size > SOLVED_HISTORY) {
+    const [oldest, evicted] = solvedHistory.entries().next().value
+    solvedHistory.delete(oldest)
+    Object.values(evicted).forEach(mesh => {
+      if (!isMeshInUse(mesh)) disposeMesh(mesh)
+    })
+  }
+}
+
+// Whether a mesh is on screen or kept for a later delta
+function isMeshInUse(mesh) {
+  if (mesh === meshb64Mesh || mesh === meshoutMesh) return true
+  for (const meshes of solvedHistory.values()) {
+    if (Object.values(meshes).includes(mesh)) return true
+  }
+  return false
+}
+
+function disposeMesh(mesh) {
+  mesh.children.forEach(child => {
+    child.geometry.dispose()
+    child.material.dispose()
+  })
+  mesh.geometry.dispose()
+  mesh.material.dispose()
+}
+
+/**
+ * Parses the packed meshes sent by /api/rhino/solve/mesh/ (layout documented
+ * in form_io/meshes.py) into BufferGeometries that view the response buffer.
+ */
+function parseMeshBuffers(buffer) {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== 'FIOM') throw new Error('Not a mesh buffer')
+  const meshCount = view.getUint16(6, true)
+  const align = n => (n + 3) & ~3
+
+  const meshes = []
+  let offset = 8
+  for (let m = 0; m < meshCount; m++) {
+    const nameLength = view.getUint16(offset, true)
+    const flags = view.getUint8(offset + 2)
+    const vertexCount = view.getUint32(offset + 4, true)
+    const indexCount = view.getUint32(offset + 8, true)
+    offset += 12
+    const name = new TextDecoder().decode(new Uint8Array(buffer, offset, nameLength))
+    offset += align(nameLength)
+    if (flags & 8) {
+      meshes.push({ name, unchanged: true })  // same as in the delta base solve
+      continue
+    }
+
+    let positions
+    if (flags & 1) {
+      const bounds = new Float32Array(buffer, offset, 6)
+      offset += 24
+      const quantized = new Uint16Array(buffer, offset, vertexCount * 3)
+      offset += align(vertexCount * 6)
+      positions = new Float32Array(vertexCount * 3)
+      for (let i = 0; i < positions.length; i++) {
+        const axis = i % 3
+        positions[i] = bounds[axis] + quantized[i] / 65535 * bounds[axis + 3]
+      }
+    } else {
+      positions = new Float32Array(buffer, offset, vertexCount * 3)
+      offset += vertexCount * 12
+    }
+
+    const geometry = new THREE.BufferGeometry()
+    geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3))
+    if (flags & 2) {
+      geometry.setAttribute('color', new THREE.BufferAttribute(new Uint8Array(buffer, offset, vertexCount * 4), 4, true))
+      offset += vertexCount * 4
+    }
+    if (flags & 4) {
+      geometry.setIndex(new THREE.BufferAttribute(new Uint16Array(buffer, offset, indexCount), 1))
+      offset += align(indexCount * 2)
+    } else {
+      geometry.setIndex(new THREE.BufferAttribute(new Uint32Array(buffer, offset, indexCount), 1))
+      offset += indexCount * 4
+    }
+    meshes.push({ name, geometry })
+  }
+  return meshes
+}
+
+/**
+ * Reads an NDJSON response line by line, calling onEvent with each parsed line.
+ * Stops reading early if onEvent returns false.
+ */
+async function readNdjson(response, onEvent) {
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+
+    let newline
+    while ((newline = buffered.indexOf('\n')) >= 0) {
+      const line = buffered.slice(0, newline)
+      buffered = buffered.slice(newline + 1)
+      if (line && onEvent(JSON.parse(line)) === false) {
+        reader.cancel()
+        return
+      }
+    }
+  }
+}
+
 // Helper to get accurate meter-to-Mercator scaling factor
 function getMercatorUnitsPerMeterAtOrigin(originLngLat) {
   // Create a point 1 meter east of the origin
@@ -111,17 +431,13 @@ function meshToThreejs(mesh) {
 
 
 function replaceCurrentMesh(mesh, type) {
-  if (type === 'meshb64' && meshb64Mesh) {
-    threeScene.remove(meshb64Mesh)
-    meshb64Mesh.geometry.dispose()
-    meshb64Mesh.material.dispose()
-    meshb64Mesh = null
-  } else if (type === 'meshout' && meshoutMesh) {
-    threeScene.remove(meshoutMesh)
-    meshoutMesh.geometry.dispose()
-    meshoutMesh.material.dispose()
-    meshoutMesh = null
-  }
+  const previous = type === 'meshb64' ? meshb64Mesh : type === 'meshout' ? meshoutMesh : null
+  if (previous === mesh) return  // unchanged output, keep its geometry
+  if (previous) threeScene.remove(previous)
+  if (type === 'meshb64') meshb64Mesh = null
+  else if (type === 'meshout') meshoutMesh = null
+  if (previous && !isMeshInUse(previous)) disposeMesh(previous)
+
   if (type === 'meshb64') {
     meshb64Mesh = mesh
     threeScene.add(meshb64Mesh)
@@ -147,40 +463,51 @@ function decodeItem(item) {
 }
 
 function collectResults(json) {
+  startResults();
+  json.values.forEach(collectOutput);
+}
+
+function startResults() {
   if (doc) doc.delete();
   doc = new rhino.File3dm();
+}
 
-  json.values.forEach(output => {
-    const branches = output.InnerTree;
-
-    Object.values(branches).forEach(branch => {
-      branch.forEach(item => {
-        const obj = decodeItem(item);
-        if (obj) {
-          const mesh = meshToThreejs(obj);
-
-          // --- Place the mesh into the scene
-          const isMeshb64 = output.ParamName.includes('meshb64');
-          replaceCurrentMesh(mesh, isMeshb64 ? 'meshb64' : 'meshout');
-          
-          // --- Store decoded object (optional)
-          doc.objects().add(obj, null);
-
-          const edges = new THREE.EdgesGeometry(mesh.geometry);
-          const line = new THREE.LineSegments(
-              edges,
-              new THREE.LineBasicMaterial({ color: 0x000000, linewidth: 1 })
-            );
-          line.material.depthTest = false;
-          line.material.depthWrite = false;
-          line.renderOrder = 1; // Prevent visual glitches
-          mesh.add(line);
-        }
-      });
+// Decodes one Compute output param and places its geometry in the scene
+function collectOutput(output) {
+  const branches = output.InnerTree;
+
+  Object.values(branches).forEach(branch => {
+    branch.forEach(item => {
+      if (item.unchanged) return;  // delta response: still on screen
+      const obj = decodeItem(item);
+      if (obj) {
+        const mesh = meshToThreejs(obj);
+
+        // --- Place the mesh into the scene
+        const isMeshb64 = output.ParamName.includes('meshb64');
+        replaceCurrentMesh(mesh, isMeshb64 ? 'meshb64' : 'meshout');
+        
+        // --- Store decoded object (optional)
+        doc.objects().add(obj, null);
+
+        addEdges(mesh);
+      }
     });
   });
 }
 
+function addEdges(mesh) {
+  const edges = new THREE.EdgesGeometry(mesh.geometry);
+  const line = new THREE.LineSegments(
+      edges,
+      new THREE.LineBasicMaterial({ color: 0x000000, linewidth: 1 })
+    );
+  line.material.depthTest = false;
+  line.material.depthWrite = false;
+  line.renderOrder = 1; // Prevent visual glitches
+  mesh.add(line);
+}
+
 
 // Global variables for site and Envelope polygons
 let sitePolygonId = null;
@@ -458,7 +785,7 @@ const customLayer = {
     threeRenderer.autoClear = false
 
     // ✅ Wait for input UI to be ready before computing
-    await fetchGrasshopperInputs(data.definition);
+    await loadGrasshopperInputs();
     registerInputListeners(); // Attach events to newly created input elements
     preloadInputs(PROJECT_INPUTS); // Optional: load saved input values if available
     compute(); // Now inputs are ready and UI is populated
@@ -692,6 +1019,7 @@ function saveSiteEvnelope(SiteEvnelope) {
     console.log('[Form IO] Envelope updated successfully');
     PROJECT_POLYLINE = null;  // ✅ Reset here
     console.log('[Form IO] PROJECT_POLYLINE reset after save.');
+    compute();  // solves use the envelope stored with the project
   }).catch(err => {
     console.error('[Form IO] Failed to save envelope:', err);
   });
@@ -815,7 +1143,9 @@ function updateInputs(parameters) {
         showLoader();
         try {
             const csrfToken = getCSRFToken(); // Ensure you have the CSRF token logic
-            const response = await fetch('/api/openai/chat/', {
+            // Streamed reply: the parameters arrive first and start a solve
+            // while the reasoning is still being written into its bubble
+            const response = await fetch('/api/openai/chat/stream/', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -824,21 +1154,24 @@ function updateInputs(parameters) {
                 body: JSON.stringify({ prompt })
             });
             if (response.ok) {
-                const data = await response.json();
-                // Debugging: Check the received data in the console
-                console.log("Response JSON:", data);
-                console.log("Response Reasoning:", data.parameters.reasoning);
-                console.log("Response Parameters:", data.parameters.parameters);
-                // Check and add reasoning from the response as chat-end bubble
-                if (data.parameters.reasoning) {
-                    addChatMessage(data.parameters.reasoning, true);
-                } else {
-                    addChatMessage('Error: No reasoning found in the response.', true);
-                }
-                // Call updateInputs to update form fields with parameters from the response
-                if (data.parameters) {
-                    updateInputs(data.parameters.parameters);
-                }
+                let reasoningBubble = null;
+                let reasoning = '';
+                await readNdjson(response, event => {
+                    if (event.parameters) {
+                        console.log("Response Parameters:", event.parameters);
+                        hideLoader();
+                        updateInputs(event.parameters);
+                    } else if (event.reasoning) {
+                        reasoning += event.reasoning;
+                        if (!reasoningBubble) reasoningBubble = addChatMessage('', true);
+                        reasoningBubble.textContent = reasoning;
+                        scrollChatToBottom();
+                    } else if (event.error) {
+                        addChatMessage(`Error: ${event.error}`, true);
+                    } else if (event.done && !reasoning) {
+                        addChatMessage('Error: No reasoning found in the response.', true);
+                    }
+                });
             } else {
                 addChatMessage('Error: Unable to process the prompt.', true);
             }
@@ -865,6 +1198,12 @@ function addChatMessage(message, isResponse = false) {
     chat.appendChild(chatBubble);
     chatMessages.appendChild(chat);
     // Scroll to the bottom of the chat box
+    scrollChatToBottom();
+    return chatBubble;
+}
+
+function scrollChatToBottom() {
+    const chatMessages = document.getElementById('chat-messages');
     chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
@@ -891,24 +1230,57 @@ function preloadInputs(savedInputs) {
 async function saveInputsToProject(inputs) {
   if (!PROJECT_ID) return;
 
+  // Send only what changed since the last save, as a JSON Patch
+  const patch = diffInputs(lastSavedInputs, inputs);
+  if (lastSavedInputs && patch.length === 0) return;
+  const body = lastSavedInputs ? { inputs_patch: patch } : { inputs };
+
   try {
-    await fetch(`/api/projects/${PROJECT_ID}/save/`, {
+    const response = await fetch(`/api/projects/${PROJECT_ID}/save/`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
         'X-CSRFToken': getCSRFToken(),
       },
-      body: JSON.stringify(inputs),
+      body: JSON.stringify(body),
     });
+    if (!response.ok) throw new Error(response.statusText);
+    lastSavedInputs = inputs;
     console.log('[Form IO] Inputs saved successfully for project:', PROJECT_ID);
   } catch (error) {
+    lastSavedInputs = null;  // resend everything next time
     console.warn('[Form IO] Failed to save inputs:', error);
   }
 }
 
+// Inputs as last saved, the base for the next patch (null: send them in full)
+let lastSavedInputs = null;
+let saveInputsTimer = null;
+
+function scheduleInputsSave() {
+  clearTimeout(saveInputsTimer);
+  saveInputsTimer = setTimeout(() => saveInputsToProject(getInputs()), 1000);
+}
+
+// Top-level JSON Patch operations turning `before` into `after`
+function diffInputs(before, after) {
+  if (!before) return [];
+  const pointer = key => '/' + key.replace(/~/g, '~0').replace(/\//g, '~1');
+  const patch = [];
+  Object.entries(after).forEach(([key, value]) => {
+    if (!(key in before)) patch.push({ op: 'add', path: pointer(key), value });
+    else if (JSON.stringify(before[key]) !== JSON.stringify(value)) patch.push({ op: 'replace', path: pointer(key), value });
+  });
+  Object.keys(before).forEach(key => {
+    if (!(key in after)) patch.push({ op: 'remove', path: pointer(key) });
+  });
+  return patch;
+}
+
 function onSliderChange() {
   console.log('[Form IO] Slider/input changed – recomputing...');
   compute();
+  if (!live.ready) scheduleInputsSave();  // the live channel saves as it solves
 }
 
 // Dynamically attach events to all inputs in overlay
@@ -925,6 +1297,14 @@ function registerInputListeners() {
 
 
 
+// Inputs are fetched once per page and shared by everything waiting on them
+let grasshopperInputsLoaded = null
+
+function loadGrasshopperInputs() {
+  if (!grasshopperInputsLoaded) grasshopperInputsLoaded = fetchGrasshopperInputs(data.definition)
+  return grasshopperInputsLoaded
+}
+
 async function fetchGrasshopperInputs(definitionFile) {
   try {
     console.log("definition",definitionFile)
@@ -1040,8 +1420,8 @@ document.addEventListener('DOMContentLoaded', async () => {
   preloadInputs(PROJECT_INPUTS);  // okay if these exist
   registerInputListeners();       // not harmful, but won't bind to anything yet
 
-  // ✅ Load GH UI and compute when ready
-  await fetchGrasshopperInputs(data.definition); 
+  // ✅ Start loading the GH UI early; the custom layer waits for the same request
+  loadGrasshopperInputs();
 });
 
 let labelMarkers = [];
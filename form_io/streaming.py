@@ -0,0 +1,150 @@
+"""
+Incremental splitting of Rhino Compute solve responses.
+
+Compute answers a solve with one JSON object whose ``values`` array holds one
+entry per output parameter. ``ArrayScanner`` finds the items of selected
+top-level arrays as the bytes arrive, without parsing the whole document, so
+each output can be forwarded to the browser while the rest is still on the
+wire. Most of a response is the base64 geometry inside JSON strings, which
+the scanner skips over with bytes.find instead of walking byte by byte.
+"""
+import json
+import re
+
+_OUTSIDE_STRING = re.compile(rb'[\[\]{}"]')
+
+_QUOTE = ord('"')
+_OPENERS = (ord("{"), ord("["))
+
+
+class ArrayScanner:
+    """
+    Feed it chunks of a JSON object; it returns ``(key, raw_item)`` pairs for
+    every object, array or string item in the top-level arrays named in
+    ``keys``. Items are the exact bytes from the response.
+    """
+
+    def __init__(self, keys=(b"values", b"errors", b"warnings")):
+        self.keys = set(keys)
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._key_start = None   # start of a string at depth 1 (a candidate key)
+        self._last_key = None
+        self._array_key = None   # key of the array we are inside, if any
+        self._item_start = None
+
+    def feed(self, chunk):
+        buf = self._buf
+        buf += chunk
+        pos = self._pos
+        items = []
+        i = -1  # next quote found while inside a string, reused across escapes
+
+        while True:
+            if self._in_string:
+                if i < pos:
+                    i = buf.find(b'"', pos)
+                escape = buf.find(b"\\", pos, len(buf) if i < 0 else i)
+                if escape >= 0:
+                    if escape + 1 >= len(buf):
+                        pos = escape  # wait for the escaped character
+                        break
+                    pos = escape + 2
+                    continue
+                if i < 0:
+                    pos = len(buf)
+                    break
+                self._in_string = False
+                if self._key_start is not None:
+                    self._last_key = bytes(buf[self._key_start:i])
+                    self._key_start = None
+                elif self._item_start is not None and self._depth == 2:
+                    items.append((self._array_key, bytes(buf[self._item_start:i + 1])))
+                    self._item_start = None
+                pos = i + 1
+                continue
+
+            match = _OUTSIDE_STRING.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            i = match.start()
+            char = buf[i]
+            if char == _QUOTE:
+                self._in_string = True
+                if self._depth == 1:
+                    self._key_start = i + 1
+                elif self._array_key is not None and self._depth == 2:
+                    self._item_start = i
+            elif char in _OPENERS:
+                if self._depth == 1 and char == _OPENERS[1] and self._last_key in self.keys:
+                    self._array_key = self._last_key.decode()
+                elif self._array_key is not None and self._depth == 2:
+                    self._item_start = i
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._array_key is not None:
+                    if self._depth == 2 and self._item_start is not None:
+                        items.append((self._array_key, bytes(buf[self._item_start:i + 1])))
+                        self._item_start = None
+                    elif self._depth == 1:
+                        self._array_key = None
+            pos = i + 1
+
+        # Drop everything we no longer need to look at
+        keep = min(x for x in (pos, self._item_start, self._key_start) if x is not None)
+        if keep:
+            del buf[:keep]
+            pos -= keep
+            if self._item_start is not None:
+                self._item_start -= keep
+            if self._key_start is not None:
+                self._key_start -= keep
+        self._pos = pos
+        return items
+
+
+class SolveEvents:
+    """
+    Turns the raw chunks of a solve response into NDJSON lines:
+    ``{"canonical_inputs": {...}}`` first when ``inputs`` are given,
+    ``{"value": {...}}`` per output parameter, ``{"error": "..."}`` and
+    ``{"warning": "..."}`` per Compute message, then ``{"done": true}``.
+    """
+
+    _PREFIXES = {
+        "values": b'{"value":',
+        "errors": b'{"error":',
+        "warnings": b'{"warning":',
+    }
+
+    def __init__(self, chunks, inputs=None):
+        self.chunks = chunks
+        self.inputs = inputs
+        self._lines = self._generate()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._lines)
+
+    def close(self):
+        self._lines.close()
+        close = getattr(self.chunks, "close", None)
+        if close is not None:
+            close()
+
+    def _generate(self):
+        if self.inputs is not None:
+            yield json.dumps({"canonical_inputs": self.inputs}).encode() + b"\n"
+        scanner = ArrayScanner()
+        for chunk in self.chunks:
+            for key, item in scanner.feed(chunk):
+                # Raw newlines can only be whitespace between JSON tokens, never
+                # inside strings, so replacing them keeps the item valid
+                yield self._PREFIXES[key] + item.replace(b"\n", b" ") + b"}\n"
+        yield b'{"done":true}\n'
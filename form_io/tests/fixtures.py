@@ -0,0 +1,63 @@
+"""Shared test data and helpers."""
+import json
+from unittest import mock
+
+from django.conf import settings
+
+from .. import async_views, definitions, jobs, live, solver, thumbnails, views
+from ..compute_client import ComputeClient
+from ..definitions import DefinitionRegistry
+from ..fake_compute import FakeCompute
+from ..management.commands import sweep_design_space
+from ..solve_cache import SolveCache
+
+
+def compute_response():
+    """A Compute solve response with strings that look like JSON structure."""
+    return json.dumps({
+        "absolutetolerance": 0.01,
+        "pointer": "md5_abc",
+        "values": [
+            {"ParamName": "RH_OUT:mesh", "InnerTree": {"{0}": [
+                {"type": "Rhino.Geometry.Mesh", "data": json.dumps({"archive3dm": 70, "data": "AAAA\"]}[{" * 5})},
+                {"type": "System.String", "data": "\"tab\\tquote\\\"brace}\""},
+            ]}},
+            {"ParamName": "RH_OUT:area", "InnerTree": {"{0;1}": [{"type": "System.Double", "data": "12.5"}]}},
+        ],
+        "errors": ["values: [not an array]"],
+        "warnings": [],
+        "notes": {"values": ["ignored"]},
+    }).encode()
+
+
+def start_fake_compute(test, **options):
+    """A FakeCompute answering right away, stopped when ``test`` ends."""
+    fake = FakeCompute(**{"latency": 0, "io_latency": 0, "payload_kb": 1, **options}).start()
+    test.addCleanup(fake.stop)
+    return fake
+
+
+def use_fake_compute(test, urls=None, **options):
+    """
+    Starts a FakeCompute for ``test`` and sends Compute requests to it (or to
+    ``urls``, which may include it as "fake") through a fresh client, with
+    fresh definition and solve caches. Returns the FakeCompute.
+    """
+    fake = start_fake_compute(test, **options)
+    client = ComputeClient([fake.url if url == "fake" else url for url in urls or ["fake"]], health_check_interval=0)
+    registry = DefinitionRegistry(settings.GRASSHOPPER_FILES_DIR)
+    cache = SolveCache()
+    registry_modules = (definitions, async_views, jobs, live, solver, sweep_design_space, thumbnails, views)
+    for target, name, value in [
+        (definitions, "compute", client),
+        (jobs, "compute", client),
+        *((module, "registry", registry) for module in registry_modules),
+        *((module, "solve_cache", cache) for module in (jobs, solver, views)),
+    ]:
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    fake.client = client
+    fake.registry = registry
+    fake.cache = cache
+    return fake
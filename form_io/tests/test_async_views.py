@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import async_views
+from ..solver import asolve
+from .fixtures import use_fake_compute
+
+
+class AsyncSolveTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self, latency=0.1)
+        self.definition = self.fake.registry.get("test_main_2.gh")
+
+    def test_each_event_loop_gets_its_own_client(self):
+        # Under WSGI every async view runs in a new event loop
+        for width in (30000, 40000):
+            with self.subTest(width=width):
+                self.assertIn(b"values", asyncio.run(asolve(self.definition, {"podium_width": width})))
+        self.assertEqual(self.fake.calls["/grasshopper"], 2)
+
+    def test_concurrent_requests_share_one_compute_call(self):
+        async def main():
+            return await asyncio.gather(*(asolve(self.definition, {"podium_width": 30000}) for _ in range(3)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.fake.calls["/grasshopper"], 1)
+
+    def test_async_view_runs_under_async_to_sync(self):
+        view = async_to_sync(async_views.solve_grasshopper)
+        for width in (30000, 40000):
+            request = RequestFactory().post("/api/rhino/solve/", {
+                "grasshopper_file_name": "test_main_2.gh",
+                "input_data": json.dumps({"podium_width": width}),
+            })
+            with self.subTest(width=width):
+                response = view(request)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content)["canonical_inputs"], {"podium_width": width})
+
+        request = RequestFactory().post("/api/rhino/solve/", {"grasshopper_file_name": "missing.gh"})
+        self.assertEqual(view(request).status_code, 404)
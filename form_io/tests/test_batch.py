@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import solver
+from ..compute_client import ComputeError
+from ..solver import solve_many
+from .fixtures import use_fake_compute
+
+
+class SolveManyTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        self.definition = self.fake.registry.get("test_main_2.gh")
+
+    def test_identical_inputs_are_solved_once(self):
+        inputs_list = [{"podium_width": 30000}, {"podium_width": 40000}, {"podium_width": 30000}]
+        completed = list(solve_many(self.definition, inputs_list, max_workers=4))
+        self.assertEqual(sorted(indices for indices, _, _ in completed), [[0, 2], [1]])
+        self.assertTrue(all(error is None for _, _, error in completed))
+        self.assertEqual(self.fake.calls["/grasshopper"], 2)
+
+    def test_solves_in_flight_stay_under_the_cap(self):
+        running, peak = 0, 0
+        lock = threading.Lock()
+
+        def slow_solve(definition, inputs):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return b"{}"
+
+        with mock.patch.object(solver, "solve", slow_solve):
+            completed = list(solve_many(self.definition, [{"podium_width": i} for i in range(10)], max_workers=3))
+        self.assertEqual(len(completed), 10)
+        self.assertEqual(peak, 3)
+
+
+class BatchViewTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+
+    def batch(self, inputs, **options):
+        body = {"grasshopper_file_name": "test_main_2.gh", "inputs": inputs, **options}
+        return self.client.post("/api/rhino/solve/batch/", json.dumps(body), content_type="application/json")
+
+    def test_results_come_back_in_input_order(self):
+        inputs = [{"podium_width": width} for width in (30000, 40049, 30000)]
+        response = self.batch(inputs, concurrency=2)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([item["index"] for item in results], [0, 1, 2])
+        self.assertEqual([item["canonical_inputs"] for item in results],
+                         [{"podium_width": 30000}, {"podium_width": 40000}, {"podium_width": 30000}])
+        self.assertTrue(all(item["success"] for item in results))
+        self.assertEqual(results[0]["result"], results[2]["result"])
+        self.assertEqual(self.fake.calls["/grasshopper"], 2)
+
+    def test_failures_are_reported_per_item(self):
+        real_solve = solver.solve
+
+        def solve(definition, inputs):
+            if inputs["podium_width"] == 40000:
+                raise ComputeError("Solve failed", status=502)
+            return real_solve(definition, inputs)
+
+        with mock.patch.object(solver, "solve", solve):
+            results = self.batch([{"podium_width": 30000}, {"podium_width": 40000}]).json()["results"]
+        self.assertTrue(results[0]["success"])
+        self.assertEqual({key: results[1][key] for key in ("success", "error", "status")},
+                         {"success": False, "error": "Solve failed", "status": 502})
+
+    def test_streamed_results_end_with_done(self):
+        response = self.batch([{"podium_width": 30000}, {"podium_width": 40000}], stream=True)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[-1], {"done": True})
+        self.assertEqual(sorted(line["index"] for line in lines[:-1]), [0, 1])
+
+    @override_settings(SOLVE_BATCH_MAX_ITEMS=2)
+    def test_invalid_batches_are_400(self):
+        for inputs in ["not a list", [{"podium_width": 1}] * 3, [{}, {"floor_height": "tall"}]]:
+            with self.subTest(inputs=inputs):
+                response = self.batch(inputs)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()["success"])
+        self.assertIn("inputs[1]", self.batch([{}, {"floor_height": "tall"}]).json()["error"])
+        self.assertNotIn("/grasshopper", self.fake.calls)
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import chat, views
+from ..chat import (
+    RESPONSE_FORMAT,
+    ChatCache,
+    ReplyScanner,
+    build_chat_request,
+    chat_cache_key,
+    parse_chat_message,
+)
+
+PARAMETERS = {
+    "podium_length": 60000, "podium_width": 30000, "podium_no_of_floors": 4, "floor_height": 3000,
+    "building_type": 1, "tower_num_floors": 20, "courtyard_offset": 0, "staggered_offset": 0,
+    "polyline_offset": 12000,
+}
+
+
+def completion(content, refusal=None):
+    message = SimpleNamespace(content=content, refusal=refusal)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class ReplyScannerTests(SimpleTestCase):
+    reply = json.dumps({
+        "reasoning": "Two \"towers\"\né\U0001F3D9 \\u and \\ud83d",
+        "parameters": {"building_type": 1, "tower_num_floors": 20},
+    }, ensure_ascii=True)
+
+    def scan(self, text, chunk_size):
+        scanner = ReplyScanner()
+        parameters = []
+        reasoning = ""
+        for start in range(0, len(text), chunk_size):
+            found, delta = scanner.feed(text[start:start + chunk_size])
+            if found is not None:
+                parameters.append(found)
+            reasoning += delta
+        return parameters, reasoning
+
+    def test_any_chunking(self):
+        expected = json.loads(self.reply)
+        for chunk_size in [1, 2, 3, 5, 8, len(self.reply)]:
+            with self.subTest(chunk_size=chunk_size):
+                parameters, reasoning = self.scan(self.reply, chunk_size)
+                self.assertEqual(parameters, [expected["parameters"]])
+                self.assertEqual(reasoning, expected["reasoning"])
+
+    def test_escape_before_surrogate_like_text(self):
+        # "\nDa" is a newline and "Da", not the start of a surrogate
+        scanner = ReplyScanner()
+        _, first = scanner.feed('{"reasoning": "Line\\nDa')
+        _, second = scanner.feed('y two"}')
+        self.assertEqual(first, "Line\nDa")
+        self.assertEqual(second, "y two")
+
+    def test_waits_for_the_low_surrogate(self):
+        scanner = ReplyScanner()
+        _, first = scanner.feed('{"reasoning": "a\\ud83c')
+        _, second = scanner.feed('\\udfd9"}')
+        self.assertEqual((first, second), ("a", "\U0001F3D9"))
+
+
+class ChatCacheTests(SimpleTestCase):
+    def test_entries_expire_after_the_ttl(self):
+        cache = ChatCache(ttl=60)
+        with mock.patch.object(chat.time, "monotonic", return_value=1000):
+            cache.set("a", {"x": 1})
+        with mock.patch.object(chat.time, "monotonic", return_value=1059):
+            self.assertEqual(cache.get("a"), {"x": 1})
+        with mock.patch.object(chat.time, "monotonic", return_value=1060):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 1))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ChatCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+    def test_disabled_cache_keeps_nothing(self):
+        for cache in [ChatCache(ttl=0), ChatCache(max_entries=0)]:
+            cache.set("a", 1)
+            self.assertIsNone(cache.get("a"))
+
+    def test_key_ignores_case_and_whitespace_but_not_the_model(self):
+        self.assertEqual(chat_cache_key("Two  towers\n", "m"), chat_cache_key("two towers", "m"))
+        self.assertNotEqual(chat_cache_key("two towers", "m"), chat_cache_key("two towers", "other"))
+
+
+class ChatRequestTests(SimpleTestCase):
+    @override_settings(OPENAI_CHAT_MODEL="test-model")
+    def test_request_uses_the_schema(self):
+        request = build_chat_request("Two towers")
+        self.assertEqual(request["model"], "test-model")
+        self.assertEqual(request["response_format"], RESPONSE_FORMAT)
+        self.assertTrue(request["messages"][1]["content"].endswith("Two towers"))
+
+    def test_parse_chat_message(self):
+        reply = json.dumps({"parameters": PARAMETERS, "reasoning": "Because"})
+        self.assertEqual(parse_chat_message(completion(reply).choices[0].message),
+                         {"parameters": PARAMETERS, "reasoning": "Because"})
+        with self.assertLogs("form_io.chat", "WARNING"):
+            self.assertIn("error", parse_chat_message(completion("not json").choices[0].message))
+        self.assertEqual(parse_chat_message(completion(None, refusal="No").choices[0].message), {"error": "No"})
+
+
+class ChatViewTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(views, "chat_cache", ChatCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def chat(self, prompt):
+        return self.client.post("/api/openai/chat/", json.dumps({"prompt": prompt}), content_type="application/json")
+
+    def test_repeated_prompts_are_answered_from_the_cache(self):
+        reply = completion(json.dumps({"parameters": PARAMETERS, "reasoning": "Because"}))
+        with mock.patch.object(views.client.chat.completions, "create", return_value=reply) as create:
+            first = self.chat("Two towers")
+            second = self.chat("  two TOWERS ")
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first.json()["parameters"]["parameters"], PARAMETERS)
+
+    def test_errors_are_not_cached(self):
+        with mock.patch.object(views.client.chat.completions, "create",
+                               return_value=completion(None, refusal="No")) as create:
+            self.assertEqual(self.chat("Two towers").status_code, 500)
+            self.assertEqual(self.chat("Two towers").status_code, 500)
+        self.assertEqual(create.call_count, 2)
@@ -0,0 +1,95 @@
+import socket
+
+from django.test import SimpleTestCase
+
+from ..compute_client import ComputeClient, ComputeError
+from ..solver import solve_stream
+from .fixtures import start_fake_compute, use_fake_compute
+
+
+def unused_url():
+    """The URL of a local port nothing listens on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def outstanding(client):
+    return [node["outstanding"] for node in client.status()]
+
+
+class LoadBalancingTests(SimpleTestCase):
+    def test_requests_go_to_the_node_with_the_fewest_in_flight(self):
+        a, b = start_fake_compute(self), start_fake_compute(self)
+        client = ComputeClient([a.url, b.url], health_check_interval=0)
+
+        held = client.post("/io", json={"algo": "x"}, stream=True)
+        busy = outstanding(client).index(1)
+        for _ in range(3):
+            client.post("/io", json={"algo": "x"}).close()
+        self.assertEqual([a.calls.get("/io", 0), b.calls.get("/io", 0)][1 - busy], 3)
+
+        held.close()
+        held.close()  # closing twice releases once
+        self.assertEqual(outstanding(client), [0, 0])
+
+    def test_idle_nodes_take_turns(self):
+        a, b = start_fake_compute(self), start_fake_compute(self)
+        client = ComputeClient([a.url, b.url], health_check_interval=0)
+        for _ in range(4):
+            client.post("/io", json={"algo": "x"})
+        self.assertEqual((a.calls["/io"], b.calls["/io"]), (2, 2))
+
+    def test_streamed_solve_holds_its_node_until_read(self):
+        fake = use_fake_compute(self)
+        definition = fake.registry.get("test_main_2.gh")
+        chunks = solve_stream(definition, {"podium_width": 30000})
+        self.assertEqual(outstanding(fake.client), [1])
+        b"".join(chunks)
+        self.assertEqual(outstanding(fake.client), [0])
+
+        chunks = solve_stream(definition, {"podium_width": 40000})
+        chunks.close()
+        self.assertEqual(outstanding(fake.client), [0])
+
+    def test_failed_streamed_response_releases_its_node(self):
+        fake = start_fake_compute(self)
+        client = ComputeClient([fake.url], health_check_interval=0)
+        response = client.post("/grasshopper", json={"pointer": "unknown"}, stream=True)
+        self.assertEqual(response.status_code, 500)
+        response.close()
+        self.assertEqual(outstanding(client), [0])
+
+
+class FailoverTests(SimpleTestCase):
+    def test_refused_connections_fail_over_and_eject_the_node(self):
+        fake = start_fake_compute(self)
+        dead = unused_url()
+        client = ComputeClient([dead, fake.url], health_check_interval=0, max_failures=1)
+        with self.assertLogs("form_io.compute_client", "WARNING"):
+            for _ in range(3):
+                self.assertEqual(client.post("/io", json={"algo": "x"}).status_code, 200)
+        self.assertEqual(fake.calls["/io"], 3)
+        self.assertEqual([node["healthy"] for node in client.status()], [False, True])
+        self.assertEqual(outstanding(client), [0, 0])
+
+    def test_health_check_readmits_a_node(self):
+        dead = unused_url()
+        client = ComputeClient([dead], health_check_interval=0, max_failures=1)
+        with self.assertRaises(ComputeError) as raised, self.assertLogs("form_io.compute_client", "WARNING"):
+            client.post("/io", json={"algo": "x"})
+        self.assertEqual(raised.exception.status, 503)
+        self.assertFalse(client.status()[0]["healthy"])
+
+        port = int(dead.rsplit(":", 1)[1])
+        start_fake_compute(self, port=port)
+        with self.assertLogs("form_io.compute_client", "INFO"):
+            client.check_health()
+        self.assertTrue(client.status()[0]["healthy"])
+        self.assertEqual(client.post("/io", json={"algo": "x"}).status_code, 200)
+
+    def test_every_node_down(self):
+        client = ComputeClient([unused_url(), unused_url()], health_check_interval=0)
+        with self.assertRaises(ComputeError):
+            client.post("/io", json={"algo": "x"})
+        self.assertEqual(outstanding(client), [0, 0])
@@ -0,0 +1,191 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase
+
+from .. import async_views
+from ..compute_client import ComputeError
+from ..definitions import DefinitionRegistry
+from ..solver import solve
+from .fixtures import use_fake_compute
+
+
+def compute_response(status, body):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+    response.raw = io.BytesIO(response._content)
+    return response
+
+
+class PointerTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        self.definition = self.fake.registry.get("test_main_2.gh")
+
+    def test_uploads_once_then_solves_by_pointer(self):
+        solve(self.definition, {"podium_width": 30000})
+        pointer = self.definition.pointer
+        self.assertTrue(pointer)
+        with mock.patch.object(self.fake.client, "post", wraps=self.fake.client.post) as post:
+            solve(self.definition, {"podium_width": 40000})
+        body = post.call_args.kwargs["json"]
+        self.assertEqual((body["pointer"], body["algo"]), (pointer, None))
+
+    def test_unknown_pointer_is_uploaded_again(self):
+        solve(self.definition, {"podium_width": 30000})
+        self.fake.definitions.clear()  # Compute restarted
+        solve(self.definition, {"podium_width": 40000})
+        self.assertEqual(self.fake.calls["/grasshopper"], 3)
+        self.assertIn(self.definition.pointer, self.fake.definitions)
+
+    def test_only_pointer_misses_are_uploaded_again(self):
+        self.definition.pointer = "md5_KNOWN"
+        for status, body, uploads in [
+            (404, "Not found", 1),
+            (410, "Gone", 1),
+            (500, "Unable to find definition", 1),
+            (500, "Solve failed: division by zero", 0),
+            (400, "Bad values", 0),
+            (200, {"values": []}, 0),
+        ]:
+            with self.subTest(status=status, body=body):
+                responses = [compute_response(status, body), compute_response(200, {"pointer": "md5_NEW"})]
+                with mock.patch.object(self.fake.client, "post", side_effect=responses) as post:
+                    response = self.fake.registry.post(self.definition, "/grasshopper", {"values": []})
+                self.assertEqual(post.call_count, 1 + uploads)
+                if uploads:
+                    self.assertEqual(post.call_args.kwargs["json"]["algo"], self.definition.encoded)
+                    self.assertEqual(self.definition.pointer, "md5_NEW")
+                else:
+                    self.assertEqual(response.status_code, status)
+                    self.assertEqual(self.definition.pointer, "md5_KNOWN")
+                self.definition.pointer = "md5_KNOWN"
+
+    def test_async_post_only_uploads_again_on_a_pointer_miss(self):
+        async def post(definition):
+            return await self.fake.registry.apost(definition, "/grasshopper", {"values": []})
+
+        self.definition.pointer = "md5_KNOWN"
+        responses = [httpx.Response(500, text="Solve failed")]
+        with mock.patch.object(self.fake.client, "apost", side_effect=responses) as apost:
+            self.assertEqual(asyncio.run(post(self.definition)).status_code, 500)
+        self.assertEqual(apost.call_count, 1)
+
+        responses = [httpx.Response(404, text="Not found"), httpx.Response(200, json={"pointer": "md5_NEW"})]
+        with mock.patch.object(self.fake.client, "apost", side_effect=responses) as apost:
+            self.assertEqual(asyncio.run(post(self.definition)).status_code, 200)
+        self.assertEqual(apost.call_count, 2)
+        self.assertEqual(self.definition.pointer, "md5_NEW")
+
+
+class RegistryTests(SimpleTestCase):
+    def test_names_outside_the_directory_are_refused(self):
+        registry = DefinitionRegistry(settings.GRASSHOPPER_FILES_DIR)
+        self.assertIsNotNone(registry.get("test_main_2.gh"))
+        for name in ["", None, "missing.gh", "../manage.py", "/etc/passwd"]:
+            with self.subTest(name=name):
+                self.assertIsNone(registry.get(name))
+
+    def test_definition_is_read_once(self):
+        registry = DefinitionRegistry(settings.GRASSHOPPER_FILES_DIR)
+        self.assertIs(registry.get("test_main_2.gh"), registry.get("test_main_2.gh"))
+
+
+class SolveViewTests(SimpleTestCase):
+    def test_unknown_definition_is_404(self):
+        use_fake_compute(self)
+        response = self.client.post("/api/rhino/solve/", {"grasshopper_file_name": "missing.gh", "input_data": "{}"})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()["success"])
+
+    def test_solve_returns_compute_json_with_canonical_inputs(self):
+        fake = use_fake_compute(self)
+        response = self.client.post("/api/rhino/solve/", {
+            "grasshopper_file_name": "test_main_2.gh",
+            "input_data": json.dumps({"podium_width": 30049}),
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["canonical_inputs"], {"podium_width": 30000})
+        self.assertEqual([value["ParamName"] for value in data["values"]], ["RH_OUT:meshb64", "RH_OUT:meshout"])
+        self.assertEqual(fake.calls["/grasshopper"], 1)
+
+
+class IoTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "a.gh")
+        shutil.copy(os.path.join(settings.GRASSHOPPER_FILES_DIR, "test_main_2.gh"), self.path)
+        self.registry = DefinitionRegistry(directory.name)
+
+    def test_io_is_fetched_once_per_file_content(self):
+        first = self.registry.io(self.registry.get("a.gh"))
+        self.assertEqual(self.registry.io(self.registry.get("a.gh")), first)
+        self.assertEqual(self.fake.calls["/io"], 1)
+
+        with open(self.path, "ab") as f:
+            f.write(b"changed")
+        self.registry.io(self.registry.get("a.gh"))
+        self.assertEqual(self.fake.calls["/io"], 2)
+
+    def test_warm_io_fetches_every_definition(self):
+        shutil.copy(self.path, os.path.join(self.registry.directory, "b.ghx"))
+        open(os.path.join(self.registry.directory, "notes.txt"), "w").close()
+        self.registry.warm_io()
+        self.assertEqual(self.fake.calls["/io"], 2)
+        self.registry.warm_io()
+        self.assertEqual(self.fake.calls["/io"], 2)
+
+    def test_compute_errors_are_not_cached(self):
+        self.fake.stop()
+        with self.assertRaises(ComputeError), self.assertLogs("form_io", "WARNING"):
+            self.registry.io(self.registry.get("a.gh"))
+        self.assertIsNone(self.registry._cached_io(self.registry.get("a.gh")))
+
+
+class GrasshopperParamsViewTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+
+    def get(self, **headers):
+        return self.client.get("/api/rhino/params/", {"file": "test_main_2.gh"}, headers=headers)
+
+    def test_conditional_requests_get_a_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        definition = self.fake.registry.get("test_main_2.gh")
+        self.assertEqual(response["ETag"], f'"{definition.digest}"')
+
+        for headers in [{"If-None-Match": response["ETag"]}, {"If-Modified-Since": response["Last-Modified"]}]:
+            with self.subTest(headers=headers):
+                revalidated = self.get(**headers)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated.content, b"")
+        self.assertEqual(self.get(**{"If-None-Match": '"other"'}).status_code, 200)
+        self.assertEqual(self.fake.calls["/io"], 1)
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.get("/api/rhino/params/").status_code, 400)
+        self.assertEqual(self.client.get("/api/rhino/params/", {"file": "missing.gh"}).status_code, 404)
+
+    def test_async_view_revalidates_too(self):
+        view = async_to_sync(async_views.get_grasshopper_params)
+        response = view(RequestFactory().get("/api/rhino/params/", {"file": "test_main_2.gh"}))
+        self.assertEqual(response.status_code, 200)
+        request = RequestFactory().get("/api/rhino/params/", {"file": "test_main_2.gh"},
+                                       headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(view(request).status_code, 304)
+        self.assertEqual(self.fake.calls["/io"], 1)
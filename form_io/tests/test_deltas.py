@@ -0,0 +1,54 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import deltas
+from ..deltas import OutputHashes, delta_meshes, delta_result
+from ..fake_compute import box_mesh
+from ..meshes import UNCHANGED, pack_meshes, packed_entries
+from .fixtures import compute_response
+
+
+class DeltaTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(deltas, "output_hashes", OutputHashes(max_sessions=2, solves_per_session=2))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_delta_result(self):
+        first = compute_response()
+        self.assertEqual(delta_result(first, "client", 1, 0), first)
+
+        document = json.loads(first)
+        document["values"][1]["InnerTree"]["{0;1}"][0]["data"] = "13.0"
+        second = json.dumps(document).encode()
+        delta = json.loads(delta_result(second, "client", 2, 1))
+        self.assertEqual(delta["values"][0]["InnerTree"]["{0}"], [{"unchanged": True}, {"unchanged": True}])
+        self.assertEqual(delta["values"][1]["InnerTree"]["{0;1}"][0]["data"], "13.0")
+
+        # Unknown bases, and other clients' solves, get everything
+        self.assertEqual(delta_result(second, "client", 3, 7), second)
+        self.assertEqual(delta_result(second, "other", 1, 2), second)
+
+    def test_delta_meshes(self):
+        podium = box_mesh(0, 0, 0, 4, 2, 1)
+        first = pack_meshes([("podium", podium), ("tower", box_mesh(1, 1, 1, 3, 2, 9))])
+        second = pack_meshes([("podium", podium), ("tower", box_mesh(1, 1, 1, 3, 2, 12))])
+        self.assertEqual(delta_meshes(first, "client", 1, 0), (first, False))
+
+        delta, replaced = delta_meshes(second, "client", 2, 1)
+        self.assertTrue(replaced)
+        (_, podium_entry), (_, tower_entry) = packed_entries(delta)
+        self.assertEqual(podium_entry[2], UNCHANGED)
+        self.assertEqual(tower_entry, packed_entries(second)[1][1])
+
+    def test_old_solves_and_sessions_are_dropped(self):
+        hashes = deltas.output_hashes
+        for seq in (1, 2, 3):
+            hashes.exchange("a", seq, 0, {"x": str(seq)})
+        self.assertEqual(hashes.exchange("a", 4, 1, {}), {})
+        self.assertEqual(hashes.exchange("a", 5, 3, {}), {"x": "3"})
+        hashes.exchange("b", 1, 0, {"x": "b"})
+        hashes.exchange("c", 1, 0, {"x": "c"})
+        self.assertEqual(hashes.exchange("a", 6, 5, {}), {})
@@ -0,0 +1,128 @@
+import gzip
+import io
+import json
+import math
+import random
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from .. import views
+from ..design_space import (
+    INPUT_RANGES,
+    KDTree,
+    SampleIndex,
+    active_params,
+    grid_samples,
+    latin_hypercube_samples,
+    normalize,
+)
+from ..meshes import packed_entries
+from ..models import DesignSample
+from .fixtures import use_fake_compute
+
+
+class SamplingTests(SimpleTestCase):
+    def test_grid_covers_each_building_type(self):
+        samples = list(grid_samples(2))
+        # Two values per active parameter; the integer axes keep both ends
+        expected = sum(2 ** len(active_params(building_type)) for building_type in range(6))
+        self.assertEqual(len(samples), expected)
+        self.assertEqual({sample["building_type"] for sample in samples}, set(range(6)))
+
+    def test_latin_hypercube_stays_in_range(self):
+        samples = list(latin_hypercube_samples(4, seed=1))
+        self.assertEqual(len(samples), 24)
+        for sample in samples:
+            for name, (low, high) in INPUT_RANGES.items():
+                self.assertLessEqual(low, sample[name])
+                self.assertLessEqual(sample[name], high)
+            self.assertIsInstance(sample["tower_num_floors"], int)
+        self.assertEqual(samples, list(latin_hypercube_samples(4, seed=1)))
+
+    def test_normalize_clamps_to_the_unit_cube(self):
+        point = normalize({"podium_length": 10 ** 9, "podium_width": -5, "floor_height": "tall"}, 0)
+        self.assertEqual(point[:2], (1.0, 0.0))
+        self.assertEqual(point[3], 0.0)
+
+
+class KDTreeTests(SimpleTestCase):
+    def test_nearest_matches_a_linear_scan(self):
+        rng = random.Random(0)
+        points = [tuple(rng.random() for _ in range(5)) for _ in range(300)]
+        tree = KDTree(points, list(range(len(points))))
+        for _ in range(50):
+            target = tuple(rng.random() for _ in range(5))
+            expected = min(range(len(points)), key=lambda i: math.dist(points[i], target))
+            distance, found = tree.nearest(target)
+            self.assertEqual(found, expected)
+            self.assertAlmostEqual(distance, math.dist(points[expected], target))
+
+    def test_empty_tree(self):
+        self.assertIsNone(KDTree([], []).nearest((0.5,)))
+
+
+class SampleIndexTests(TestCase):
+    def add_sample(self, key, building_type, **params):
+        return DesignSample.objects.create(
+            definition_digest="def", context_digest="ctx", solve_key=key,
+            building_type=building_type, inputs={"building_type": building_type, **params}, result=b"",
+        )
+
+    def test_nearest_sample_of_the_same_building_type(self):
+        low = self.add_sample("a", 0, podium_length=20000)
+        high = self.add_sample("b", 0, podium_length=180000)
+        self.add_sample("c", 1, podium_length=30000)
+        index = SampleIndex()
+        self.assertEqual(index.nearest("def", "ctx", {"building_type": 0, "podium_length": 40000})[1], low.pk)
+        self.assertEqual(index.nearest("def", "ctx", {"building_type": 0, "podium_length": 150000})[1], high.pk)
+        self.assertIsNone(index.nearest("def", "ctx", {"building_type": 4}))
+        self.assertIsNone(index.nearest("def", "other", {"building_type": 0}))
+
+    def test_new_samples_are_picked_up_after_the_refresh_interval(self):
+        self.add_sample("a", 0, podium_length=20000)
+        index = SampleIndex(refresh_interval=60)
+        params = {"building_type": 0, "podium_length": 180000}
+        first = index.nearest("def", "ctx", params)
+        later = self.add_sample("b", 0, podium_length=180000)
+        self.assertEqual(index.nearest("def", "ctx", params), first)
+        index.refresh_interval = 0
+        self.assertEqual(index.nearest("def", "ctx", params), (0.0, later.pk))
+
+
+class SweepTests(TestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        patcher = mock.patch.object(views, "sample_index", SampleIndex(refresh_interval=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sweep(self, *args):
+        call_command("sweep_design_space", "test_main_2.gh", "--samples", "2", *args, stdout=io.StringIO())
+
+    def preview(self, **inputs):
+        return self.client.post("/api/rhino/solve/preview/", {
+            "grasshopper_file_name": "test_main_2.gh",
+            "input_data": json.dumps(inputs),
+        }, HTTP_ACCEPT_ENCODING="gzip")
+
+    def test_sweep_stores_each_sample_once(self):
+        self.sweep()
+        self.assertEqual(DesignSample.objects.count(), 12)
+        self.assertEqual(self.fake.calls["/grasshopper"], 12)
+        sample = DesignSample.objects.first()
+        self.assertTrue(packed_entries(gzip.decompress(sample.result)))
+        self.assertIn("podium_width", sample.inputs)
+
+        self.sweep()  # already stored, nothing is solved again
+        self.assertEqual(DesignSample.objects.count(), 12)
+        self.assertEqual(self.fake.calls["/grasshopper"], 12)
+
+    def test_preview_serves_the_nearest_sample(self):
+        self.assertEqual(self.preview(building_type=2).status_code, 404)
+        self.sweep()
+        response = self.preview(building_type=2, podium_width=50000)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertGreaterEqual(float(response["X-Preview-Distance"]), 0)
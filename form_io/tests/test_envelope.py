@@ -0,0 +1,96 @@
+import importlib
+import json
+import math
+import random
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from ..geometry import EARTH_RADIUS_M, envelope_vertices, local_coordinates, simplify
+from ..models import Project, project_envelope_vertices
+from .fixtures import use_fake_compute
+
+# 100 m along the equator, where (0.5, 0.5) in normalized Web Mercator lies
+STEP = 100 / (2 * math.pi * EARTH_RADIUS_M)
+
+
+def envelope(*points):
+    return {"points": [{"x": 0.5 + x * STEP, "y": 0.5 - y * STEP, "z": z} for x, y, z in points]}
+
+
+def parse(vertices):
+    return [tuple(float(value) for value in point.split(",")) for point in vertices.split(";")]
+
+
+class EnvelopeVerticesTests(SimpleTestCase):
+    def test_local_coordinates_are_metres_from_the_first_point(self):
+        local = local_coordinates([(0.5, 0.5, 2), (0.5 + STEP, 0.5, 2), (0.5, 0.5 + STEP, 5)])
+        self.assertEqual(local[0], (0, 0, 0))
+        self.assertAlmostEqual(local[1][0], 100, delta=0.1)
+        self.assertAlmostEqual(local[2][1], -100, delta=0.1)  # Mercator y grows southwards
+        self.assertEqual(local[2][2], 3)
+
+    def test_simplify_drops_points_within_the_tolerance(self):
+        ring = [(0, 0), (5, 0.01), (10, 0), (10, 10), (0, 10), (0, 0)]
+        self.assertEqual(simplify(ring, 0.05), [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)])
+        self.assertEqual(simplify(ring, 0), ring)
+
+    def test_vertex_string(self):
+        vertices = envelope_vertices(envelope((0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 0, 0)), decimals=1)
+        points = parse(vertices)
+        self.assertEqual(len(points), 4)
+        self.assertEqual(vertices.split(";")[0], "0.0,0.0,0.0")
+        self.assertAlmostEqual(points[2][0], 100, delta=0.2)
+        self.assertNotIn("-0.0,", vertices)
+        for site_envelope in [{}, None, envelope((0, 0, 0)), {"points": [{"x": "bad"}, {"y": 1}]}]:
+            with self.subTest(site_envelope=site_envelope):
+                self.assertEqual(envelope_vertices(site_envelope), "")
+
+    def test_migration_0012_matches_the_model(self):
+        migration = importlib.import_module("form_io.migrations.0012_project_envelope_vertices")
+        self.assertEqual((migration.SIMPLIFY_TOLERANCE, migration.DECIMALS),
+                         (settings.SITE_ENVELOPE_SIMPLIFY_TOLERANCE, settings.SOLVE_ENVELOPE_DECIMALS))
+        rng = random.Random(0)
+        for _ in range(20):
+            site_envelope = envelope(*((rng.uniform(-5, 5), rng.uniform(-5, 5), rng.uniform(0, 3)) for _ in range(12)))
+            self.assertEqual(migration.envelope_vertices(site_envelope), project_envelope_vertices(site_envelope))
+
+
+class ProjectEnvelopeTests(TestCase):
+    def test_envelope_is_preprocessed_when_saved(self):
+        project = Project.objects.create(name="site", site_envelope=envelope((0, 0, 0), (1, 0, 0)))
+        first = project.envelope_vertices
+        self.assertEqual(first, project_envelope_vertices(project.site_envelope))
+
+        project.inputs = {"podium_width": 30000}
+        project.save(update_fields=["inputs"])
+        self.assertEqual(Project.objects.get(pk=project.pk).envelope_vertices, first)
+
+        project.site_envelope = envelope((0, 0, 0), (2, 0, 0))
+        project.save(update_fields=["site_envelope"])
+        self.assertNotEqual(Project.objects.get(pk=project.pk).envelope_vertices, first)
+
+
+class SolveWithProjectEnvelopeTests(TestCase):
+    def setUp(self):
+        use_fake_compute(self)
+        self.project = Project.objects.create(name="site", site_envelope=envelope((0, 0, 0), (1, 0, 0), (1, 1, 0)))
+
+    def solve(self, **data):
+        return self.client.post("/api/rhino/solve/", {
+            "grasshopper_file_name": "test_main_2.gh",
+            "input_data": json.dumps({"podium_width": 30000, "envelope_vertices": "0,0,0;1,1,0"}),
+            **data,
+        })
+
+    def test_solves_use_the_stored_envelope(self):
+        response = self.solve(project_id=self.project.pk)
+        self.assertEqual(response.json()["canonical_inputs"]["envelope_vertices"], self.project.envelope_vertices)
+        self.assertEqual(self.solve().json()["canonical_inputs"]["envelope_vertices"], "0.00,0.00,0.00;1.00,1.00,0.00")
+
+    def test_unknown_project_is_400(self):
+        for project_id in [self.project.pk + 1, "abc"]:
+            with self.subTest(project_id=project_id):
+                response = self.solve(project_id=project_id)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("project_id", response.json()["errors"])
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from ..jobs import JobQueue
+from ..models import SolveJob
+from .fixtures import use_fake_compute
+
+INPUTS = {"podium_width": 30000}
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        self.queue = JobQueue(per_node=2, poll_interval=0.01)
+
+    def job(self, priority=0, **fields):
+        return SolveJob.objects.create(definition="test_main_2.gh", inputs=INPUTS, priority=priority, **fields)
+
+    def test_claims_by_priority_then_age(self):
+        batch = self.job(priority=10)
+        first = self.job()
+        second = self.job()
+        claimed = [self.queue.claim(), self.queue.claim()]
+        self.assertEqual([job.pk for job in claimed], [first.pk, second.pk])
+        self.assertEqual([job.attempts for job in claimed], [1, 1])
+        self.assertTrue(all(job.status == SolveJob.RUNNING and job.started_at for job in claimed))
+
+        self.queue.run(claimed[0])
+        self.assertEqual(self.queue.claim().pk, batch.pk)
+        self.assertIsNone(self.queue.claim())
+
+    def test_running_jobs_in_any_process_count_against_capacity(self):
+        self.job(status=SolveJob.RUNNING, started_at=timezone.now())  # left by another process
+        self.job(status=SolveJob.RUNNING, started_at=timezone.now())
+        queued = self.job()
+        self.assertIsNone(self.queue.claim())
+        SolveJob.objects.filter(status=SolveJob.RUNNING).first().delete()
+        self.assertEqual(self.queue.claim().pk, queued.pk)
+
+    def test_run_stores_the_result(self):
+        self.job()
+        self.queue.run(self.queue.claim())
+        job = SolveJob.objects.get()
+        self.assertEqual(job.status, SolveJob.DONE)
+        self.assertIn(b'"values"', bytes(job.result))
+        self.assertEqual(self.fake.calls["/grasshopper"], 1)
+
+    def test_cancelled_jobs_are_not_claimed(self):
+        queued = self.job()
+        response = self.client.delete(f"/api/rhino/jobs/{queued.pk}/")
+        self.assertEqual(response.json()["job"]["status"], SolveJob.CANCELLED)
+        self.assertIsNone(self.queue.claim())
+
+        running = self.job()
+        self.queue.claim()
+        response = self.client.delete(f"/api/rhino/jobs/{running.pk}/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SolveJob.objects.get(pk=running.pk).status, SolveJob.RUNNING)
+
+    def test_stale_jobs_are_requeued_until_the_attempts_run_out(self):
+        long_ago = timezone.now() - timedelta(seconds=settings.SOLVE_JOB_STALE_AFTER + 1)
+        retried = self.job(status=SolveJob.RUNNING, started_at=long_ago, attempts=1)
+        exhausted = self.job(status=SolveJob.RUNNING, started_at=long_ago, attempts=settings.SOLVE_JOB_MAX_ATTEMPTS)
+        recent = self.job(status=SolveJob.RUNNING, started_at=timezone.now(), attempts=1)
+        self.queue.requeue_stale()
+
+        statuses = dict(SolveJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {retried.pk: SolveJob.QUEUED, exhausted.pk: SolveJob.FAILED, recent.pk: SolveJob.RUNNING})
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.error_status, 504)
+        self.assertIsNotNone(exhausted.finished_at)
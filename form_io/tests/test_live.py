@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from ..live import origin_allowed, websocket_application
+from ..meshes import packed_entries
+from ..models import Project
+from .fixtures import use_fake_compute
+
+
+class LiveConnection:
+    """Drives websocket_application the way an ASGI server would."""
+
+    def __init__(self, path, query="definition=test_main_2.gh"):
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        scope = {"type": "websocket", "path": path, "query_string": query.encode(), "headers": []}
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(websocket_application(scope, self.incoming.get, self.outgoing.put))
+
+    async def frame(self):
+        return await asyncio.wait_for(self.outgoing.get(), 10)
+
+    async def message(self):
+        return json.loads((await self.frame())["text"])
+
+    def send(self, **message):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def close(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+        await asyncio.wait_for(self.task, 10)
+
+
+class LiveChannelTests(TransactionTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+        self.project = Project.objects.create(name="live")
+        self.path = f"/ws/projects/{self.project.pk}/live/"
+
+    async def connect(self):
+        connection = LiveConnection(self.path)
+        self.assertEqual(await connection.frame(), {"type": "websocket.accept"})
+        self.assertEqual((await connection.message())["type"], "ready")
+        return connection
+
+    @override_settings(LIVE_SAVE_INTERVAL=0)
+    async def test_inputs_are_solved_and_saved(self):
+        connection = await self.connect()
+        connection.send(type="inputs", seq=1, inputs={"podium_width": 30000})
+        result = await connection.message()
+        self.assertEqual((result["type"], result["seq"], result["base"]), ("result", 1, 0))
+        self.assertEqual(result["canonical_inputs"]["podium_width"], 30000)
+        self.assertTrue(packed_entries((await connection.frame())["bytes"]))
+        self.assertEqual(await connection.message(), {"type": "saved", "seq": 1, "updated": ["inputs"]})
+
+        connection.send(type="inputs", seq=2, base=1, patch=[{"op": "replace", "path": "/podium_width", "value": 40000}])
+        result = await connection.message()
+        self.assertEqual((result["seq"], result["base"], result["canonical_inputs"]["podium_width"]), (2, 1, 40000))
+        await connection.frame()
+        self.assertEqual((await connection.message())["seq"], 2)
+        await connection.close()
+
+        project = await Project.objects.aget(pk=self.project.pk)
+        self.assertEqual(project.inputs, {"podium_width": 40000})
+
+    @override_settings(LIVE_SAVE_INTERVAL=60)
+    async def test_unsaved_inputs_are_saved_on_close(self):
+        connection = await self.connect()
+        connection.send(type="inputs", seq=1, inputs={"podium_width": 30000})
+        for _ in range(3):  # the first save isn't held back
+            await connection.frame()
+        connection.send(type="inputs", seq=2, inputs={"podium_width": 40000})
+        self.assertEqual((await connection.message())["seq"], 2)
+        await connection.frame()
+        await connection.close()
+        self.assertTrue(connection.outgoing.empty())  # no saved message after the socket closed
+        project = await Project.objects.aget(pk=self.project.pk)
+        self.assertEqual(project.inputs, {"podium_width": 40000})
+
+    async def test_bad_messages_are_answered_with_errors(self):
+        connection = await self.connect()
+        connection.send(type="inputs", seq=1, patch=[])
+        error = await connection.message()
+        self.assertEqual((error["type"], error["seq"]), ("error", 1))
+        self.assertIn("inputs", error["errors"])
+        connection.send(type="shout", seq=2)
+        self.assertIn("shout", (await connection.message())["error"])
+        connection.send(type="ping")
+        self.assertEqual(await connection.message(), {"type": "pong"})
+        await connection.close()
+
+    async def test_unknown_projects_and_definitions_are_refused(self):
+        for path, query in [(f"/ws/projects/{self.project.pk + 1}/live/", "definition=test_main_2.gh"),
+                            (self.path, "definition=missing.gh")]:
+            with self.subTest(path=path, query=query):
+                connection = LiveConnection(path, query)
+                self.assertEqual(await connection.frame(), {"type": "websocket.close", "code": 4404})
+
+
+class OriginTests(SimpleTestCase):
+    def scope(self, origin, host=b"example.com"):
+        return {"headers": [(b"host", host)] + ([(b"origin", origin)] if origin else [])}
+
+    @override_settings(ALLOWED_HOSTS=["app.example.com"], DEBUG=False)
+    def test_only_own_hosts_may_connect(self):
+        self.assertTrue(origin_allowed(self.scope(None)))
+        self.assertTrue(origin_allowed(self.scope(b"https://example.com")))
+        self.assertTrue(origin_allowed(self.scope(b"https://app.example.com")))
+        self.assertFalse(origin_allowed(self.scope(b"https://evil.test")))
+        self.assertFalse(origin_allowed(self.scope(b"null")))
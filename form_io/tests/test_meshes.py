@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from ..fake_compute import box_mesh
+from ..meshes import QUANTIZED, SHORT_INDICES, join_entries, mesh_buffers, pack_meshes, packed_entries, quantize_positions
+
+
+class MeshPackingTests(SimpleTestCase):
+    def test_pack_and_split(self):
+        packed = pack_meshes([("podium", box_mesh(0, 0, 0, 4, 2, 1)), ("tower", box_mesh(1, 1, 1, 3, 2, 9))])
+        entries = packed_entries(packed)
+        self.assertEqual([name for name, _ in entries], ["podium", "tower"])
+        self.assertEqual(join_entries([entry for _, entry in entries]), packed)
+        flags = entries[0][1][2]
+        self.assertTrue(flags & SHORT_INDICES)
+        self.assertFalse(flags & QUANTIZED)
+
+    def test_quantize(self):
+        mesh = box_mesh(-2.5, 0, 10, 7.5, 3, 40)
+        positions, indices, _ = mesh_buffers(mesh)
+        self.assertEqual(len(positions), 24)
+        self.assertEqual(len(indices), 36)  # six quads as triangles
+
+        bounds, quantized = quantize_positions(positions)
+        self.assertEqual(bounds, [-2.5, 0, 10, 10, 3, 30])
+        for i, q in enumerate(quantized):
+            axis = i % 3
+            self.assertAlmostEqual(bounds[axis] + q / 65535 * bounds[3 + axis], positions[i], places=3)
+
+        packed = pack_meshes([("box", mesh)], quantize=True)
+        (name, entry), = packed_entries(packed)
+        self.assertTrue(entry[2] & QUANTIZED)
+        self.assertLess(len(packed), len(pack_meshes([("box", mesh)])))
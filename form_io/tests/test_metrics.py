@@ -0,0 +1,107 @@
+import json
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..metrics import Counter, Histogram, Registry, _profile, metrics, server_timing, span
+from .fixtures import use_fake_compute
+
+
+def sample(text, name, **labels):
+    """The value of one sample in Prometheus text, 0 if it isn't there."""
+    prefix = name + ("{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else "")
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0
+
+
+class RenderTests(SimpleTestCase):
+    def test_counter(self):
+        counter = Counter("c_total", "Help.", ["path"])
+        counter.inc('/a"b')
+        counter.inc('/a"b', amount=2)
+        self.assertEqual(counter.render(), ["# HELP c_total Help.", "# TYPE c_total counter", 'c_total{path="/a\\"b"} 3'])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("h_seconds", "Help.", ["stage"], buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, "x")
+        lines = histogram.render()[2:]
+        self.assertEqual(lines[:3], [
+            'h_seconds_bucket{stage="x",le="0.1"} 1',
+            'h_seconds_bucket{stage="x",le="1"} 2',
+            'h_seconds_bucket{stage="x",le="+Inf"} 3',
+        ])
+        self.assertEqual(lines[4], 'h_seconds_count{stage="x"} 3')
+        self.assertAlmostEqual(float(lines[3].rsplit(" ", 1)[1]), 5.55)
+
+    def test_collectors_are_read_at_scrape_time(self):
+        registry = Registry()
+        value = [1]
+        registry.collector(lambda: [("g", "gauge", "Help.", [({"node": "a"}, value[0])])])
+        value[0] = 2
+        self.assertIn('g{node="a"} 2', registry.render())
+
+
+class SpanTests(TestCase):
+    def test_span_records_the_stage(self):
+        before = sample(metrics.render(), "form_io_stage_seconds_count", stage="test_stage")
+        token = _profile.set([])
+        try:
+            with span("test_stage"):
+                pass
+            with self.assertRaises(ValueError), span("test_stage"):
+                raise ValueError
+            profile = _profile.get()
+        finally:
+            _profile.reset(token)
+        self.assertEqual([stage for stage, _ in profile], ["test_stage", "test_stage"])
+        self.assertEqual(sample(metrics.render(), "form_io_stage_seconds_count", stage="test_stage"), before + 2)
+
+    def test_server_timing_sums_repeated_stages(self):
+        header = server_timing([("a", 0.001), ("b", 0.002), ("a", 0.003)], 0.01)
+        self.assertEqual(header, 'a;dur=4.00;desc="2x", b;dur=2.00, total;dur=10.00')
+
+
+class MetricsEndpointTests(TestCase):
+    def solve(self, **headers):
+        return self.client.post("/api/rhino/solve/", {
+            "grasshopper_file_name": "test_main_2.gh", "input_data": json.dumps({"podium_width": 30000}),
+        }, headers=headers)
+
+    def test_solve_stages_and_requests_are_counted(self):
+        use_fake_compute(self)
+        before = self.client.get("/metrics").content.decode()
+        self.assertEqual(self.solve().status_code, 200)
+        after = self.client.get("/metrics")
+        self.assertTrue(after["Content-Type"].startswith("text/plain; version=0.0.4"))
+        after = after.content.decode()
+
+        for stage in ["payload_build", "solve_cache_lookup", "compute_round_trip", "serialize"]:
+            with self.subTest(stage=stage):
+                self.assertEqual(sample(after, "form_io_stage_seconds_count", stage=stage),
+                                 sample(before, "form_io_stage_seconds_count", stage=stage) + 1)
+        labels = {"view": "solve_grasshopper", "method": "POST", "status": "200"}
+        self.assertEqual(sample(after, "form_io_requests_total", **labels),
+                         sample(before, "form_io_requests_total", **labels) + 1)
+        labels = {"path": "/grasshopper", "outcome": "200"}
+        self.assertEqual(sample(after, "form_io_compute_requests_total", **labels),
+                         sample(before, "form_io_compute_requests_total", **labels) + 1)
+
+    @override_settings(METRICS_PROFILING=True)
+    def test_profiled_requests_get_server_timing(self):
+        use_fake_compute(self)
+        timing = self.solve(**{"X-Profile": "1"})["Server-Timing"]
+        self.assertIn("compute_round_trip;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        self.assertNotIn("Server-Timing", self.solve())
+
+    @override_settings(METRICS_PROFILING=False)
+    def test_profiling_can_be_turned_off(self):
+        self.assertNotIn("Server-Timing", self.client.get("/metrics", headers={"X-Profile": "1"}))
+
+    @override_settings(METRICS_PROFILING=True)
+    async def test_async_requests_are_profiled_too(self):
+        response = await self.async_client.get("/api/rhino/cache/", headers={"X-Profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("total;dur=", response["Server-Timing"])
@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase
+
+from ..parameters import ParameterError, canonical_inputs, clean_inputs
+
+
+class ParameterTests(SimpleTestCase):
+    def test_clean_inputs(self):
+        cleaned = clean_inputs({
+            "podium_lenght": "12,500",
+            "building_type": "Two Towers",
+            "tower_num_floors": 12.6,
+            "floor_height": 99999,
+            "envelope_vertices": "0,0,0;1,1,0",
+        })
+        self.assertEqual(cleaned, {
+            "podium_length": 12500,
+            "building_type": 1,
+            "tower_num_floors": 13,
+            "floor_height": 5000,
+            "envelope_vertices": "0,0,0;1,1,0",
+        })
+
+    def test_values_are_clamped_to_the_design_space(self):
+        self.assertEqual(clean_inputs({"podium_width": -1, "podium_no_of_floors": 0.2, "tower_num_floors": "99"}),
+                         {"podium_width": 10000, "podium_no_of_floors": 1, "tower_num_floors": 50})
+
+    def test_exact_name_wins_over_alias(self):
+        self.assertEqual(clean_inputs({"podium_lenght": 20000, "podium_length": 30000}), {"podium_length": 30000})
+
+    def test_invalid_values(self):
+        with self.assertRaises(ParameterError) as raised:
+            clean_inputs({"podium_width": "wide", "floor_height": float("nan"), "building_type": True})
+        self.assertEqual(set(raised.exception.errors), {"podium_width", "floor_height", "building_type"})
+        with self.assertRaises(ParameterError):
+            clean_inputs(["not", "an", "object"])
+
+    def test_canonical_inputs(self):
+        canonical = canonical_inputs({"podium_width": 30049, "floor_height": 3004.9,
+                                      "envelope_vertices": "1.004,-0.001,0;2.555,3,0;"})
+        self.assertEqual(list(canonical), sorted(canonical))
+        self.assertEqual(canonical["podium_width"], 30000)
+        self.assertEqual(canonical["floor_height"], 3000)
+        self.assertEqual(canonical["envelope_vertices"], "1.00,0.00,0.00;2.56,3.00,0.00")
+        self.assertEqual(canonical_inputs({"floor_height": 3001, "podium_width": 29990}),
+                         canonical_inputs({"podium_width": 30010, "floor_height": 2999}))
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Project
+from .. import project_store
+from ..project_store import PatchError, WriteBehindBuffer, apply_json_patch, save_project_fields
+
+
+class JsonPatchTests(SimpleTestCase):
+    def test_operations(self):
+        document = {"a": 1, "list": [1, 2], "nested": {"x/y": 0}}
+        patched = apply_json_patch(document, [
+            {"op": "replace", "path": "/a", "value": 2},
+            {"op": "add", "path": "/list/-", "value": 3},
+            {"op": "add", "path": "/list/0", "value": 0},
+            {"op": "remove", "path": "/nested/x~1y"},
+            {"op": "test", "path": "/a", "value": 2},
+        ])
+        self.assertEqual(patched, {"a": 2, "list": [0, 1, 2, 3], "nested": {}})
+        self.assertEqual(document["a"], 1)  # the original is left alone
+
+    def test_errors(self):
+        for operations in [
+            {"op": "add"},
+            [{"op": "remove", "path": "/missing"}],
+            [{"op": "replace", "path": "/list/5", "value": 0}],
+            [{"op": "test", "path": "/a", "value": 2}],
+            [{"op": "move", "path": "/a"}],
+            [{"op": "add", "path": "a", "value": 0}],
+        ]:
+            with self.subTest(operations=operations):
+                with self.assertRaises(PatchError):
+                    apply_json_patch({"a": 1, "list": []}, operations)
+
+
+class SaveProjectFieldsTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name="Store", inputs={"podium_width": 30000, "floor_height": 3000})
+
+    def test_writes_only_changed_fields(self):
+        inputs = {"podium_width": 30000, "floor_height": 3000}
+        self.assertEqual(save_project_fields(self.project.pk, {"inputs": inputs}), [])
+        self.assertEqual(save_project_fields(self.project.pk, {"inputs": {**inputs, "floor_height": 3500}}), ["inputs"])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs["floor_height"], 3500)
+
+    def test_inputs_patch(self):
+        changed = save_project_fields(self.project.pk, {}, [{"op": "replace", "path": "/podium_width", "value": 40000}])
+        self.assertEqual(changed, ["inputs"])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs, {"podium_width": 40000, "floor_height": 3000})
+
+    def test_failed_patch_writes_nothing(self):
+        with self.assertRaises(PatchError):
+            save_project_fields(self.project.pk, {"site_bounds": {"type": "Point", "coordinates": [1, 2]}},
+                                [{"op": "remove", "path": "/missing"}])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.site_bounds, {})
+
+    def test_missing_project(self):
+        with self.assertRaises(Project.DoesNotExist):
+            save_project_fields(self.project.pk + 1, {"inputs": {}})
+
+    def test_write_behind_buffer(self):
+        buffer = WriteBehindBuffer(interval=3600)
+        buffer.put(self.project.pk, {}, [{"op": "replace", "path": "/podium_width", "value": 40000}])
+        buffer.put(self.project.pk, {}, [{"op": "replace", "path": "/floor_height", "value": 4000}])
+        with self.assertRaises(PatchError):
+            buffer.put(self.project.pk, {}, [{"op": "remove", "path": "/missing"}])
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs["podium_width"], 30000)  # not flushed yet
+
+        buffer.flush(self.project.pk)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs, {"podium_width": 40000, "floor_height": 4000})
+
+    def test_buffered_patches_apply_to_buffered_inputs(self):
+        buffer = WriteBehindBuffer(interval=3600)
+        buffer.put(self.project.pk, {"inputs": {"podium_width": 50000}})
+        buffer.put(self.project.pk, {"site_bounds": {"west": 1}}, [{"op": "add", "path": "/floor_height", "value": 3500}])
+        with self.assertRaises(PatchError):
+            buffer.put(self.project.pk, {"site_bounds": {}}, [{"op": "remove", "path": "/missing"}])
+
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+        self.assertEqual(sum(query["sql"].startswith("UPDATE") for query in queries), 2)  # write lock, then one save
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs, {"podium_width": 50000, "floor_height": 3500})
+        self.assertEqual(self.project.site_bounds, {"west": 1})
+
+        buffer.flush()  # nothing left
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.inputs, {"podium_width": 50000, "floor_height": 3500})
+
+    def test_buffer_starts_one_flush_thread(self):
+        buffer = WriteBehindBuffer(interval=3600)
+        with mock.patch.object(project_store.atexit, "register") as register:
+            buffer.put(self.project.pk, {"inputs": {}})
+            buffer.put(self.project.pk, {"inputs": {"a": 1}})
+        register.assert_called_once_with(buffer.flush)
+        self.assertTrue(buffer._thread.daemon)
@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..models import Project
+
+# Run in a fresh interpreter, since the settings module is read once per process
+CHECK_DATABASE = """
+import json
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+
+database = settings.DATABASES["default"]
+report = {"engine": database["ENGINE"], "conn_max_age": database["CONN_MAX_AGE"], "debug": settings.DEBUG}
+if database["ENGINE"].endswith("sqlite3"):  # PostgreSQL is only configured, psycopg may not be installed
+    django.setup()
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        report["pragmas"] = [cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in ("journal_mode", "synchronous")]
+    call_command("benchmark_project_writes", threads=4, writes=10, projects=2)
+print(json.dumps(report))
+"""
+
+
+class ProductionSettingsTests(SimpleTestCase):
+    def run_settings(self, **env):
+        unset = ("POSTGRES_DB", "DB_CONN_MAX_AGE", "DJANGO_DEBUG")
+        env = {**{k: v for k, v in os.environ.items() if k not in unset},
+               "DJANGO_SETTINGS_MODULE": "blogProject.settings_production", **env}
+        return subprocess.run([sys.executable, "-c", CHECK_DATABASE], cwd=settings.BASE_DIR, env=env,
+                              capture_output=True, text=True, timeout=120)
+
+    def test_sqlite_is_tuned_for_concurrent_writes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result = self.run_settings(DJANGO_SECRET_KEY="test", SQLITE_PATH=os.path.join(directory, "db.sqlite3"))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        *output, report = result.stdout.splitlines()
+        self.assertEqual(json.loads(report), {
+            "engine": "django.db.backends.sqlite3", "conn_max_age": 600, "debug": False,
+            "pragmas": ["wal", 1],  # synchronous=NORMAL
+        })
+        self.assertIn("succeeded:  40/40 (0 failed)", output)
+
+    def test_postgres_from_the_environment(self):
+        result = self.run_settings(DJANGO_SECRET_KEY="test", POSTGRES_DB="form_io", DB_CONN_MAX_AGE="60")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout), {
+            "engine": "django.db.backends.postgresql", "conn_max_age": 60, "debug": False,
+        })
+
+    def test_secret_key_is_required(self):
+        result = self.run_settings(DJANGO_SECRET_KEY="")
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("DJANGO_SECRET_KEY", result.stderr)
+
+
+class ProjectIndexTests(SimpleTestCase):
+    def test_project_list_columns_are_indexed(self):
+        indexed = [tuple(index.fields) for index in Project._meta.indexes]
+        self.assertTrue(Project._meta.get_field("type").db_index or ("type",) in indexed)
+        self.assertTrue(any(fields[0].lstrip("-") == "created_at" for fields in indexed))
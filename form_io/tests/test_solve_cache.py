@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..solve_cache import SolveCache, solve_key
+from ..solver import solve
+from .fixtures import use_fake_compute
+
+
+class SolveKeyTests(SimpleTestCase):
+    def test_parameter_order_does_not_matter(self):
+        a = {"ParamName": "a", "InnerTree": {"{0;0}": [{"type": "System.Double", "data": 1}]}}
+        b = {"ParamName": "b", "InnerTree": {"{0;0}": [{"type": "System.Double", "data": 2}]}}
+        self.assertEqual(solve_key("gh", [a, b]), solve_key("gh", [b, a]))
+        self.assertNotEqual(solve_key("gh", [a, b]), solve_key("other", [a, b]))
+
+
+class SolveCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SolveCache(max_entries=2)
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        cache.get("a")
+        cache.set("c", b"3")
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (b"1", None, b"3"))
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_byte_budget(self):
+        cache = SolveCache(max_bytes=10)
+        cache.set("a", b"x" * 6)
+        cache.set("b", b"x" * 6)
+        self.assertIsNone(cache.get("a"))
+        cache.set("big", b"x" * 11)  # larger than the whole budget, never kept
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.get("b"), b"x" * 6)
+        self.assertEqual(cache.stats()["bytes"], 6)
+
+    def test_stats(self):
+        cache = SolveCache()
+        cache.set("a", b"123")
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        self.assertEqual((stats["bytes_served"], stats["bytes_stored"]), (3, 3))
+
+
+class DiskTierTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_disk_tier_outlives_the_memory_tier(self):
+        cache = SolveCache(disk_dir=self.directory, disk_max_bytes=1000)
+        cache.set("ab12", b"result")
+        cache.clear()
+        self.assertEqual(cache.get("ab12"), b"result")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        cache.get("ab12")
+        self.assertEqual(cache.stats()["hits"], 1)  # promoted back into memory
+
+        # A new process finds it too
+        self.assertEqual(SolveCache(disk_dir=self.directory, disk_max_bytes=1000).get("ab12"), b"result")
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = SolveCache(disk_dir=self.directory, disk_max_bytes=100)
+        for age, key in enumerate(["aa01", "aa02", "aa03"]):
+            cache.set(key, b"x" * 40)
+            # Oldest first, with mtimes far enough apart to sort reliably
+            path = cache._disk_path(key)
+            os.utime(path, (1000 + age, 1000 + age))
+        cache.clear()
+        self.assertIsNone(cache.get("aa01"))
+        self.assertEqual(cache.get("aa02"), b"x" * 40)
+        self.assertEqual(cache.get("aa03"), b"x" * 40)
+        self.assertLessEqual(cache.stats()["disk_bytes"], 90)
+
+    def test_bodies_over_the_disk_budget_stay_in_memory(self):
+        cache = SolveCache(disk_dir=self.directory, disk_max_bytes=10)
+        cache.set("ab12", b"x" * 11)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(cache.get("ab12"), b"x" * 11)
+
+
+class CachedSolveTests(SimpleTestCase):
+    def test_repeated_solve_is_served_from_the_cache(self):
+        fake = use_fake_compute(self)
+        definition = fake.registry.get("test_main_2.gh")
+        inputs = {"podium_width": 30000, "floor_height": 3000}
+        first = solve(definition, inputs)
+        self.assertEqual(solve(definition, dict(reversed(inputs.items()))), first)
+        self.assertEqual(fake.calls["/grasshopper"], 1)
+        self.assertEqual(fake.cache.stats()["hits"], 1)
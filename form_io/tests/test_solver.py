@@ -0,0 +1,121 @@
+import asyncio
+import contextlib
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import solver
+from ..solver import SolveSlots, Superseded
+
+
+@contextlib.contextmanager
+def slot_waits(*seqs):
+    """
+    Yields an Event per seq, set once the request run by requester() for
+    that seq has taken its place in the slot and is waiting for it.
+    """
+    waiting = {seq: threading.Event() for seq in seqs}
+    span = solver.span
+
+    @contextlib.contextmanager
+    def watched(stage):
+        event = waiting.get(getattr(threading.current_thread(), "seq", None))
+        if stage == "slot_wait" and event is not None:
+            event.set()
+        with span(stage):
+            yield
+
+    with mock.patch.object(solver, "span", watched):
+        yield waiting
+
+
+def requester(slots, key, seq, outcomes):
+    """A thread that runs a solve for ``seq`` and records its result or Superseded."""
+    def request():
+        try:
+            outcomes[seq] = slots.run(key, seq, lambda: seq)
+        except Superseded as e:
+            outcomes[seq] = e
+    thread = threading.Thread(target=request)
+    thread.seq = seq
+    return thread
+
+
+class SolveSlotsTests(SimpleTestCase):
+    def test_older_request_is_superseded(self):
+        slots = SolveSlots()
+        self.assertEqual(slots.run("client", 2, lambda: "two"), "two")
+        with self.assertRaises(Superseded) as raised:
+            slots.run("client", 1, lambda: "one")
+        self.assertEqual((raised.exception.seq, raised.exception.latest_seq), (1, 2))
+        self.assertEqual(slots.run("other", 1, lambda: "one"), "one")
+
+    def test_queued_request_gives_up_for_a_newer_one(self):
+        slots = SolveSlots()
+        release = slots.acquire("client", 1)
+        outcomes = {}
+        with slot_waits(2, 3) as waiting:
+            queued = requester(slots, "client", 2, outcomes)
+            queued.start()
+            self.assertTrue(waiting[2].wait(5))
+            newest = requester(slots, "client", 3, outcomes)
+            newest.start()
+            queued.join(5)
+            self.assertIsInstance(outcomes[2], Superseded)
+            self.assertEqual(outcomes[2].latest_seq, 3)
+            self.assertTrue(waiting[3].wait(5))
+            self.assertNotIn(3, outcomes)  # still waiting for the running solve
+
+            release()
+            newest.join(5)
+        self.assertEqual(outcomes[3], 3)
+
+    def test_slot_is_free_after_a_failed_solve(self):
+        slots = SolveSlots()
+
+        def fail():
+            raise RuntimeError("compute down")
+
+        with self.assertRaises(RuntimeError):
+            slots.run("client", 1, fail)
+        self.assertEqual(slots.run("client", 2, lambda: "two"), "two")
+
+    def test_stream_holds_the_slot_until_read_or_closed(self):
+        for finish in (list, lambda stream: stream.close()):
+            with self.subTest(finish=finish):
+                slots = SolveSlots()
+                stream = slots.run_stream("client", 1, lambda: iter([b"a", b"b"]))
+                outcomes = {}
+                with slot_waits(2) as waiting:
+                    waiter = requester(slots, "client", 2, outcomes)
+                    waiter.start()
+                    self.assertTrue(waiting[2].wait(5))
+                    self.assertNotIn(2, outcomes)
+                    finish(stream)
+                    waiter.join(5)
+                self.assertEqual(outcomes[2], 2)
+
+    def test_async_queued_request_gives_up_for_a_newer_one(self):
+        slots = SolveSlots()
+
+        async def main():
+            running = asyncio.Event()
+            finish = asyncio.Event()
+
+            async def solve(seq):
+                running.set()
+                await finish.wait()
+                return seq
+
+            first = asyncio.create_task(slots.arun("client", 1, lambda: solve(1)))
+            await running.wait()
+            queued = asyncio.create_task(slots.arun("client", 2, lambda: solve(2)))
+            await asyncio.sleep(0)
+            newest = asyncio.create_task(slots.arun("client", 3, lambda: solve(3)))
+            with self.assertRaises(Superseded):
+                await queued
+            finish.set()
+            return await first, await newest
+
+        self.assertEqual(asyncio.run(main()), (1, 3))
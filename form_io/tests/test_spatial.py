@@ -0,0 +1,98 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from ..geometry import distance_to_bbox, radius_bbox, site_bbox
+from ..models import Project
+from ..spatial import RTREE_TABLE, projects_in_bbox, projects_near, rtree_available
+
+
+def point(lng, lat):
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def square(west, south, east, north):
+    return {"type": "Polygon", "coordinates": [[[west, south], [east, south], [east, north], [west, north]]]}
+
+
+def rtree_row(project_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT west, south, east, north FROM {RTREE_TABLE} WHERE id = %s", [project_id])
+        return cursor.fetchone()
+
+
+class SiteBboxTests(SimpleTestCase):
+    def test_bounds_and_envelope_together(self):
+        envelope = {"points": [{"x": 0.5, "y": 0.5}, {"x": "bad"}]}  # (0, 0) in lng/lat
+        self.assertEqual(site_bbox(square(1, 2, 3, 4), envelope), (0.0, 0.0, 3, 4))
+        self.assertIsNone(site_bbox({}, {}))
+
+    def test_radius_bbox_contains_the_circle(self):
+        west, south, east, north = radius_bbox(10, 50, 1000)
+        self.assertAlmostEqual(distance_to_bbox(10, 50, (east, 50, east, 50)), 1000, delta=1)
+        self.assertAlmostEqual(distance_to_bbox(10, 50, (10, north, 10, north)), 1000, delta=1)
+        self.assertEqual(distance_to_bbox(10, 50, (west, south, east, north)), 0)
+
+
+class ProjectsInBboxTests(TestCase):
+    def setUp(self):
+        self.inside = Project.objects.create(name="inside", site_bounds=square(1, 1, 2, 2))
+        self.overlapping = Project.objects.create(name="overlapping", site_bounds=square(2.5, 2.5, 4, 4))
+        self.outside = Project.objects.create(name="outside", site_bounds=square(10, 10, 11, 11))
+        self.no_site = Project.objects.create(name="no site")
+
+    def test_boxes_that_intersect(self):
+        self.assertEqual(projects_in_bbox(0, 0, 3, 3), [self.inside, self.overlapping])
+        self.assertEqual(projects_in_bbox(2.1, 2.1, 2.4, 2.4), [])
+        self.assertEqual(projects_in_bbox(-180, -90, 180, 90, limit=2), [self.inside, self.overlapping])
+
+    def test_projects_near_are_nearest_first(self):
+        matches = projects_near(2.6, 2.6, 100_000)
+        self.assertEqual([project for project, _ in matches], [self.overlapping, self.inside])
+        self.assertEqual(matches[0][1], 0)
+        self.assertEqual(projects_near(2.6, 2.6, 10), [(self.overlapping, 0)])
+
+    def test_area_endpoint(self):
+        response = self.client.get("/api/projects/area/", {"bbox": "0,0,3,3"})
+        features = response.json()["features"]
+        self.assertEqual([feature["id"] for feature in features], [self.inside.pk, self.overlapping.pk])
+        self.assertEqual(features[0]["geometry"]["coordinates"][0][0], [1, 1])
+
+        response = self.client.get("/api/projects/area/", {"lng": 1.5, "lat": 1.5, "radius": 1000})
+        self.assertEqual([feature["properties"]["distance"] for feature in response.json()["features"]], [0])
+        for query in [{}, {"bbox": "1,2,3"}, {"lng": "x", "lat": 0, "radius": 1}]:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get("/api/projects/area/", query).status_code, 400)
+
+
+class RTreeSyncTests(TestCase):
+    def setUp(self):
+        if not rtree_available():
+            self.skipTest("The R*Tree index is only kept on SQLite")
+
+    def test_index_follows_the_site(self):
+        project = Project.objects.create(name="tracked", site_bounds=square(1, 1, 2, 2))
+        self.assertEqual(rtree_row(project.pk), (1, 1, 2, 2))
+
+        project.site_bounds = point(5, 6)
+        project.save(update_fields=["site_bounds"])
+        self.assertEqual(rtree_row(project.pk), (5, 6, 5, 6))
+        self.assertEqual(projects_in_bbox(4, 5, 6, 7), [project])
+
+        project.site_bounds = {}
+        project.save(update_fields=["site_bounds"])
+        self.assertIsNone(rtree_row(project.pk))
+        self.assertEqual(projects_in_bbox(-180, -90, 180, 90), [])
+
+    def test_other_saves_leave_the_index_alone(self):
+        project = Project.objects.create(name="tracked", site_bounds=point(5, 6))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {RTREE_TABLE} WHERE id = %s", [project.pk])
+        project.inputs = {"podium_width": 30000}
+        project.save(update_fields=["inputs"])
+        self.assertIsNone(rtree_row(project.pk))
+
+    def test_deleted_projects_leave_the_index(self):
+        project = Project.objects.create(name="tracked", site_bounds=point(5, 6))
+        project_id = project.pk
+        project.delete()
+        self.assertIsNone(rtree_row(project_id))
@@ -0,0 +1,30 @@
+import json
+
+from django.test import SimpleTestCase
+
+from ..streaming import ArrayScanner
+from .fixtures import compute_response
+
+
+class ArrayScannerTests(SimpleTestCase):
+    def scan(self, data, chunk_size):
+        scanner = ArrayScanner()
+        items = []
+        for start in range(0, len(data), chunk_size):
+            items.extend(scanner.feed(data[start:start + chunk_size]))
+        return items
+
+    def test_items_are_the_same_for_any_chunking(self):
+        data = compute_response()
+        document = json.loads(data)
+        expected = [("values", value) for value in document["values"]] + \
+                   [("errors", error) for error in document["errors"]]
+        for chunk_size in [1, 2, 3, 5, 7, 16, 64, len(data)]:
+            with self.subTest(chunk_size=chunk_size):
+                items = self.scan(data, chunk_size)
+                self.assertEqual([(key, json.loads(raw)) for key, raw in items], expected)
+
+    def test_items_are_the_exact_bytes(self):
+        data = compute_response()
+        for key, raw in self.scan(data, 3):
+            self.assertIn(raw, data)
@@ -0,0 +1,98 @@
+import io
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from .. import project_store, thumbnails
+from ..fake_compute import box_mesh
+from ..models import Project
+from ..project_store import save_project_fields
+from ..thumbnails import ThumbnailScheduler, render_thumbnail, update_thumbnail
+from .fixtures import use_fake_compute
+
+
+def temporary_media_root(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    override = override_settings(MEDIA_ROOT=directory.name)
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class RenderThumbnailTests(SimpleTestCase):
+    def test_draws_the_mesh_on_a_transparent_background(self):
+        image = Image.open(io.BytesIO(render_thumbnail([("meshout", box_mesh(0, 0, 0, 10, 10, 30))], size=(64, 48))))
+        self.assertEqual((image.format, image.size), ("PNG", (64, 48)))
+        alpha = image.getchannel("A")
+        self.assertEqual(alpha.getpixel((0, 0)), 0)
+        self.assertEqual(alpha.getpixel((32, 24)), 255)
+
+    def test_nothing_to_draw(self):
+        image = Image.open(io.BytesIO(render_thumbnail([], size=(16, 16))))
+        self.assertEqual(image.getchannel("A").getextrema(), (0, 0))
+
+
+class UpdateThumbnailTests(TestCase):
+    def setUp(self):
+        temporary_media_root(self)
+        self.fake = use_fake_compute(self)
+        self.project = Project.objects.create(name="thumb", inputs={"podium_width": 30000})
+
+    def test_thumbnail_is_named_after_its_content(self):
+        name = update_thumbnail(self.project.pk)
+        self.assertRegex(name, rf"^project_thumbnails/{self.project.pk}-[0-9a-f]{{12}}\.png$")
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.thumbnail.name, name)
+        self.assertEqual(update_thumbnail(self.project.pk), name)
+
+        Project.objects.filter(pk=self.project.pk).update(inputs={"podium_width": 60000})
+        changed = update_thumbnail(self.project.pk)
+        self.assertNotEqual(changed, name)
+        storage = self.project.thumbnail.storage
+        self.assertFalse(storage.exists(name))  # the old file is removed
+        self.assertTrue(storage.exists(changed))
+
+    def test_rendering_reuses_the_editors_solve(self):
+        update_thumbnail(self.project.pk)
+        update_thumbnail(self.project.pk)
+        self.assertEqual(self.fake.calls["/grasshopper"], 1)
+
+    def test_served_with_long_cache_headers(self):
+        name = update_thumbnail(self.project.pk).rsplit("/", 1)[1]
+        response = self.client.get(f"/projects/thumbnails/{name}")
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+        for missing in [f"{self.project.pk}-000000000000.png", "../db.sqlite3"]:
+            with self.subTest(name=missing):
+                self.assertEqual(self.client.get(f"/projects/thumbnails/{missing}").status_code, 404)
+
+
+class ThumbnailSchedulerTests(TestCase):
+    def test_saves_in_a_burst_render_once(self):
+        rendered = []
+        done = threading.Event()
+
+        def update(project_id):
+            rendered.append(project_id)
+            done.set()
+
+        scheduler = ThumbnailScheduler(delay=0.05)
+        with mock.patch.object(thumbnails, "update_thumbnail", update):
+            for _ in range(3):
+                scheduler.schedule(7)
+            self.assertTrue(done.wait(5))
+        self.assertEqual(rendered, [7])
+        self.assertEqual(scheduler._timers, {})
+
+    def test_input_and_envelope_saves_schedule_a_render(self):
+        project = Project.objects.create(name="thumb")
+        scheduler = mock.Mock()
+        with mock.patch.object(project_store, "thumbnail_scheduler", scheduler):
+            for fields in [{"site_bounds": {"type": "Point", "coordinates": [1, 2]}}, {"inputs": {"podium_width": 1}}]:
+                with self.captureOnCommitCallbacks(execute=True):
+                    save_project_fields(project.pk, fields)
+        scheduler.schedule.assert_called_once_with(project.pk)
@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timezone
+
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from ..models import Project
+from ..parameters import ParameterError
+from ..views import decode_project_cursor, get_project_page, read_delta_request, read_solve_slot
+from .fixtures import use_fake_compute
+
+
+class ProjectPageTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            Project.objects.create(name=f"Project {i}")
+        # Three projects created in the same instant, ordered by id
+        same = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        Project.objects.filter(name__in=["Project 1", "Project 2", "Project 3"]).update(created_at=same)
+
+    def test_pages_cover_every_project_once(self):
+        expected = list(Project.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_project_page(cursor, page_size=2)
+            self.assertLessEqual(len(page), 2)
+            seen.extend(project.id for project in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_last_page_has_no_cursor(self):
+        page, cursor = get_project_page(page_size=5)
+        self.assertEqual(len(page), 5)
+        self.assertIsNone(cursor)
+
+    def test_cursor_round_trip_and_errors(self):
+        _, cursor = get_project_page(page_size=1)
+        created_at, project_id = decode_project_cursor(cursor)
+        self.assertEqual(Project.objects.get(pk=project_id).created_at, created_at)
+        for bad in ["", "bm90IGEgY3Vyc29y", "!!!"]:
+            with self.subTest(cursor=bad):
+                with self.assertRaises(ValueError):
+                    decode_project_cursor(bad)
+
+
+class SolveSlotRequestTests(SimpleTestCase):
+    def post(self, **data):
+        return RequestFactory().post("/api/rhino/solve/", data)
+
+    def test_read_solve_slot(self):
+        self.assertIsNone(read_solve_slot(self.post(), "a.gh"))
+        self.assertIsNone(read_solve_slot(self.post(seq="3"), "a.gh"))
+        self.assertEqual(read_solve_slot(self.post(seq="3", client_id="c"), "a.gh"), (("c", "a.gh"), 3))
+        self.assertEqual(read_solve_slot(self.post(seq="3", client_id="c", slot="7"), "a.gh"), (("c", "7"), 3))
+        with self.assertRaises(ParameterError):
+            read_solve_slot(self.post(seq="three", client_id="c"), "a.gh")
+
+    def test_read_delta_request(self):
+        self.assertIsNone(read_delta_request(self.post(seq="3", client_id="c"), "a.gh"))
+        self.assertEqual(read_delta_request(self.post(seq="3", client_id="c", delta_base="2"), "a.gh"),
+                         (("c", "a.gh"), 3, 2))
+        for data in [{"delta_base": "2"}, {"delta_base": "x", "seq": "3", "client_id": "c"}]:
+            with self.subTest(data=data):
+                with self.assertRaises(ParameterError):
+                    read_delta_request(self.post(**data), "a.gh")
+
+
+class SolveErrorResponseTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = use_fake_compute(self)
+
+    def solve(self, path, **data):
+        return self.client.post(path, {"grasshopper_file_name": "test_main_2.gh", "input_data": "{}", **data})
+
+    def test_superseded_solves(self):
+        for path in ["/api/rhino/solve/", "/api/rhino/solve/mesh/", "/api/rhino/solve/stream/"]:
+            with self.subTest(path=path):
+                response = self.solve(path, client_id=path, seq="2")
+                self.assertEqual(response.status_code, 200)
+                response.close()  # a streamed solve holds its slot until then
+                response = self.solve(path, client_id=path, seq="1")
+                self.assertEqual(response.json(), {"success": False, "superseded": True, "seq": 1, "latest_seq": 2})
+
+    def test_invalid_inputs_are_400(self):
+        for data in [{"seq": "x", "client_id": "c"}, {"input_data": json.dumps({"floor_height": "tall"})}]:
+            with self.subTest(data=data):
+                response = self.solve("/api/rhino/solve/mesh/", **data)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()["success"])
+
+    def test_compute_errors_keep_their_status(self):
+        self.fake.stop()
+        with self.assertLogs("form_io", "WARNING"):
+            response = self.solve("/api/rhino/solve/")
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["success"])
+
+
+class CanonicalInputsTests(SimpleTestCase):
+    """Every solve endpoint reports the clamped and snapped values it solved with."""
+
+    inputs = {"podium_length": 250000, "podium_no_of_floors": 0, "floor_height": 3004}
+    expected = {"floor_height": 3000, "podium_length": 200000, "podium_no_of_floors": 1}
+
+    def setUp(self):
+        use_fake_compute(self)
+
+    def solve(self, path):
+        return self.client.post(path, {"grasshopper_file_name": "test_main_2.gh", "input_data": json.dumps(self.inputs)})
+
+    def test_solve(self):
+        self.assertEqual(self.solve("/api/rhino/solve/").json()["canonical_inputs"], self.expected)
+
+    def test_mesh(self):
+        self.assertEqual(json.loads(self.solve("/api/rhino/solve/mesh/")["X-Canonical-Inputs"]), self.expected)
+
+    def test_stream(self):
+        first_line = b"".join(self.solve("/api/rhino/solve/stream/").streaming_content).split(b"\n")[0]
+        self.assertEqual(json.loads(first_line), {"canonical_inputs": self.expected})
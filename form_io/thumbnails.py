@@ -0,0 +1,176 @@
+"""
+Project thumbnails, rendered on the server from the project's latest solve.
+
+After a project's inputs or envelope are saved, ``thumbnail_scheduler``
+waits PROJECT_THUMBNAIL_DELAY seconds (restarting the wait on every further
+save), solves the project's current inputs, which is normally a cache hit
+because the editor just solved them, and draws the output meshes as a small
+axonometric PNG with Pillow. Files are named after their content, so they
+can be served with long cache lifetimes (see views.project_thumbnail).
+"""
+import hashlib
+import io
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageDraw
+
+from .definitions import registry
+from .meshes import decode_meshes, mesh_buffers
+from .models import Project
+from .parameters import canonical_inputs, with_project_envelope
+from .solver import solve
+
+logger = logging.getLogger(__name__)
+
+# Looking down from the south-east, 35 degrees above the horizon
+VIEW_DIRECTION = (0.579, -0.579, 0.574)
+LIGHT_DIRECTION = (0.3, -0.5, 0.81)
+DEFAULT_COLOR = (222, 222, 222)
+SUPERSAMPLE = 2  # drawn larger and scaled down, for anti-aliased edges
+
+
+def _normalize(v):
+    length = math.sqrt(sum(c * c for c in v))
+    return tuple(c / length for c in v)
+
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def render_thumbnail(meshes, size=(320, 240), margin=0.08):
+    """
+    Draws ``(name, mesh)`` pairs as a flat-shaded axonometric view on a
+    transparent background and returns PNG bytes.
+    """
+    view = _normalize(VIEW_DIRECTION)
+    light = _normalize(LIGHT_DIRECTION)
+    right = _normalize(_cross((0.0, 0.0, 1.0), view))
+    up = _cross(view, right)
+
+    triangles = []  # (depth, screen points, color)
+    for _, mesh in meshes:
+        positions, indices, colors = mesh_buffers(mesh)
+        points = [tuple(positions[i:i + 3]) for i in range(0, len(positions), 3)]
+        projected = [(_dot(p, right), _dot(p, up), _dot(p, view)) for p in points]
+
+        faces = []
+        volume = 0.0
+        for t in range(0, len(indices), 3):
+            a, b, c = indices[t], indices[t + 1], indices[t + 2]
+            pa, pb, pc = points[a], points[b], points[c]
+            normal = _cross(tuple(pb[k] - pa[k] for k in range(3)), tuple(pc[k] - pa[k] for k in range(3)))
+            if any(normal):
+                faces.append((a, b, c, normal, _dot(normal, view)))
+                volume += _dot(pa, _cross(pb, pc))
+        # Only faces turned towards the viewer are drawn. A closed mesh wound
+        # inwards has a negative signed volume; flip the test for those.
+        facing = 1 if volume >= 0 else -1
+
+        for a, b, c, normal, towards_view in faces:
+            if towards_view * facing <= 0:
+                continue
+            shade = 0.4 + 0.6 * abs(_dot(_normalize(normal), light))
+            if colors is not None:
+                base = [sum(colors[v * 4 + k] for v in (a, b, c)) / 3 for k in range(3)]
+            else:
+                base = DEFAULT_COLOR
+            depth = projected[a][2] + projected[b][2] + projected[c][2]
+            triangles.append((depth, (projected[a][:2], projected[b][:2], projected[c][:2]),
+                              tuple(int(channel * shade) for channel in base)))
+
+    width, height = size[0] * SUPERSAMPLE, size[1] * SUPERSAMPLE
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    if triangles:
+        xs = [x for _, screen, _ in triangles for x, _ in screen]
+        ys = [y for _, screen, _ in triangles for _, y in screen]
+        scale = min(width / max(max(xs) - min(xs), 1e-9), height / max(max(ys) - min(ys), 1e-9)) * (1 - 2 * margin)
+        center_x, center_y = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+
+        draw = ImageDraw.Draw(image)
+        # Painter's algorithm: farthest triangles first
+        for _, screen, color in sorted(triangles, key=lambda triangle: triangle[0]):
+            draw.polygon(
+                [(width / 2 + (x - center_x) * scale, height / 2 - (y - center_y) * scale) for x, y in screen],
+                fill=color + (255,),
+            )
+
+    image = image.resize(size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def update_thumbnail(project_id):
+    """Renders and stores a project's thumbnail. Returns the file name, or None if there was nothing to draw."""
+    project = Project.objects.only("inputs", "envelope_vertices", "thumbnail").get(pk=project_id)
+    definition = registry.get(settings.PROJECT_THUMBNAIL_DEFINITION)
+    if definition is None:
+        raise FileNotFoundError(f"Definition {settings.PROJECT_THUMBNAIL_DEFINITION} not found")
+
+    inputs = canonical_inputs(with_project_envelope(project.inputs, project.envelope_vertices))
+    meshes = decode_meshes(solve(definition, inputs))
+    if not meshes:
+        return None
+
+    png = render_thumbnail(meshes, settings.PROJECT_THUMBNAIL_SIZE)
+    name = f"{Project.thumbnail.field.upload_to}{project_id}-{hashlib.sha1(png).hexdigest()[:12]}.png"
+    previous = project.thumbnail.name
+    if previous == name:
+        return name
+
+    storage = project.thumbnail.storage
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(png))
+    Project.objects.filter(pk=project_id).update(thumbnail=name)
+    if previous and previous != name:
+        storage.delete(previous)
+    return name
+
+
+class ThumbnailScheduler:
+    """
+    Renders a project's thumbnail ``delay`` seconds after the last call to
+    ``schedule`` for it, on a background thread.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, project_id):
+        with self._lock:
+            previous = self._timers.pop(project_id, None)
+            if previous is not None:
+                previous.cancel()
+            timer = threading.Timer(self.delay, self._run, args=(project_id,))
+            timer.daemon = True
+            self._timers[project_id] = timer
+            timer.start()
+
+    def _run(self, project_id):
+        with self._lock:
+            if self._timers.get(project_id) is threading.current_thread():
+                del self._timers[project_id]
+        close_old_connections()
+        try:
+            update_thumbnail(project_id)
+        except Project.DoesNotExist:
+            pass
+        except Exception as e:
+            logger.warning("Could not render the thumbnail of project %s: %s", project_id, e)
+        finally:
+            close_old_connections()
+
+
+thumbnail_scheduler = ThumbnailScheduler(settings.PROJECT_THUMBNAIL_DELAY) if settings.PROJECT_THUMBNAIL_DELAY is not None else None
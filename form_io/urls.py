@@ -1,14 +1,34 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under ASGI the Compute/OpenAI endpoints can be served by their async versions
+if settings.FORM_IO_ASYNC_VIEWS:
+    from . import async_views as upstream_views
+else:
+    upstream_views = views
+
 urlpatterns = [
     path('', views.project_list, name='project_list'),
     path('projects/<int:project_id>/', views.project_detail, name='project_detail'),
-    path('api/rhino/solve/', views.solve_grasshopper, name='solve_grasshopper'),
-    path('api/openai/chat/', views.chat_with_openai, name='chat_with_openai'),
-    path('api/rhino/params/', views.get_grasshopper_params, name='get_grasshopper_params'),
+    path('api/rhino/solve/', upstream_views.solve_grasshopper, name='solve_grasshopper'),
+    path('api/rhino/solve/stream/', views.solve_grasshopper_stream, name='solve_grasshopper_stream'),
+    path('api/rhino/solve/batch/', views.solve_grasshopper_batch, name='solve_grasshopper_batch'),
+    path('api/rhino/solve/mesh/', views.solve_grasshopper_mesh, name='solve_grasshopper_mesh'),
+    path('api/rhino/solve/preview/', views.solve_grasshopper_preview, name='solve_grasshopper_preview'),
+    path('api/rhino/jobs/', views.submit_solve_job, name='submit_solve_job'),
+    path('api/rhino/jobs/<uuid:job_id>/', views.solve_job, name='solve_job'),
+    path('api/rhino/jobs/<uuid:job_id>/result/', views.solve_job_result, name='solve_job_result'),
+    path('api/rhino/cache/', views.solve_cache_stats, name='solve_cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
+    path('api/openai/chat/', upstream_views.chat_with_openai, name='chat_with_openai'),
+    path('api/openai/chat/stream/', views.chat_with_openai_stream, name='chat_with_openai_stream'),
+    path('api/rhino/params/', upstream_views.get_grasshopper_params, name='get_grasshopper_params'),
     path('api/projects/<int:project_id>/save/', views.save_project_inputs, name='save_project_inputs'),
+    path('api/projects/', views.api_project_list, name='api_project_list'),
+    path('api/projects/area/', views.api_projects_in_area, name='api_projects_in_area'),
     path('api/projects/create/', views.api_create_project, name='api_create_project'),
     path('projects/<int:project_id>/delete/', views.delete_project, name='delete_project'),
+    path('projects/thumbnails/<str:name>', views.project_thumbnail, name='project_thumbnail'),
      path('api/projects/<int:project_id>/get_polyline/', views.get_project_polyline, name='get_project_polyline'),
 ]
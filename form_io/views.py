@@ -1,20 +1,38 @@
-import requests
 import base64
+import gzip
 import json
+import logging
 import os
-from django.http import JsonResponse
+import re
+from datetime import datetime, timezone
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.timezone import now as timezone_now
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import render, redirect
-from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from openai import OpenAI
 from dotenv import load_dotenv
-import traceback
-from .models import Project
-from django.views.decorators.http import require_POST
-import random
+from .models import DesignSample, Project, SolveJob
+from .parameters import ParameterError, canonical_inputs, with_project_envelope
+from .chat import ChatEvents, build_chat_request, cached_chat_events, chat_cache, chat_cache_key, parse_chat_message
+from .compute_client import ComputeError
+from .definitions import registry
+from .deltas import delta_meshes, delta_result
+from .design_space import context_digest, sample_index, split_inputs
+from .jobs import job_queue, parse_priority, queue_position, submit as submit_job
+from .meshes import pack_solve_result
+from .metrics import metrics as metrics_registry, span
+from .project_store import EDITABLE_FIELDS, store_project_fields, write_buffer
+from .solve_cache import solve_cache, solve_key
+from .spatial import projects_in_bbox, projects_near
+from .solver import Superseded, build_values, solve, solve_many, solve_slots, solve_stream
+from .streaming import SolveEvents
+from django.views.decorators.http import condition, require_GET, require_POST
+
+logger = logging.getLogger(__name__)
 
 # load mapbox token from .env file
 load_dotenv()
@@ -26,250 +44,666 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY_3")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 
+def stored_envelope_vertices(project_id):
+    """A project's preprocessed envelope (see Project.save), "" if it has none."""
+    try:
+        if write_buffer is not None:
+            write_buffer.flush(int(project_id))
+        return Project.objects.values_list("envelope_vertices", flat=True).get(pk=project_id)
+    except (Project.DoesNotExist, ValueError):
+        raise ParameterError({"project_id": f"no project {project_id}"})
+
+def read_solve_inputs(request):
+    """
+    The posted ``input_data``, canonicalized. With ``project_id``, the
+    project's stored envelope is used for ``envelope_vertices``.
+    """
+    with span("inputs_parse"):
+        inputs = json.loads(request.POST.get("input_data", "{}"))
+        project_id = request.POST.get("project_id")
+        if project_id:
+            inputs = with_project_envelope(inputs, stored_envelope_vertices(project_id))
+        return canonical_inputs(inputs)
+
+def read_solve_slot(request, gh_file_name):
+    """
+    ``(slot, seq)`` for a solve that newer requests from the same client may
+    supersede (see solver.SolveSlots), or None if it didn't post ``client_id``
+    and ``seq``. The slot is the posted ``slot``, or else the definition.
+    """
+    seq = request.POST.get("seq")
+    client_id = request.POST.get("client_id")
+    if not seq or not client_id:
+        return None
+    try:
+        seq = int(seq)
+    except ValueError:
+        raise ParameterError({"seq": f"{seq!r} is not a number"})
+    return (client_id, request.POST.get("slot") or gh_file_name), seq
+
+def read_delta_request(request, gh_file_name):
+    """
+    ``(session, seq, base)`` for a solve that asked for a delta response
+    with ``delta_base`` (see deltas.py), otherwise None. The session is the
+    solve's slot.
+    """
+    base = request.POST.get("delta_base")
+    if base in (None, ""):
+        return None
+    slot = read_solve_slot(request, gh_file_name)
+    if slot is None:
+        raise ParameterError({"delta_base": "delta_base needs a client_id and seq"})
+    try:
+        base = int(base)
+    except ValueError:
+        raise ParameterError({"delta_base": f"{base!r} is not a number"})
+    return (*slot, base)
+
+def solve_error_response(error, view_name):
+    """The response for an exception raised by a solve view; call it from the except block."""
+    if isinstance(error, ParameterError):
+        return JsonResponse({"success": False, "error": str(error), "errors": error.errors}, status=400)
+    if isinstance(error, Superseded):
+        return JsonResponse({"success": False, "superseded": True, "seq": error.seq, "latest_seq": error.latest_seq})
+    if isinstance(error, ComputeError):
+        logger.warning("Compute server error: %s", error)
+        return JsonResponse({"success": False, "error": str(error)}, status=error.status)
+    logger.exception("Error in %s", view_name)
+    return JsonResponse({"success": False, "error": str(error)}, status=500)
+
 @csrf_exempt
 def solve_grasshopper(request):
     if request.method == "POST":
         try:
             # 1. Collect Parameters
             gh_file_name = request.POST.get("grasshopper_file_name")
-            inputs = json.loads(request.POST.get("input_data", "{}"))
-            print("Inputs received:", inputs)
-
-            # Locate Grasshopper definition
-            gh_file_path = os.path.join(settings.GRASSHOPPER_FILES_DIR, gh_file_name)
-            if not os.path.exists(gh_file_path):
-                return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."})
-
-            # 2. Encode Grasshopper File
-            with open(gh_file_path, "rb") as gh_file:
-                gh_data = gh_file.read()
-                encoded = base64.b64encode(gh_data).decode()  # Keep it as Base64-encoded string
-
-            # 3. Prepare Inputs
-            values = []
-            for param_name, param_value in inputs.items():
-                inner_tree = {
-                    "{0;0}": [
-                        {
-                            "type": "System.Double" if isinstance(param_value, (float, int)) else "System.String",
-                            "data": param_value,
-                        }
-                    ]
-                }
-                values.append({"ParamName": param_name, "InnerTree": inner_tree})
-
-            # 4. Send Request to Rhino Compute
-            post_url = "http://localhost:6001/grasshopper"
-            payload = {"algo": encoded, "pointer": None, "values": values}
-            response = requests.post(post_url, json=payload)
-
-            if response.status_code != 200:
-                print("Compute server error:", response.text)
-                return JsonResponse({"success": False, "error": response.text}, status=response.status_code)
-
-            # 5. Parse and Return Result
-            res_data = response.json()
-            return JsonResponse(res_data)
+            inputs = read_solve_inputs(request)
+            slot = read_solve_slot(request, gh_file_name)
+            delta = read_delta_request(request, gh_file_name)
+            logger.debug("Inputs received: %s", inputs)
+
+            # 2. Locate Grasshopper definition (read and encoded once by the registry)
+            definition = registry.get(gh_file_name)
+            if definition is None:
+                return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+            # 3. Solve, unless a newer request from the same client/project replaced this one.
+            # Identical solves already in flight share one Compute call (see solver.solve).
+            if slot is not None:
+                result = solve_slots.run(*slot, lambda: solve(definition, inputs))
+            else:
+                result = solve(definition, inputs)
+
+            # 4. Return Result (Compute already sent JSON, no need to re-serialize
+            # unless only the outputs that changed are sent)
+            if delta is not None:
+                with span("delta"):
+                    result = delta_result(result, *delta)
+            with span("serialize"):
+                return HttpResponse(with_canonical_inputs(result, inputs), content_type="application/json")
 
         except Exception as e:
-            print("Error in solve_grasshopper:", str(e))
-            return JsonResponse({"success": False, "error": str(e)}, status=500)
+            return solve_error_response(e, "solve_grasshopper")
 
     return JsonResponse({"success": False, "error": "Only POST method allowed."})
 
 @csrf_exempt
-def chat_with_openai(request):
-    print("Received request for OpenAI call")
-    if request.method == 'POST':
-        try:
-            # Parse the request body for the prompt
-            data = json.loads(request.body)
-            prompt = data.get('prompt', '')
+@require_POST
+def solve_grasshopper_stream(request):
+    """
+    Same inputs as solve_grasshopper, but streams the result back as NDJSON
+    with one line per output parameter as soon as it arrives from Compute
+    (see streaming.SolveEvents for the line format).
+    """
+    try:
+        gh_file_name = request.POST.get("grasshopper_file_name")
+        inputs = read_solve_inputs(request)
+        slot = read_solve_slot(request, gh_file_name)
 
-            print(f"Received prompt: {prompt}")
+        definition = registry.get(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
 
-            if not prompt:
-                return JsonResponse({"error": "No prompt provided"}, status=400)
+        if slot is not None:
+            chunks = solve_slots.run_stream(*slot, lambda: solve_stream(definition, inputs))
+        else:
+            chunks = solve_stream(definition, inputs)
 
-            # Define inputs, their descriptions, ranges, and an example response
-            inputs_description = {
-                "podium_length": "Defines the length of the podium, which is typically the base or foundation on which the main structure (e.g., towers or buildings) is built. This parameter determines how far the podium extends along one axis. Should always be more than 20000mm.",
-                "podium_width": "Specifies the width of the podium, determining its dimension along the perpendicular axis to the length. Together with podium_length, this creates the footprint of the podium. Should always be more than 20000mm.",
-                "podium_no_of_floors": "Sets the number of floors or levels in the podium. This parameter controls the vertical extent of the podium structure. Output is always an integer.",
-                "floor_height": "Determines the height of each floor in the building. This is a crucial parameter for calculating the total height of the structure and maintaining proportions.",
-                "building_type": "Indicates the type of building being designed. This must be an integer from 0 to 5, where each number represents a specific type: 0 for single tower, 1 for two towers, 2 for courtyard, 3 for staggered, 4 for L-shaped, and 5 for H-shaped. This parameter may influence other design aspects such as floor layout and building regulations.",
-                "tower_num_floors": "Specifies the number of floors in the tower portion of the model, controlling its vertical scale. This is separate from the podium and applies to the taller sections of the design.",
-                "courtyard_offset": "Controls the distance or spacing for the courtyard area, typically affecting how much open space is left between the building and the inner courtyard. This is only applicable if the building type is 2 (courtyard).",
-                "staggered_offset": "Defines the offset distance for staggered elements of the design. This parameter is often used for creating a stepped or terraced effect in the facade or building form. This is applicable only if the building type is 3 (staggered).",
-                "polyline_offset": "Specifies the separation or spacing between two towers in the design. This ensures appropriate distances are maintained for structural, aesthetic, or functional reasons, such as light, air circulation, and privacy. This is applicable only when the building type is 1 (two towers)."
-            }
+        return StreamingHttpResponse(SolveEvents(chunks, inputs), content_type="application/x-ndjson")
 
+    except Exception as e:
+        return solve_error_response(e, "solve_grasshopper_stream")
 
-            input_ranges = {
-                "podium_length": [10000, 200000],
-                "podium_width": [10000, 100000],
-                "podium_no_of_floors": [1, 20],
-                "floor_height": [2000, 5000],
-                "building_type": [0, 5],
-                "tower_num_floors": [1, 50],
-                "courtyard_offset": [0, 10000],
-                "staggered_offset": [0, 3000],
-                "polyline_offset": [0, 20000]
-            }
+@csrf_exempt
+@require_POST
+def solve_grasshopper_mesh(request):
+    """
+    Same inputs as solve_grasshopper, but returns the output meshes as packed
+    typed-array buffers (see meshes.py for the layout) instead of rhino3dm
+    JSON. Post quantize=1 for 16-bit positions. The buffers are cached and
+    sent gzip-compressed; the rhino3dm archives they replace already were.
+    The canonical inputs are sent in the X-Canonical-Inputs header. With
+    delta_base, meshes unchanged since that solve are only marked as such
+    (see deltas.py).
+    """
+    try:
+        gh_file_name = request.POST.get("grasshopper_file_name")
+        inputs = read_solve_inputs(request)
+        quantize = request.POST.get("quantize") == "1"
+        slot = read_solve_slot(request, gh_file_name)
+        delta = read_delta_request(request, gh_file_name)
+
+        definition = registry.get(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+        if slot is not None:
+            body = solve_slots.run(*slot, lambda: solve_mesh_body(definition, inputs, quantize))
+        else:
+            body = solve_mesh_body(definition, inputs, quantize)
+
+        if delta is not None:
+            with span("delta"):
+                packed, replaced = delta_meshes(gzip.decompress(body), *delta)
+                if replaced:
+                    body = gzip.compress(packed, mtime=0)
+
+        response = mesh_response(request, body)
+        response["X-Canonical-Inputs"] = json.dumps(inputs, separators=(",", ":"))
+        return response
 
-            example_response = {
-            "parameters": {
-                "courtyard_offset": "1090.88", 
-                "podium_lenght": "47025.3210000", 
-                "floor_height": "4941.268", 
-                "podium_no_of_floors": "12.418", 
-                "tower_num_floors": "8.536", 
-                "staggered_offset": "7862.917", 
-                "building_type": "H-shaped ]", 
-                "two_tower_offset": "0.22", 
-                "podium_width": "37701.2450000", 
-                "polyline_offset": "8537.49400000"
-            }, 
-            "reasoning": "Explain why you made these parameter choices"
-            }
+    except Exception as e:
+        return solve_error_response(e, "solve_grasshopper_mesh")
 
+@csrf_exempt
+@require_POST
+def solve_grasshopper_batch(request):
+    """
+    Solves many input sets for one definition in a single request. Body:
+    ``{"grasshopper_file_name": ..., "inputs": [{...}, ...], "concurrency": 8,
+    "stream": false, "project_id": null}``. With ``project_id`` every input
+    set uses the project's stored envelope. Input sets that are the same after canonicalization
+    are solved once. Returns
+    ``{"success": true, "results": [...]}`` in input order, or with
+    ``"stream": true`` NDJSON lines in completion order followed by
+    ``{"done": true}``. Each result is ``{"index", "success", "result"}`` or
+    ``{"index", "success": false, "error", "status"}``, both with the
+    item's ``canonical_inputs``.
+    """
+    try:
+        data = json.loads(request.body)
+        gh_file_name = data.get("grasshopper_file_name")
+        inputs_list = data.get("inputs")
+        if not isinstance(inputs_list, list) or not all(isinstance(inputs, dict) for inputs in inputs_list):
+            return JsonResponse({"success": False, "error": "inputs must be a list of objects."}, status=400)
+        if len(inputs_list) > settings.SOLVE_BATCH_MAX_ITEMS:
+            return JsonResponse({"success": False, "error": f"At most {settings.SOLVE_BATCH_MAX_ITEMS} input sets per batch."}, status=400)
+        envelope = stored_envelope_vertices(data["project_id"]) if data.get("project_id") else ""
+        cleaned = []
+        for index, inputs in enumerate(inputs_list):
+            try:
+                cleaned.append(canonical_inputs(with_project_envelope(inputs, envelope)))
+            except ParameterError as e:
+                return JsonResponse({"success": False, "error": f"inputs[{index}]: {e}", "errors": e.errors}, status=400)
+        inputs_list = cleaned
+
+        definition = registry.get(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+        concurrency = int(data.get("concurrency") or settings.SOLVE_BATCH_DEFAULT_CONCURRENCY)
+        concurrency = max(1, min(concurrency, settings.SOLVE_BATCH_MAX_CONCURRENCY))
+        completed = solve_many(definition, inputs_list, concurrency)
+
+        if data.get("stream"):
+            def lines():
+                for indices, result, error in completed:
+                    for index in indices:
+                        # Newlines in JSON are only ever whitespace, safe to flatten
+                        yield batch_item(index, result, error, inputs_list[index]).replace(b"\n", b" ") + b"\n"
+                yield b'{"done":true}\n'
+            return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+        items = [None] * len(inputs_list)
+        for indices, result, error in completed:
+            for index in indices:
+                items[index] = batch_item(index, result, error, inputs_list[index])
+        # Compute results are already JSON, so splice them in rather than re-serializing
+        body = b'{"success":true,"results":[' + b",".join(items) + b"]}"
+        return HttpResponse(body, content_type="application/json")
+
+    except (ValueError, TypeError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Error in solve_grasshopper_batch")
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+def batch_item(index, result, error, inputs):
+    """One entry of a batch response as JSON bytes."""
+    if error is None:
+        return b'{"index":%d,"success":true,"canonical_inputs":%s,"result":%s}' % (index, json.dumps(inputs).encode(), result)
+    status = error.status if isinstance(error, ComputeError) else 500
+    return json.dumps({"index": index, "success": False, "error": str(error), "status": status, "canonical_inputs": inputs}).encode()
+
+def with_canonical_inputs(result, inputs):
+    """Adds the inputs a solve ran with to Compute's JSON object, without re-parsing it."""
+    body = result.lstrip()[1:]
+    separator = b"" if body.lstrip().startswith(b"}") else b","
+    return b'{"canonical_inputs":' + json.dumps(inputs).encode() + separator + body
+
+def solve_mesh_body(definition, inputs, quantize):
+    """The gzip-compressed packed meshes of a solve, cached next to the raw solve they came from."""
+    cache_key = solve_key(definition.digest, build_values(inputs)) + (".meshq" if quantize else ".mesh")
+    body = solve_cache.get(cache_key)
+    if body is None:
+        result = solve(definition, inputs)
+        with span("response_parse"):
+            packed = pack_solve_result(result, quantize=quantize)
+        with span("serialize"):
+            body = gzip.compress(packed, mtime=0)
+        solve_cache.set(cache_key, body)
+    return body
+
+def mesh_response(request, body):
+    """Sends gzip-compressed packed meshes, decompressing for clients without gzip."""
+    if "gzip" not in request.headers.get("Accept-Encoding", ""):
+        return HttpResponse(gzip.decompress(body), content_type="application/octet-stream")
+    response = HttpResponse(body, content_type="application/octet-stream")
+    response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
 
-            # Combine all details into the prompt
-            detailed_prompt = (
-                "You are an architect specializing in housing projects. Based on the given inputs, "
-                "select parameter values for a project. Here are the details:\n\n"
-                "Inputs and Descriptions:\n" +
-                "\n".join([f"- {key}: {desc}" for key, desc in inputs_description.items()]) +
-                "\n\nInput Ranges:\n" +
-                "\n".join([f"- {key}: {value}" for key, value in input_ranges.items()]) +
-                "\n\nExample JSON Response:\n" +
-                json.dumps(example_response, indent=4) +
-                f"\n\nNow, based on the following prompt, provide parameter values as a JSON response and always include all the values that are there in the example json, if not applicable then it should be 0:\n{prompt}"
-            )
+@csrf_exempt
+@require_POST
+def solve_grasshopper_preview(request):
+    """
+    Returns the precomputed sweep sample closest to the posted inputs, in the
+    same format as solve_grasshopper_mesh, so the viewer can show an
+    approximate result while the exact solve runs. Samples come from the
+    sweep_design_space command; 404 if there are none for these inputs.
+    """
+    try:
+        gh_file_name = request.POST.get("grasshopper_file_name")
+        inputs = read_solve_inputs(request)
+
+        definition = registry.get(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+        params, context = split_inputs(inputs)
+        match = sample_index.nearest(definition.digest, context_digest(context), params)
+        if match is None:
+            return JsonResponse({"success": False, "error": "No precomputed samples for these inputs."}, status=404)
+
+        distance, sample_id = match
+        sample = DesignSample.objects.only("result").get(pk=sample_id)
+        response = mesh_response(request, bytes(sample.result))
+        response["X-Preview-Distance"] = f"{distance:.4f}"
+        return response
 
-            # Call the OpenAI API
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert architect specialized in housing project configurations.Always reply in JSON format as in the example json. Do not include any other information in the response."},
-                    {"role": "user", "content": detailed_prompt},
-                ],
-                max_tokens=800
+    except Exception as e:
+        return solve_error_response(e, "solve_grasshopper_preview")
+
+def job_json(job):
+    data = {
+        "id": str(job.pk),
+        "status": job.status,
+        "priority": job.priority,
+        "definition": job.definition,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "status_url": reverse("solve_job", args=[job.pk]),
+    }
+    if job.status == SolveJob.QUEUED:
+        data["position"] = queue_position(job)
+    elif job.status == SolveJob.DONE:
+        data["result_url"] = reverse("solve_job_result", args=[job.pk])
+    elif job.status == SolveJob.FAILED:
+        data["error"] = job.error
+    return data
+
+@csrf_exempt
+@require_POST
+def submit_solve_job(request):
+    """
+    Queues a solve and answers 202 with the job right away. Takes the same
+    inputs as solve_grasshopper plus ``priority``: "interactive" (the
+    default), "batch" or a number, lower running first. Poll the job's
+    status_url, adding ``?wait=<seconds>`` to long-poll.
+    """
+    try:
+        gh_file_name = request.POST.get("grasshopper_file_name")
+        inputs = read_solve_inputs(request)
+        priority = parse_priority(request.POST.get("priority"))
+
+        definition = registry.get(gh_file_name)
+        if definition is None:
+            return JsonResponse({"success": False, "error": f"File {gh_file_name} not found."}, status=404)
+
+        if settings.SOLVE_JOB_WORKERS_IN_PROCESS:
+            job_queue.start()
+        job = submit_job(definition, inputs, priority)
+        response = JsonResponse({"success": True, "job": job_json(job)}, status=202)
+        response["Location"] = reverse("solve_job", args=[job.pk])
+        return response
+
+    except ParameterError as e:
+        return JsonResponse({"success": False, "error": str(e), "errors": e.errors}, status=400)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    except Exception as e:
+        logger.exception("Error in submit_solve_job")
+        return JsonResponse({"success": False, "error": str(e)}, status=500)
+
+@csrf_exempt
+def solve_job(request, job_id):
+    """
+    GET returns a job's status. With ``?wait=<seconds>`` (at most
+    SOLVE_JOB_MAX_WAIT) the request is held until the job has finished or
+    the time is up. DELETE cancels a job that has not started yet.
+    """
+    try:
+        if request.method == "DELETE":
+            cancelled = SolveJob.objects.filter(pk=job_id, status=SolveJob.QUEUED).update(
+                status=SolveJob.CANCELLED, finished_at=timezone_now(),
             )
-            print("OpenAI API call succeeded")
-            print(f"Raw OpenAI Response: {response}")
+            job = SolveJob.objects.defer("result").get(pk=job_id)
+            if not cancelled:
+                return JsonResponse({"success": False, "error": f"Job is {job.status}.", "job": job_json(job)}, status=409)
+            return JsonResponse({"success": True, "job": job_json(job)})
+        if request.method != "GET":
+            return JsonResponse({"success": False, "error": "Only GET and DELETE methods allowed."}, status=405)
+
+        if settings.SOLVE_JOB_WORKERS_IN_PROCESS:
+            job_queue.start()
+        wait = min(max(float(request.GET.get("wait") or 0), 0), settings.SOLVE_JOB_MAX_WAIT)
+        return JsonResponse({"success": True, "job": job_json(job_queue.wait(job_id, wait))})
+
+    except SolveJob.DoesNotExist:
+        return JsonResponse({"success": False, "error": "No such job."}, status=404)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
-            # Extract the content and parse as JSON if applicable
-            gpt_output = response.choices[0].message.content
-            print(f"gpt output Response: {gpt_output}")
+@require_GET
+def solve_job_result(request, job_id):
+    """A finished job's result, in the same format as solve_grasshopper. 409 until it is done."""
+    try:
+        job = SolveJob.objects.get(pk=job_id)
+    except SolveJob.DoesNotExist:
+        return JsonResponse({"success": False, "error": "No such job."}, status=404)
+    if job.status == SolveJob.DONE:
+        return HttpResponse(with_canonical_inputs(bytes(job.result), job.inputs), content_type="application/json")
+    if job.status == SolveJob.FAILED:
+        return JsonResponse({"success": False, "error": job.error}, status=job.error_status or 500)
+    return JsonResponse({"success": False, "error": f"Job is {job.status}.", "job": job_json(job)}, status=409)
+
+@require_GET
+def solve_cache_stats(request):
+    return JsonResponse(solve_cache.stats())
+
+@require_GET
+def metrics(request):
+    """Request, stage, cache and Compute metrics in the Prometheus text format (see metrics.py)."""
+    return HttpResponse(metrics_registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-            # Use the parsing helper function
-            parameters = parse_openai_response(gpt_output)
+@csrf_exempt
+def chat_with_openai(request):
+    if request.method == 'POST':
+        try:
+            # Parse the request body for the prompt
+            data = json.loads(request.body)
+            prompt = data.get('prompt', '')
+            logger.debug("Received prompt: %s", prompt)
+
+            if not prompt:
+                return JsonResponse({"error": "No prompt provided"}, status=400)
 
-            # Handle errors in parsing
-            if "error" in parameters:
-                return JsonResponse(parameters, status=500)
+            # Answer repeated prompts from the cache
+            key = chat_cache_key(prompt)
+            parameters = chat_cache.get(key)
+            if parameters is None:
+                request_kwargs = build_chat_request(prompt)
+                with span("llm_call"):
+                    response = client.chat.completions.create(**request_kwargs)
+                parameters = parse_chat_message(response.choices[0].message)
+
+                # Handle refusals and errors in parsing
+                if "error" in parameters:
+                    return JsonResponse(parameters, status=500)
+                chat_cache.set(key, parameters)
 
             # Send the extracted parameters to the frontend
             return JsonResponse({"parameters": parameters})
             
         except Exception as e:
-            print(f"Error while calling OpenAI API: {e}")
+            logger.exception("Error while calling OpenAI API")
             return JsonResponse({"error": str(e)}, status=500)
 
     return JsonResponse({"error": "Invalid request method"}, status=400)
 
 @csrf_exempt
-def parse_openai_response(raw_response):
+@require_POST
+def chat_with_openai_stream(request):
     """
-    Parses the OpenAI JSON response to extract parameters and reasoning.
+    Same prompt as chat_with_openai, but streams the reply back as NDJSON
+    (see chat.ChatEvents for the line format): the parameters as soon as
+    they are complete, then the reasoning as it is written.
     """
     try:
-        # Parse the JSON string
-        parsed_response = json.loads(raw_response)
+        prompt = json.loads(request.body).get("prompt", "")
+        if not prompt:
+            return JsonResponse({"error": "No prompt provided"}, status=400)
+
+        key = chat_cache_key(prompt)
+        reply = chat_cache.get(key)
+        if reply is not None:
+            events = cached_chat_events(reply)
+        else:
+            request_kwargs = build_chat_request(prompt)
+            with span("llm_call"):
+                stream = client.chat.completions.create(**request_kwargs, stream=True)
+            events = ChatEvents(stream, cache_key=key)
+
+        return StreamingHttpResponse(events, content_type="application/x-ndjson")
+
+    except Exception as e:
+        logger.exception("Error while calling OpenAI API")
+        return JsonResponse({"error": str(e)}, status=500)
 
-        # Extract "parameters" and "reasoning"
-        parameters = parsed_response.get("parameters", {})
-        reasoning = parsed_response.get("reasoning", "")
+def grasshopper_params_etag(request):
+    definition = registry.get(request.GET.get("file"))
+    return definition.digest if definition else None
 
-        # Return both as a dictionary
-        return {"parameters": parameters, "reasoning": reasoning}
-    except json.JSONDecodeError as e:
-        print(f"Error parsing OpenAI JSON response: {e}")
-        return {"error": "Invalid JSON format in OpenAI response."}
+def grasshopper_params_last_modified(request):
+    definition = registry.get(request.GET.get("file"))
+    if definition is None:
+        return None
+    return datetime.fromtimestamp(definition.mtime_ns / 1e9, tz=timezone.utc)
 
 @csrf_exempt
+@condition(etag_func=grasshopper_params_etag, last_modified_func=grasshopper_params_last_modified)
 def get_grasshopper_params(request):
     try:
         gh_file_name = request.GET.get("file")
-        print(f"[INFO] Requested Grasshopper file: {gh_file_name}")
+        logger.debug("Requested Grasshopper file: %s", gh_file_name)
 
         if not gh_file_name:
             return JsonResponse({"error": "No file name provided"}, status=400)
 
-        gh_path = os.path.join(settings.GRASSHOPPER_FILES_DIR, gh_file_name)
-        if not os.path.exists(gh_path):
+        definition = registry.get(gh_file_name)
+        if definition is None:
             return JsonResponse({"error": "File not found"}, status=404)
 
-        with open(gh_path, "rb") as f:
-            gh_bytes = f.read()
-            encoded_gh = base64.b64encode(gh_bytes).decode("utf-8")
+        # Cached per file content, Compute is only asked when the file changed
+        response = HttpResponse(registry.io(definition), content_type="application/json")
+        # Let browsers keep the response but revalidate it with If-None-Match
+        patch_cache_control(response, no_cache=True)
+        return response
+    except ComputeError as e:
+        logger.error("Rhino Compute returned error: %s - %s", e.status, e)
+        return JsonResponse({"error": str(e)}, status=e.status)
+    except Exception as e:
+        logger.exception("An error occurred during get_grasshopper_params")
+        return JsonResponse({"error": str(e)}, status=500)
 
-        payload = {
-            "algo": encoded_gh,
-            "pointer": None
-        }
+PASTEL_COLORS = [
+    "#fde2e2", "#e0f7fa", "#fff3e0", "#f1f8e9", "#e8eaf6",
+    "#fce4ec", "#f9fbe7", "#ede7f6", "#e3f2fd", "#fbe9e7"
+]
 
-        compute_url = os.getenv("RHINO_COMPUTE_URL", "http://localhost:6001")
-        post_url = f"{compute_url}/io"
+# Only the columns the project cards show, the JSON fields stay in the database
+PROJECT_CARD_FIELDS = ("id", "name", "type", "created_at", "thumbnail")
 
-        print(f"[INFO] Sending POST request to {post_url}")
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(post_url, json=payload, headers=headers)
+# Pastel card background for a project, the same on every page load
+def get_pastel(project_id):
+    return PASTEL_COLORS[project_id % len(PASTEL_COLORS)]
 
-        if response.status_code != 200:
-            print(f"[ERROR] Rhino Compute returned error: {response.status_code} - {response.text}")
-            return JsonResponse({"error": response.text}, status=response.status_code)
+def encode_project_cursor(project):
+    raw = f"{project.created_at.isoformat()}|{project.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-        response_data = response.json()
-        print("response_data")
+def decode_project_cursor(cursor):
+    """Raises ValueError for a malformed cursor."""
+    created_at, project_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+    return datetime.fromisoformat(created_at), int(project_id)
 
-        return JsonResponse(response_data)
-    except Exception as e:
-        print("[EXCEPTION] An error occurred during get_grasshopper_inputs:")
-        traceback.print_exc()
-        return JsonResponse({"error": str(e)}, status=500)
-
-# Utility to get a random pastel background color
-def get_random_pastel():
-    pastel_colors = [
-        "#fde2e2", "#e0f7fa", "#fff3e0", "#f1f8e9", "#e8eaf6",
-        "#fce4ec", "#f9fbe7", "#ede7f6", "#e3f2fd", "#fbe9e7"
-    ]
-    return random.choice(pastel_colors)
+def get_project_page(cursor=None, page_size=None):
+    """
+    Returns one page of projects, newest first, and the cursor of the next
+    page (None on the last one). Pages are keyed on (created_at, id) rather
+    than offsets, so every page costs the same as the first.
+    """
+    page_size = page_size or settings.PROJECT_LIST_PAGE_SIZE
+    projects = Project.objects.only(*PROJECT_CARD_FIELDS).order_by("-created_at", "-id")
+    if cursor:
+        created_at, project_id = decode_project_cursor(cursor)
+        projects = projects.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=project_id))
+
+    page = list(projects[:page_size + 1])
+    next_cursor = encode_project_cursor(page[page_size - 1]) if len(page) > page_size else None
+    page = page[:page_size]
+    for project in page:
+        project.color = get_pastel(project.id)
+        project.thumbnail_url = (
+            reverse("project_thumbnail", args=[os.path.basename(project.thumbnail.name)]) if project.thumbnail else None
+        )
+    return page, next_cursor
 
 # View to render the list of projects with pastel color backgrounds
 def project_list(request):
-    projects = Project.objects.all().order_by("-created_at")
-
-    # Attach a random color attribute to each project (not persisted in DB)
-    for project in projects:
-        project.color = get_random_pastel()
+    try:
+        projects, next_cursor = get_project_page(request.GET.get("cursor"))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid cursor")
+
+    # "Load more" only needs the next batch of cards
+    if request.GET.get("partial"):
+        return render(request, "form_io/partials/project_cards.html", {
+            "projects": projects,
+            "next_cursor": next_cursor,
+        })
 
     mapbox_token = os.getenv("MAPBOX_PUBLIC_TOKEN")
     if not mapbox_token:
-        print("Warning: MAPBOX_PUBLIC_TOKEN is not set in settings.")
+        logger.warning("MAPBOX_PUBLIC_TOKEN is not set in settings.")
 
     return render(request, "form_io/project_list.html", {
         "projects": projects,
+        "next_cursor": next_cursor,
         "mapbox_token": mapbox_token,
     })
 
+@require_GET
+def api_project_list(request):
+    try:
+        limit = min(int(request.GET.get("limit", settings.PROJECT_LIST_PAGE_SIZE)), settings.PROJECT_LIST_MAX_PAGE_SIZE)
+        projects, next_cursor = get_project_page(request.GET.get("cursor"), max(limit, 1))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+
+    return JsonResponse({
+        "projects": [
+            {
+                "id": project.id,
+                "name": project.name,
+                "type": project.type,
+                "created_at": project.created_at.isoformat(),
+                "color": project.color,
+                "url": reverse("project_detail", args=[project.id]),
+                "thumbnail": project.thumbnail_url,
+            }
+            for project in projects
+        ],
+        "next_cursor": next_cursor,
+    })
+
+# File names thumbnails.py gives rendered thumbnails
+THUMBNAIL_NAME = re.compile(r"\d+-[0-9a-f]{12}\.png")
+
+@require_GET
+def project_thumbnail(request, name):
+    """
+    Serves a rendered project thumbnail (see thumbnails.py). Their names
+    change with their content, so browsers may keep them for a long time.
+    """
+    if not THUMBNAIL_NAME.fullmatch(name):
+        raise Http404
+    storage = Project.thumbnail.field.storage
+    path = Project.thumbnail.field.upload_to + name
+    if not storage.exists(path):
+        raise Http404
+    response = FileResponse(storage.open(path), content_type="image/png")
+    patch_cache_control(response, public=True, max_age=settings.PROJECT_THUMBNAIL_MAX_AGE, immutable=True)
+    return response
+
+@require_GET
+def api_projects_in_area(request):
+    """
+    Projects whose site falls in an area, as a GeoJSON FeatureCollection of
+    site bounding boxes for the Mapbox project map. Query with
+    ``?bbox=west,south,east,north`` or ``?lng=..&lat=..&radius=<meters>``.
+    """
+    try:
+        if "bbox" in request.GET:
+            west, south, east, north = (float(value) for value in request.GET["bbox"].split(","))
+            matches = [(project, None) for project in projects_in_bbox(west, south, east, north)]
+        else:
+            lng, lat = float(request.GET["lng"]), float(request.GET["lat"])
+            matches = projects_near(lng, lat, float(request.GET["radius"]))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Pass bbox=west,south,east,north or lng, lat and radius"}, status=400)
+
+    features = []
+    for project, distance in matches:
+        west, south, east, north = project.bbox
+        properties = {
+            "id": project.id,
+            "name": project.name,
+            "type": project.type,
+            "color": get_pastel(project.id),
+            "url": reverse("project_detail", args=[project.id]),
+        }
+        if distance is not None:
+            properties["distance"] = round(distance, 1)
+        features.append({
+            "type": "Feature",
+            "id": project.id,
+            "properties": properties,
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]],
+            },
+        })
+    return JsonResponse({"type": "FeatureCollection", "features": features})
+
 def project_detail(request, project_id):
+    if write_buffer is not None:
+        write_buffer.flush(project_id)
     project = get_object_or_404(Project, id=project_id)
     mapbox_token = os.getenv("MAPBOX_PUBLIC_TOKEN")
     if not mapbox_token:
-        print("Warning: MAPBOX_PUBLIC_TOKEN is not set in settings.")
+        logger.warning("MAPBOX_PUBLIC_TOKEN is not set in settings.")
             
     return render(request, "form_io/index.html", {
         "project": project,
@@ -306,6 +740,8 @@ def api_create_project(request):
 @require_POST
 def delete_project(request, project_id):
     project = get_object_or_404(Project, id=project_id)
+    if project.thumbnail:
+        project.thumbnail.delete(save=False)
     project.delete()
     return redirect('project_list')
 
@@ -313,30 +749,28 @@ def delete_project(request, project_id):
 @csrf_exempt
 @require_POST
 def save_project_inputs(request, project_id):
-    project = get_object_or_404(Project, id=project_id)
+    """
+    Saves any of site_envelope, site_bounds and inputs, writing only the
+    fields that changed. ``inputs_patch`` may carry a JSON Patch to apply to
+    the stored inputs instead of sending them all.
+    """
     try:
         data = json.loads(request.body)
+        fields = {name: data[name] for name in EDITABLE_FIELDS if name in data}
+        inputs_patch = data.get("inputs_patch")
 
-        # Save site_envelope if present
-        if "site_envelope" in data:
-            project.site_envelope = data["site_envelope"]
-
-        # Save site_bounds if present
-        if "site_bounds" in data:
-            project.site_bounds = data["site_bounds"]
-
-        # Save inputs if present
-        if "inputs" in data:
-            project.inputs = data["inputs"]
-
-        project.save()
-        return JsonResponse({"success": True})
+        updated = store_project_fields(project_id, fields, inputs_patch)
+        if updated is None:
+            return JsonResponse({"success": True, "buffered": True})
+        return JsonResponse({"success": True, "updated": updated})
+    except Project.DoesNotExist:
+        raise Http404("No Project matches the given query.")
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=400)
 
-from django.http import JsonResponse, HttpResponseBadRequest
-
 def get_project_polyline(request, project_id):
+    if write_buffer is not None:
+        write_buffer.flush(project_id)
     try:
         project = Project.objects.get(pk=project_id)
         return JsonResponse({